@@ -0,0 +1,52 @@
+from utils import database, seed, measure, report
+from django.db.models import Count, Avg
+from recipeAPIapp.models.categorical import Category
+from recipeAPIapp.models.recipe import Recipe
+from recipeAPIapp.models.recipe import SubmitStatuses as Statuses
+import recipeAPIapp.serializers.lean as lean
+import recipeAPIapp.utils.filtering as filtering
+import recipeAPIapp.utils.catalog as catalog
+
+ANNOTATIONS = {'rating_count': Count('rating', distinct=True), 'avg_rating': Avg('rating__stars', distinct=True)}
+
+
+
+def database_filter(vdata):
+    qryset = Recipe.objects.filter(submit_status=Statuses.ACCEPTED)
+    if vdata.get('categories'):
+        qryset = qryset.filter(categories__in=vdata['categories']).distinct()
+    if 'calories_limit' in vdata:
+        qryset = qryset.filter(calories__lte=vdata['calories_limit'] / vdata['servings'])
+    if 'search_string' in vdata:
+        qryset = filtering.search(qryset, ['name', 'title'], vdata['search_string'])
+    qryset = filtering.order_by(qryset.annotate(**ANNOTATIONS), vdata)
+    return filtering.paginate(qryset, vdata, lambda qs: lean.RecipeBaseData(qs).data)
+
+
+def catalog_filter(index, vdata):
+    count, page = index.select(vdata)
+    qryset = Recipe.objects.filter(submit_status=Statuses.ACCEPTED)
+    serialize = lambda qs: lean.RecipeBaseData(qs.annotate(**ANNOTATIONS)).data
+    return filtering.paginate_selected(qryset, count, page, vdata, serialize)
+
+
+if __name__ == '__main__':
+    teardown = database()
+    try:
+        seed(recipes=100000, users=50, categories=30, ingredients=200, per_recipe=8, ratings=3)
+        index = catalog.RecipeCatalog()
+        categories = list(Category.objects.all()[:3])
+        cases = [
+            ('newest', {'order_by': ['-created_at']}),
+            ('3 categories by name', {'categories': categories, 'order_by': ['name']}),
+            ('calorie limit by prep time', {'calories_limit': 400, 'servings': 1, 'order_by': ['prep_time']}),
+            ('name search', {'search_string': 'recipe 12', 'order_by': ['-calories']}),
+        ]
+        rows = [('catalog build', measure(index.build, repeat=3))]
+        for label, vdata in cases:
+            vdata = {'page': 3, 'page_size': 20} | vdata
+            rows.append((f'database, {label}', measure(lambda: database_filter(vdata), repeat=5)))
+            rows.append((f'catalog, {label}', measure(lambda: catalog_filter(index, vdata), repeat=5)))
+        report('Anonymous recipe filter, 100k accepted recipes, page 3 of 20', rows)
+    finally:
+        teardown()
@@ -0,0 +1,37 @@
+from utils import database, seed, measure, report
+from django.db.models import Value, DecimalField, ExpressionWrapper, OuterRef, Exists, Count, Q
+from recipeAPIapp.models.categorical import UserIngredient
+from recipeAPIapp.models.recipe import Recipe, RecipeIngredient
+from recipeAPIapp.models.recipe import SubmitStatuses as Statuses
+import recipeAPIapp.utils.cookable as cookable
+
+
+
+def correlated(user, servings, max_missing):
+    """ Per-recipe correlated subquery counting missing ingredients """
+    servings_value = Value(servings, output_field=DecimalField())
+    expression = ExpressionWrapper(OuterRef('amount') * servings_value, output_field=DecimalField())
+    subq = UserIngredient.objects.filter(user=user, ingredient=OuterRef('ingredient'), amount__gte=expression)
+    missing = RecipeIngredient.objects.filter(recipe=OuterRef('pk')).filter(~Exists(subq))
+    qryset = Recipe.objects.filter(submit_status=Statuses.ACCEPTED)
+    qryset = qryset.annotate(missing=Count('recipeingredient', filter=~Q(recipeingredient__in=missing.values('pk'))))
+    return list(qryset.filter(missing__lte=max_missing).order_by('missing').values_list('pk', flat=True))
+
+
+if __name__ == '__main__':
+    teardown = database()
+    try:
+        user = seed(recipes=100000, users=50, ingredients=200, per_recipe=8, ratings=0)
+        inventory = dict(UserIngredient.objects.filter(user=user).values_list('ingredient', 'amount'))
+        index = cookable.CookableIndex()
+        report('Almost cookable search, 100k recipes, 40 owned ingredients', [
+            ('index build', measure(index.build, repeat=3)),
+            ('index search, missing <= 2', measure(lambda: index.search(inventory, 1, 2))),
+            ('index search, missing <= 6', measure(lambda: index.search(inventory, 1, 6))),
+            ('index search, missing share <= 50%', measure(lambda: index.search(inventory, 1, None, 50))),
+            ('correlated subqueries, missing <= 2', measure(lambda: correlated(user, 1, 2), repeat=3)),
+        ])
+        for max_missing in (2, 6):
+            print(f'    {len(index.search(inventory, 1, max_missing))} recipes missing at most {max_missing} ingredients')
+    finally:
+        teardown()
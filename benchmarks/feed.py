@@ -0,0 +1,42 @@
+from utils import database, seed, measure, report
+from django.db.models import Count, Avg
+from recipeAPIapp.models.categorical import Category
+from recipeAPIapp.models.recipe import Recipe
+from recipeAPIapp.models.recipe import SubmitStatuses as Statuses
+import recipeAPIapp.serializers.lean as lean
+import recipeAPIapp.utils.filtering as filtering
+import recipeAPIapp.utils.feed as feed
+
+VDATA = {'page': 1, 'page_size': 20}
+ANNOTATIONS = {'rating_count': Count('rating', distinct=True), 'avg_rating': Avg('rating__stars', distinct=True)}
+
+
+
+def distinct_join(user, vdata):
+    qryset = Recipe.objects.filter(submit_status=Statuses.ACCEPTED)
+    qryset = qryset.filter(categories__in=Category.objects.filter(favoured_by=user)).distinct()
+    qryset = qryset.annotate(**ANNOTATIONS).order_by('-created_at')
+    return filtering.paginate(qryset, vdata, lambda qs: lean.RecipeBaseData(qs, user=user).data)
+
+
+def merged_feed(index, user, vdata, **filters):
+    qryset = Recipe.objects.filter(submit_status=Statuses.ACCEPTED, **filters)
+    ranked = index.merge(list(Category.objects.filter(favoured_by=user).values_list('pk', flat=True)))
+    serialize = lambda qs: lean.RecipeBaseData(qs.annotate(**ANNOTATIONS), user=user).data
+    return filtering.paginate_ranked(qryset, ranked, vdata, serialize, filtered=bool(filters))
+
+
+if __name__ == '__main__':
+    teardown = database()
+    try:
+        user = seed(recipes=100000, users=50, categories=30, ingredients=200, per_recipe=8, ratings=3)
+        user.fav_categories.set(Category.objects.all()[:8])
+        index = feed.CategoryFeed()
+        report('Favourite category feed, 100k recipes, 8 of 30 categories favoured, page 1 of 20', [
+            ('feed build', measure(index.build, repeat=3)),
+            ('DISTINCT join with rating annotations', measure(lambda: distinct_join(user, VDATA), repeat=5)),
+            ('merged feed', measure(lambda: merged_feed(index, user, VDATA))),
+            ('merged feed, prep time filter', measure(lambda: merged_feed(index, user, VDATA, prep_time__lte=30))),
+        ])
+    finally:
+        teardown()
@@ -0,0 +1,33 @@
+""" Compares json render time of stdlib and orjson renderers on filter endpoint payloads """
+import utils
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer as StdlibJSONRenderer
+from rest_framework.test import APIClient
+from recipeAPIapp.utils.rendering import JSONRenderer
+
+
+
+def main():
+    teardown = utils.database()
+    try:
+        utils.seed(recipes=300)
+        client = APIClient()
+        payloads = {
+            'recipe/filter/paged': client.get('/recipe/filter/paged', {'page_size': 100}).data,
+            'rating/filter/paged': client.get('/rating/filter/paged', {'page_size': 100}).data,
+        }
+        stdlib, fast = StdlibJSONRenderer(), JSONRenderer()
+        for name, data in payloads.items():
+            with override_settings(JSON_BACKEND='orjson'):
+                assert fast.render(data) == stdlib.render(data)
+                fast_time = utils.measure(lambda: fast.render(data))
+            utils.report(f'{name} (100 items)', [
+                ('stdlib json', utils.measure(lambda: stdlib.render(data))),
+                ('orjson', fast_time),
+            ])
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
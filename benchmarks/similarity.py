@@ -0,0 +1,36 @@
+import random
+from utils import database, seed, measure, report
+from django.db.models import Count, F, Q
+from recipeAPIapp.models.recipe import Recipe, RecipeIngredient
+from recipeAPIapp.models.recipe import SubmitStatuses as Statuses
+import recipeAPIapp.utils.similarity as similarity
+
+
+
+def self_join(recipe: Recipe, count: int):
+    """ Counts shared ingredients and categories by joining recipe with its features in SQL """
+    ingredients = list(RecipeIngredient.objects.filter(recipe=recipe).values_list('ingredient', flat=True))
+    categories = list(recipe.categories.values_list('pk', flat=True))
+    qryset = Recipe.objects.filter(submit_status=Statuses.ACCEPTED).exclude(pk=recipe.pk)
+    qryset = qryset.annotate(
+        shared_ingredients=Count('recipeingredient', filter=Q(recipeingredient__ingredient__in=ingredients), distinct=True),
+        shared_categories=Count('categories', filter=Q(categories__in=categories), distinct=True),
+    ).annotate(shared=F('shared_ingredients') * 2 + F('shared_categories'))
+    return list(qryset.filter(shared__gt=0).order_by('-shared', '-pk').values_list('pk', flat=True)[:count])
+
+
+if __name__ == '__main__':
+    teardown = database()
+    try:
+        seed(recipes=100000, users=50, categories=30, ingredients=1000, per_recipe=8, ratings=0)
+        rnd = random.Random(0)
+        recipes = list(Recipe.objects.filter(pk__in=rnd.sample(range(1, 100001), 20)))
+        index = similarity.SimilarityIndex()
+        picks = iter(recipes * 100)
+        report('Similar recipes, top 20 of 100k recipes, 8 ingredients and 2 of 30 categories each', [
+            ('index build', measure(index.build, repeat=3)),
+            ('index top 20', measure(lambda: index.similar(next(picks), 20))),
+            ('SQL self join top 20 (unnormalized)', measure(lambda: self_join(next(picks), 20), repeat=3)),
+        ])
+    finally:
+        teardown()
@@ -0,0 +1,84 @@
+import os, sys, time, random, statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recipeAPI.settings')
+
+import django
+django.setup()
+
+from decimal import Decimal
+from django.test.utils import setup_databases, teardown_databases
+from recipeAPIapp.models.user import User
+from recipeAPIapp.models.categorical import Category, Ingredient, UserIngredient
+from recipeAPIapp.models.recipe import Recipe, RecipePhoto, RecipeIngredient, Rating
+from recipeAPIapp.models.recipe import SubmitStatuses as Statuses
+
+
+
+def database():
+    """ Creates throwaway test database, returns teardown callable """
+    config = setup_databases(verbosity=0, interactive=False)
+    return lambda: teardown_databases(config, verbosity=0)
+
+
+def seed(recipes=1000, users=100, categories=30, ingredients=200, per_recipe=8, ratings=3, seed=0):
+    """ Fills database with random accepted content """
+    rnd = random.Random(seed)
+    User.objects.bulk_create([
+        User(email=f'user{i}@example.com', name=f'User {i}', photo=f'user/{i}.jpg') for i in range(users)
+    ])
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    Category.objects.bulk_create([
+        Category(name=f'Category {i}', photo=f'category/{i}.jpg') for i in range(categories)
+    ])
+    category_ids = list(Category.objects.values_list('pk', flat=True))
+    Ingredient.objects.bulk_create([
+        Ingredient(name=f'Ingredient {i}', unit='g', photo=f'ingredient/{i}.jpg') for i in range(ingredients)
+    ])
+    ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+    Recipe.objects.bulk_create([
+        Recipe(
+            user_id=rnd.choice(user_ids), name=f'Recipe {i}', title=f'Title of recipe number {i}',
+            prep_time=rnd.randint(5, 180), calories=rnd.randint(50, 1500), submit_status=Statuses.ACCEPTED
+        ) for i in range(recipes)
+    ], batch_size=500)
+    recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+    through = Recipe.categories.through
+    through.objects.bulk_create([
+        through(recipe_id=recipe_id, category_id=category_id)
+        for recipe_id in recipe_ids for category_id in rnd.sample(category_ids, 2)
+    ], batch_size=500)
+    RecipePhoto.objects.bulk_create([
+        RecipePhoto(recipe_id=recipe_id, photo=f'recipe/{recipe_id}.jpg', number=1) for recipe_id in recipe_ids
+    ], batch_size=500)
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(recipe_id=recipe_id, ingredient_id=ingredient_id, amount=Decimal(rnd.randint(1, 500)) / 10)
+        for recipe_id in recipe_ids for ingredient_id in rnd.sample(ingredient_ids, per_recipe)
+    ], batch_size=500)
+    Rating.objects.bulk_create([
+        Rating(user_id=user_id, recipe_id=recipe_id, stars=rnd.randint(0, 5), content='Rating content text.')
+        for recipe_id in recipe_ids for user_id in rnd.sample(user_ids, ratings)
+    ], batch_size=500)
+    UserIngredient.objects.bulk_create([
+        UserIngredient(user_id=user_ids[0], ingredient_id=ingredient_id, amount=Decimal(rnd.randint(1, 900)))
+        for ingredient_id in rnd.sample(ingredient_ids, min(40, ingredients))
+    ])
+    return User.objects.get(pk=user_ids[0])
+
+
+def measure(function, repeat=50):
+    """ Returns median run time of function in milliseconds """
+    function()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def report(title, rows):
+    print(title)
+    for name, value in rows:
+        print(f'    {name:<40} {value:10.3f} ms')
@@ -22,18 +22,21 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'recipeAPIapp.utils.metrics.MetricsMiddleware',
+    'recipeAPIapp.utils.compression.CompressionMiddleware',
+    'recipeAPIapp.utils.instrumentation.QueryInstrumentationMiddleware',
 ]
 
 REST_FRAMEWORK = {
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'recipeAPIapp.utils.rendering.JSONParser',
         'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'recipeAPIapp.utils.security.Authentication'
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'recipeAPIapp.utils.rendering.JSONRenderer',
     ],
     'EXCEPTION_HANDLER': 'recipeAPIapp.utils.exception.handler',
 }
@@ -58,7 +61,56 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+JSON_BACKEND = 'orjson' # 'orjson' or 'json', falls back to 'json' if orjson isn't installed
+
+COMPRESSION_MIN_SIZE = 1024 # Bytes, smaller responses are sent uncompressed
+COMPRESSION_CACHE = 'default' # Cache alias for reusing compressed bodies, None disables
+
+QUERY_INSTRUMENTATION = False # Records queries of every request, totals per route are served by metrics/queries
+QUERY_BUDGET = 30 # Queries per request above which a warning is logged
+QUERY_BUDGETS = {} # Budgets of single routes overriding QUERY_BUDGET, e.g. {'recipe/filter/paged': 10}
+QUERY_REPEAT_THRESHOLD = 5 # Statements of the same shape run this many times in one request are logged as N+1 lookups
+QUERY_SLOWEST = 5 # Slowest statements kept per route
+
+METRICS = True # Records request counts, latency and database time per route and cache hits, served by /metrics
+METRICS_DIR = None # Directory every worker process writes its metrics to so /metrics sums them, None serves only the answering process
+METRICS_FLUSH_INTERVAL = 15 # Seconds, how often a worker writes its metrics to METRICS_DIR
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10) # Seconds, upper bounds of latency histogram buckets
+
+SNAPSHOT_CHECK_INTERVAL = 5 # Seconds, how often in-memory indexes look for writes of other processes
+SNAPSHOT_RETENTION = 24 # Hours, changes are kept for incremental index updates, see prunechanges command
+SNAPSHOT_REBUILD_THRESHOLD = 5000 # More pending changes rebuild the index instead of updating it
+
+RECOMMENDATION_COUNT = 100 # Recipes stored per user by recommend command
+RECOMMENDATION_NEIGHBOURS = 50 # Most similar recipes kept per recipe while recommending
+RECOMMENDATION_CHUNK = 1000 # Users scored and written per transaction
+RECOMMENDATION_BLOCK = 500 # Recipes whose neighbours are accumulated together while recommending
+
+FEED_CACHE_CATEGORIES = 5 # Favourite category feeds merged from at least this many categories are cached
+FEED_CACHE_SIZE = 1000 # Most recently used merged feeds kept per process
+
+TRENDING_HALF_LIFE = 72 # Hours after which ratings, favourites and cooks count half towards trending score
+
+COUNTER_FLUSH_INTERVAL = 10 # Seconds, buffered view, cook and trending increments are written at most this long after they arrive
+COUNTER_FLUSH_THRESHOLD = 1000 # Buffered increments written at once, at most this many and at most one interval's are lost if a process crashes
+
+AUTOCOMPLETE_CACHE_LENGTH = 2 # Completions of prefixes up to this long are cached until the next change
+AUTOCOMPLETE_MIN_PREFIX = 2 # Shorter normalized prefixes complete to nothing instead of scanning most of the index
+AUTOCOMPLETE_RANK_INTERVAL = 300 # Seconds, popularity of indexed names is reloaded at least this often, counter updates record no changes
+
+TRIGRAM_SIMILARITY_THRESHOLD = 0.6 # Share of search trigrams a fuzzy match must contain, set as pg_trgm.word_similarity_threshold before PostgreSQL searches
+
+CATALOG_DIR = None # Directory the accepted recipes catalog is written to once and memory mapped by every worker, None keeps it in process memory
+CATALOG_DELTA_LIMIT = 1000 # Recipes changed since the catalog was built kept aside before it is rebuilt
+
 DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
+PHOTO_PROCESSING_WORKERS = 4 # Threads verifying and storing photos of one bulk request
 MEDIA_ROOT = BASE_DIR / 'media/'
 
 LOGGING = {
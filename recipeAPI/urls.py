@@ -5,6 +5,8 @@ import recipeAPIapp.views.auth as AuthViews
 import recipeAPIapp.views.categorical as CategoricalViews
 import recipeAPIapp.views.recipe as RecipeViews
 import recipeAPIapp.views.media as MediaViews
+import recipeAPIapp.views.search as SearchViews
+import recipeAPIapp.views.metrics as MetricsViews
 
 
 urlpatterns = [
@@ -30,29 +32,46 @@ urlpatterns = [
     path('category/<int:category_id>', CategoricalViews.CategoryView.as_view()),
     path('category/change-favourite/<int:category_id>', CategoricalViews.CategoryFavourView.as_view()),
     path('category/filter/paged', CategoricalViews.CategoryFilterView.as_view()),
+    path('category/autocomplete', CategoricalViews.CategoryAutocompleteView.as_view()),
 
     path('ingredient', CategoricalViews.IngredientView.as_view()),
     path('ingredient/<int:ingredient_id>', CategoricalViews.IngredientView.as_view()),
+    path('ingredient/inventory', CategoricalViews.InventorySyncView.as_view()),
     path('ingredient/inventory/<int:ingredient_id>', CategoricalViews.IngredientInventoryView.as_view()),
     path('ingredient/filter/paged', CategoricalViews.IngredientFilterView.as_view()),
+    path('ingredient/autocomplete', CategoricalViews.IngredientAutocompleteView.as_view()),
 
     path('recipe', RecipeViews.RecipeView.as_view()),
     path('recipe/<int:recipe_id>', RecipeViews.RecipeView.as_view()),
+    path('recipe/bulk', RecipeViews.RecipeBulkView.as_view()),
+    path('recipe/bulk/<int:recipe_id>', RecipeViews.RecipeBulkView.as_view()),
     path('recipe/photo/<int:id>', RecipeViews.RecipePhotoView.as_view()),
     path('recipe/instruction/<int:id>', RecipeViews.RecipeInstructionView.as_view()),
+    path('recipe/photo/reorder/<int:recipe_id>', RecipeViews.RecipePhotoReorderView.as_view()),
+    path('recipe/instruction/reorder/<int:recipe_id>', RecipeViews.RecipeInstructionReorderView.as_view()),
     path('recipe/ingredient/<int:recipe_id>/<int:ingredient_id>', RecipeViews.RecipeIngredientView.as_view()),
     path('recipe/submit/<int:recipe_id>', RecipeViews.RecipeSubmitView.as_view()),
     path('recipe/accept/<int:recipe_id>', RecipeViews.RecipeAcceptView.as_view()),
     path('recipe/deny/<int:recipe_id>', RecipeViews.RecipeDenyView.as_view()),
     path('recipe/cook/<int:recipe_id>', RecipeViews.RecipeCookView.as_view()),
+    path('recipe/plan', RecipeViews.RecipePlanView.as_view()),
     path('recipe/change-favourite/<int:recipe_id>', RecipeViews.RecipeFavourView.as_view()),
     path('recipe/detail/<int:recipe_id>', RecipeViews.RecipeDetailView.as_view()),
+    path('recipe/similar/<int:recipe_id>', RecipeViews.RecipeSimilarView.as_view()),
+    path('recipe/recommended', RecipeViews.RecipeRecommendedView.as_view()),
+    path('recipe/random', RecipeViews.RecipeRandomView.as_view()),
     path('recipe/filter/paged', RecipeViews.RecipeFilterView.as_view()),
+    path('recipe/autocomplete', RecipeViews.RecipeAutocompleteView.as_view()),
 
     path('rating/<int:id>', RecipeViews.RatingView.as_view()),
     path('rating/change-liked/<int:rating_id>', RecipeViews.RatingLikeView.as_view()),
     path('rating/filter/paged', RecipeViews.RatingFilterView.as_view()),
 
+    path('search', SearchViews.SearchView.as_view()),
+
+    path('metrics', MetricsViews.MetricsView.as_view()),
+    path('metrics/queries', MetricsViews.QueryMetricsView.as_view()),
+
 ]
 
 if settings.DEFAULT_FILE_STORAGE == 'django.core.files.storage.FileSystemStorage':
@@ -17,8 +17,16 @@ class Config(AppConfig):
     class ContentLimits:
         """ (pieces, per hours) """
         inventory_limit = 50
+        plan_recipes = 25
         email_code = (7, 1)
         recipe = (5, 24)
         recipe_moderator = (20, 24)
         rating = (15, 24)
         report = (15, 24)
+
+    def ready(self):
+        import recipeAPIapp.utils.changes
+        import recipeAPIapp.utils.stats
+        import recipeAPIapp.utils.trigram
+        import recipeAPIapp.utils.fulltext
+        import recipeAPIapp.utils.search
@@ -0,0 +1,15 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from recipeAPIapp.models.timestamp import utc_now
+from recipeAPIapp.models.change import Change
+
+
+
+class Command(BaseCommand):
+    help = "Deletes changes older than SNAPSHOT_RETENTION, in-memory indexes older than that rebuild instead"
+
+    def handle(self, *args, **options):
+        start_dtm = utc_now() - timedelta(hours=settings.SNAPSHOT_RETENTION)
+        deleted, _ = Change.objects.filter(created_at__lt=start_dtm).delete()
+        self.stdout.write(f"Deleted {deleted} changes.")
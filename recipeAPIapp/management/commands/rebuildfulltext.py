@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+import recipeAPIapp.utils.fulltext as fulltext
+import recipeAPIapp.utils.search as search
+
+
+
+class Command(BaseCommand):
+    help = "Refills full text tables of recipe names and titles, rating contents and the shared search table"
+
+    def handle(self, *args, **options):
+        count = fulltext.rebuild()
+        entries = search.rebuild()
+        self.stdout.write(f"Indexed full text of {count} objects and {entries} search entries.")
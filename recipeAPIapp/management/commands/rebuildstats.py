@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+import recipeAPIapp.utils.stats as stats
+
+
+
+class Command(BaseCommand):
+    help = "Recomputes maintained user statistics from recipes, ratings and reports"
+
+    def handle(self, *args, **options):
+        count = stats.rebuild()
+        self.stdout.write(f"Rebuilt statistics of {count} users.")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+import recipeAPIapp.utils.trigram as trigram
+
+
+
+class Command(BaseCommand):
+    help = "Recreates trigram posting lists of recipe, category and ingredient names used by fuzzy search"
+
+    def handle(self, *args, **options):
+        count = trigram.rebuild()
+        self.stdout.write(f"Indexed trigrams of {count} objects.")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+import recipeAPIapp.utils.recommendation as recommendation
+
+
+
+class Command(BaseCommand):
+    help = "Recomputes recommended recipes of users from favourites and ratings, and the popularity ranking"
+
+    def handle(self, *args, **options):
+        users = recommendation.run()
+        self.stdout.write(f"Recommended recipes to {users} users.")
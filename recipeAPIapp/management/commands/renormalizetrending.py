@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+import recipeAPIapp.utils.trending as trending
+
+
+
+class Command(BaseCommand):
+    help = "Moves trending scores epoch to now, keeps scores of new events from growing without bound"
+
+    def handle(self, *args, **options):
+        trending.renormalize()
+        self.stdout.write("Renormalized trending scores.")
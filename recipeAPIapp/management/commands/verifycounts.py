@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+import recipeAPIapp.utils.stats as stats
+
+
+
+class Command(BaseCommand):
+    help = "Recomputes accepted recipe counts of categories and ingredients and reports drifted ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Overwrites drifted counts with recomputed ones")
+
+    def handle(self, *args, **options):
+        drift = stats.verify(fix=options['fix'])
+        for model, pk, stored, recomputed in drift:
+            self.stdout.write(f"{model.__name__} {pk} - stored {stored}, recomputed {recomputed}")
+        action = "Fixed" if options['fix'] else "Found"
+        self.stdout.write(f"{action} {len(drift)} drifted recipe counts.")
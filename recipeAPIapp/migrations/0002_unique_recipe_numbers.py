@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def renumber(apps, schema_editor):
+    """ Closes gaps and duplicates left by row by row renumbering before the constraint is added """
+    for name in ('RecipePhoto', 'RecipeInstruction'):
+        model = apps.get_model('recipeAPIapp', name)
+        previous, number = None, 0
+        for item in model.objects.order_by('recipe_id', 'number', 'pk'):
+            number = number + 1 if item.recipe_id == previous else 1
+            previous = item.recipe_id
+            if item.number != number:
+                model.objects.filter(pk=item.pk).update(number=number)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipeAPIapp', '0001_initial'),
+    ]
+    operations = [
+        migrations.RunPython(renumber, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='recipeinstruction',
+            unique_together={('recipe', 'number')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='recipephoto',
+            unique_together={('recipe', 'number')},
+        ),
+    ]
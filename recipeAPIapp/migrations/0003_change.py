@@ -0,0 +1,22 @@
+import recipeAPIapp.models.timestamp
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipeAPIapp', '0002_unique_recipe_numbers'),
+    ]
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=recipeAPIapp.models.timestamp.utc_now)),
+                ('topic', models.CharField(max_length=20)),
+                ('key', models.BigIntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['topic', 'id'], name='recipeAPIap_topic_936638_idx'), models.Index(fields=['created_at'], name='recipeAPIap_created_b84bc7_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+import django.db.models.deletion
+import recipeAPIapp.models.timestamp
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipeAPIapp', '0003_change'),
+    ]
+    operations = [
+        migrations.CreateModel(
+            name='Recommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=recipeAPIapp.models.timestamp.utc_now)),
+                ('rank', models.IntegerField()),
+                ('score', models.FloatField()),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendation', to='recipeAPIapp.recipe')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='recommendation', to='recipeAPIapp.user')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'rank'], name='recipeAPIap_user_id_9a7903_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+import math, time
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    """ Starts scores relative to now from ratings, favourites and cooks of the past are not timestamped """
+    now = time.time()
+    tau = settings.TRENDING_HALF_LIFE * 3600 / math.log(2)
+    apps.get_model('recipeAPIapp', 'TrendingEpoch').objects.create(epoch=now)
+    Recipe = apps.get_model('recipeAPIapp', 'Recipe')
+    Rating = apps.get_model('recipeAPIapp', 'Rating')
+    scores = {}
+    for recipe_id, created_at in Rating.objects.values_list('recipe', 'created_at').iterator():
+        scores[recipe_id] = scores.get(recipe_id, 0) + math.exp((created_at.timestamp() - now) / tau)
+    for recipe_id, score in scores.items():
+        Recipe.objects.filter(pk=recipe_id).update(trending=score)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipeAPIapp', '0004_recommendation'),
+    ]
+    operations = [
+        migrations.CreateModel(
+            name='TrendingEpoch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('epoch', models.FloatField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['submit_status', 'trending'], name='recipeAPIap_submit__c3f782_idx'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
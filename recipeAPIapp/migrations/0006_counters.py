@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipeAPIapp', '0005_trending'),
+    ]
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='cook_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='view_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
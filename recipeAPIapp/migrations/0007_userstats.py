@@ -0,0 +1,38 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    User = apps.get_model('recipeAPIapp', 'User')
+    Recipe = apps.get_model('recipeAPIapp', 'Recipe')
+    Rating = apps.get_model('recipeAPIapp', 'Rating')
+    UserReport = apps.get_model('recipeAPIapp', 'UserReport')
+    UserStats = apps.get_model('recipeAPIapp', 'UserStats')
+    stats = {pk: UserStats(user_id=pk) for pk in User.objects.values_list('pk', flat=True)}
+    for user_id in Recipe.objects.filter(submit_status='ACCEPTED').values_list('user', flat=True).iterator():
+        stats[user_id].recipe_count += 1
+    for user_id, stars in Rating.objects.values_list('recipe__user', 'stars').iterator():
+        stats[user_id].rating_count += 1
+        stats[user_id].rating_sum += stars
+    for user_id in UserReport.objects.values_list('reported', flat=True).iterator():
+        stats[user_id].report_count += 1
+    UserStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipeAPIapp', '0006_counters'),
+    ]
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='recipeAPIapp.user')),
+                ('recipe_count', models.IntegerField(default=0)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('report_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
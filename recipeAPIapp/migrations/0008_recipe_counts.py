@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    Recipe = apps.get_model('recipeAPIapp', 'Recipe')
+    RecipeIngredient = apps.get_model('recipeAPIapp', 'RecipeIngredient')
+    Category = apps.get_model('recipeAPIapp', 'Category')
+    Ingredient = apps.get_model('recipeAPIapp', 'Ingredient')
+    rows = Recipe.categories.through.objects.filter(recipe__submit_status='ACCEPTED')
+    for category_id, count in rows.values_list('category').annotate(count=models.Count('pk')):
+        Category.objects.filter(pk=category_id).update(recipe_count=count)
+    rows = RecipeIngredient.objects.filter(recipe__submit_status='ACCEPTED')
+    for ingredient_id, count in rows.values_list('ingredient').annotate(count=models.Count('pk')):
+        Ingredient.objects.filter(pk=ingredient_id).update(recipe_count=count)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipeAPIapp', '0007_userstats'),
+    ]
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='recipe_count',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
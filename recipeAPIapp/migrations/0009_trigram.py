@@ -0,0 +1,60 @@
+import re, unicodedata
+from django.db import migrations, models
+
+SEARCHED = {'recipe': ('name', 'title'), 'category': ('name',), 'ingredient': ('name',)}
+
+
+def trigrams(text):
+    """ Copy of utils.trigram.trigrams as of this migration, so later changes there do not alter it """
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    text = ' '.join(re.sub(r"[^\w\s]", " ", text).split())
+    return {f'  {word} '[i:i + 3] for word in text.split(' ') if word for i in range(len(word) + 1)}
+
+
+def index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for model_name, fields in SEARCHED.items():
+            table = apps.get_model('recipeAPIapp', model_name)._meta.db_table
+            for field in fields:
+                schema_editor.execute(
+                    f'CREATE INDEX "{table}_{field}_trgm" ON "{table}" USING gin ("{field}" gin_trgm_ops)'
+                )
+        return
+    Trigram = apps.get_model('recipeAPIapp', 'Trigram')
+    for model_name, fields in SEARCHED.items():
+        for pk, *values in apps.get_model('recipeAPIapp', model_name).objects.values_list('pk', *fields).iterator():
+            Trigram.objects.bulk_create([
+                Trigram(topic=f'{model_name}.{field}', trigram=trigram, key=pk)
+                for field, value in zip(fields, values) for trigram in trigrams(value)
+            ])
+
+
+def unindex(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for model_name, fields in SEARCHED.items():
+            table = apps.get_model('recipeAPIapp', model_name)._meta.db_table
+            for field in fields:
+                schema_editor.execute(f'DROP INDEX IF EXISTS "{table}_{field}_trgm"')
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipeAPIapp', '0008_recipe_counts'),
+    ]
+    operations = [
+        migrations.CreateModel(
+            name='Trigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=30)),
+                ('trigram', models.CharField(max_length=3)),
+                ('key', models.BigIntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['topic', 'trigram', 'key'], name='recipeAPIap_topic_476052_idx'), models.Index(fields=['key', 'topic'], name='recipeAPIap_key_061ee2_idx')],
+            },
+        ),
+        migrations.RunPython(index, unindex),
+    ]
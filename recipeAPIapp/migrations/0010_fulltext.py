@@ -0,0 +1,29 @@
+from django.db import migrations
+
+SEARCHED = {'recipe': ('recipe_fts', ('name', 'title')), 'rating': ('rating_fts', ('content',))}
+
+
+def create(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    for model_name, (table, fields) in SEARCHED.items():
+        columns = ', '.join(fields)
+        source = apps.get_model('recipeAPIapp', model_name)._meta.db_table
+        schema_editor.execute(f"CREATE VIRTUAL TABLE {table} USING fts5({columns}, tokenize='unicode61 remove_diacritics 2')")
+        schema_editor.execute(f'INSERT INTO {table} (rowid, {columns}) SELECT id, {columns} FROM "{source}"')
+
+
+def drop(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    for table, _ in SEARCHED.values():
+        schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipeAPIapp', '0009_trigram'),
+    ]
+    operations = [
+        migrations.RunPython(create, drop),
+    ]
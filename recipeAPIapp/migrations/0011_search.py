@@ -0,0 +1,34 @@
+from django.db import migrations
+
+TOPICS = (
+    ('recipe', {'submit_status': 'ACCEPTED'}, ('name', 'title')),
+    ('category', {}, ('name',)),
+    ('ingredient', {}, ('name',)),
+    ('user', {'banned': False}, ('name',)),
+)
+
+
+def create(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    schema_editor.execute("CREATE VIRTUAL TABLE search_fts USING fts5(name, title, tokenize='unicode61 remove_diacritics 2')")
+    with schema_editor.connection.cursor() as cursor:
+        for index, (model_name, condition, fields) in enumerate(TOPICS):
+            rows = apps.get_model('recipeAPIapp', model_name).objects.filter(**condition).values_list('pk', *fields)
+            cursor.executemany('INSERT INTO search_fts (rowid, name, title) VALUES (%s, %s, %s)', [
+                (pk * len(TOPICS) + index, *values, *[''] * (2 - len(values))) for pk, *values in rows
+            ])
+
+
+def drop(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.execute('DROP TABLE IF EXISTS search_fts')
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipeAPIapp', '0010_fulltext'),
+    ]
+    operations = [
+        migrations.RunPython(create, drop),
+    ]
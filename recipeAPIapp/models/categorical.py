@@ -2,21 +2,26 @@ from decimal import Decimal
 from django.db import models
 from django.core.validators import MinValueValidator, MinLengthValidator
 from recipeAPIapp.models.user import User
+from recipeAPIapp.models.maintained import Maintained
 
 
 
-class Category(models.Model):
+class Category(Maintained):
+    maintained = ('recipe_count',)
     favoured_by = models.ManyToManyField(User, related_name='fav_categories')
     photo = models.ImageField(upload_to='category/')
     name = models.CharField(max_length=75, unique=True, validators=[MinLengthValidator(2)])
     about = models.CharField(max_length=200, null=True, blank=True)
+    recipe_count = models.IntegerField(default=0, db_index=True)
 
 
-class Ingredient(models.Model):
+class Ingredient(Maintained):
+    maintained = ('recipe_count',)
     photo = models.ImageField(upload_to='ingredient/')
     name = models.CharField(max_length=75, unique=True, validators=[MinLengthValidator(2)])
     unit = models.CharField(max_length=10)
     about = models.CharField(max_length=200, null=True, blank=True)
+    recipe_count = models.IntegerField(default=0, db_index=True)
 
 
 class UserIngredient(models.Model):
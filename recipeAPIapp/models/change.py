@@ -0,0 +1,11 @@
+from django.db import models
+from recipeAPIapp.models.timestamp import Timestamped
+
+
+
+class Change(Timestamped):
+    """ Key of written object, read by in-memory snapshots to update themselves """
+    topic = models.CharField(max_length=20)
+    key = models.BigIntegerField()
+    class Meta:
+        indexes = [models.Index(fields=['topic', 'id']), models.Index(fields=['created_at'])]
@@ -0,0 +1,40 @@
+from django.db import models
+from django.db.models import DEFERRED
+
+
+
+def changed(instance: models.Model, fields) -> bool:
+    """ Tells whether any of fields may differ from the value object was loaded or last saved with """
+    stored = getattr(instance, '_stored', None)
+    return stored is None or any(field not in stored or stored[field] != getattr(instance, field) for field in fields)
+
+
+class Tracked(models.Model):
+    """ Model keeping values objects were loaded or last saved with, so receivers can skip work for unchanged fields """
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored = {name: value for name, value in zip(field_names, values) if value is not DEFERRED}
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._stored = {field.attname: self.__dict__[field.attname] for field in self._meta.concrete_fields if field.attname in self.__dict__}
+    class Meta:
+        abstract = True
+
+
+class Maintained(Tracked):
+    """
+        Model with columns written only by queryset updates (buffered counters, denormalized counts),
+        saves of loaded objects leave them out, so values read before a concurrent update aren't written back
+    """
+    maintained = ()
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None and not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            fields = self._meta.concrete_fields
+            kwargs['update_fields'] = [field.name for field in fields if not field.primary_key and field.name not in self.maintained]
+        super().save(*args, **kwargs)
+    class Meta:
+        abstract = True
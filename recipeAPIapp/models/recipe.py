@@ -2,6 +2,7 @@ from decimal import Decimal
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator, MinLengthValidator
 from recipeAPIapp.models.timestamp import Timestamped, EditTimestamped
+from recipeAPIapp.models.maintained import Maintained
 from recipeAPIapp.models.user import User
 from recipeAPIapp.models.categorical import Category, Ingredient
 
@@ -14,7 +15,8 @@ class SubmitStatuses:
     ACCEPTED = 'ACCEPTED'
 
 
-class Recipe(Timestamped):
+class Recipe(Timestamped, Maintained):
+    maintained = ('trending', 'view_count', 'cook_count')
     favoured_by = models.ManyToManyField(User, related_name='fav_recipes')
     categories = models.ManyToManyField(Category, related_name='recipes')
     submit_status = models.CharField(default=SubmitStatuses.UNSUBMITTED, max_length=20)
@@ -24,12 +26,24 @@ class Recipe(Timestamped):
     title = models.CharField(max_length=200, validators=[MinLengthValidator(10)])
     prep_time = models.IntegerField(validators=[MinValueValidator(0)])
     calories = models.IntegerField(validators=[MinValueValidator(0)])
+    trending = models.FloatField(default=0)
+    view_count = models.IntegerField(default=0)
+    cook_count = models.IntegerField(default=0)
+    class Meta:
+        indexes = [models.Index(fields=['submit_status', 'trending'])]
+
+
+class TrendingEpoch(models.Model):
+    """ Time in seconds trending scores are relative to, single row moved forward by renormalizetrending command """
+    epoch = models.FloatField()
 
 
 class RecipePhoto(models.Model):
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='recipephoto')
     photo = models.ImageField(upload_to='recipe/')
     number = models.IntegerField(default=1, validators=[MinValueValidator(1)])
+    class Meta:
+        unique_together = ('recipe', 'number')
 
 
 class RecipeInstruction(models.Model):
@@ -38,6 +52,8 @@ class RecipeInstruction(models.Model):
     number = models.IntegerField(default=1, validators=[MinValueValidator(1)])
     title = models.CharField(max_length=100, validators=[MinLengthValidator(5)])
     content = models.CharField(max_length=2000, validators=[MinLengthValidator(25)])
+    class Meta:
+        unique_together = ('recipe', 'number')
 
 
 class RecipeIngredient(models.Model):
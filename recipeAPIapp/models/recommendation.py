@@ -0,0 +1,15 @@
+from django.db import models
+from recipeAPIapp.models.timestamp import Timestamped
+from recipeAPIapp.models.user import User
+from recipeAPIapp.models.recipe import Recipe
+
+
+
+class Recommendation(Timestamped):
+    """ Recipe ranked for user by recommend command, rows without user rank recipes by popularity """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, related_name='recommendation')
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='recommendation')
+    rank = models.IntegerField()
+    score = models.FloatField()
+    class Meta:
+        indexes = [models.Index(fields=['user', 'rank'])]
@@ -0,0 +1,11 @@
+from django.db import models
+
+
+
+class Trigram(models.Model):
+    """ Trigram of searched field of object, posting lists for fuzzy search on databases without pg_trgm """
+    topic = models.CharField(max_length=30)
+    trigram = models.CharField(max_length=3)
+    key = models.BigIntegerField()
+    class Meta:
+        indexes = [models.Index(fields=['topic', 'trigram', 'key']), models.Index(fields=['key', 'topic'])]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.core.validators import MinLengthValidator
 from recipeAPIapp.models.timestamp import Timestamped
+from recipeAPIapp.models.maintained import Tracked
 
 
 
@@ -17,7 +18,7 @@ class UserAuthentication(models.Model):
         abstract = True
 
 
-class User(UserAuthentication, Timestamped):
+class User(UserAuthentication, Timestamped, Tracked):
     photo = models.ImageField(upload_to='user/', null=True, blank=True)
     email = models.EmailField(unique=True)
     name = models.CharField(max_length=75, validators=[MinLengthValidator(3)])
@@ -33,3 +34,12 @@ class UserReport(Timestamped):
 
 class EmailRecord(Timestamped):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='emailrecord')
+
+
+class UserStats(models.Model):
+    """ Aggregates of user's content maintained by utils/stats.py, recomputed by rebuildstats command """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    recipe_count = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    report_count = models.IntegerField(default=0)
@@ -46,6 +46,7 @@ class CategoryData(serializers.ModelSerializer):
 class CategoryFilter(serializers.Serializer):
     favoured = serializers.BooleanField(default=False)
     search_string = serializers.CharField(required=False)
+    fuzzy = serializers.BooleanField(default=False)
     order_by = serializers.ListField(child=serializers.CharField(), required=False)
     order_time_window = serializers.IntegerField(min_value=1, required=False)
     page = serializers.IntegerField(default=1, min_value=1)
@@ -99,6 +100,65 @@ class IngredientInventorySerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class InventoryItemSerializer(serializers.Serializer):
+    ingredient = serializers.IntegerField()
+    amount = serializers.DecimalField(max_digits=5, decimal_places=2)
+    absolute = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        data = super().validate(data)
+        if data['absolute'] and data['amount'] < 0:
+            raise serializers.ValidationError("absolute amount can't be negative.")
+        return data
+
+
+class InventorySyncSerializer(serializers.Serializer):
+    """ Resolves batch of deltas and absolute amounts into rows to upsert and ingredients to remove """
+    items = InventoryItemSerializer(many=True, allow_empty=False)
+
+    def __init__(self, *args, user: User, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+
+    def validate_items(self, value):
+        ids = [item['ingredient'] for item in value]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError("duplicate ingredients.")
+        existing = set(Ingredient.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        for pk in ids:
+            if pk not in existing:
+                raise serializers.ValidationError(f'Invalid pk "{pk}" - object does not exist.')
+        return value
+
+    def validate(self, data):
+        data = super().validate(data)
+        User.objects.select_for_update().filter(pk=self.user.pk).exists()
+        owned = dict(UserIngredient.objects.filter(user=self.user).values_list('ingredient', 'amount'))
+        self.upserts, self.removals = {}, []
+        for item in data['items']:
+            pk = item['ingredient']
+            amount = item['amount'] if item['absolute'] else owned.get(pk, Decimal(0)) + item['amount']
+            if amount <= 0:
+                if pk in owned:
+                    self.removals.append(pk)
+                continue
+            if not AmountValueSerializer(data={'amount': amount}).is_valid():
+                raise serializers.ValidationError(f"amount of ingredient {pk} out of range.")
+            self.upserts[pk] = amount
+        created = set(self.upserts) - set(owned)
+        if created and len(owned) - len(self.removals) + len(created) > Config.ContentLimits.inventory_limit:
+            raise serializers.ValidationError("inventory limit exceeded.")
+        return data
+
+    def save(self):
+        UserIngredient.objects.bulk_create(
+            [UserIngredient(user=self.user, ingredient_id=pk, amount=amount) for pk, amount in self.upserts.items()],
+            update_conflicts=True, unique_fields=['user', 'ingredient'], update_fields=['amount']
+        )
+        if self.removals:
+            UserIngredient.objects.filter(user=self.user, ingredient__in=self.removals).delete()
+
+
 class IngredientSmallData(serializers.ModelSerializer):
     class Meta:
         model = Ingredient
@@ -129,10 +189,19 @@ class IngredientData(IngredientSmallData):
         return None
 
 
+class InventoryData(serializers.ModelSerializer):
+    ingredient = IngredientSmallData()
+
+    class Meta:
+        model = UserIngredient
+        fields = ('ingredient', 'amount')
+
+
 class IngredientFilter(serializers.Serializer):
     owned = serializers.BooleanField(default=False)
     used = serializers.BooleanField(default=False)
     search_string = serializers.CharField(required=False)
+    fuzzy = serializers.BooleanField(default=False)
     order_by = serializers.ListField(child=serializers.CharField(), required=False)
     order_time_window = serializers.IntegerField(min_value=1, required=False)
     page = serializers.IntegerField(default=1, min_value=1)
@@ -140,3 +209,8 @@ class IngredientFilter(serializers.Serializer):
 
     def validate_order_by(self, value):
         return validation.order_by(value, ['name', 'recipe_count', 'self_recipe_count'])
+
+
+class AutocompleteFilter(serializers.Serializer):
+    q = serializers.CharField(max_length=75)
+    count = serializers.IntegerField(default=10, min_value=1, max_value=50)
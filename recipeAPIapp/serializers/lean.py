@@ -0,0 +1,243 @@
+from decimal import Decimal
+from operator import itemgetter
+from django.db.models import Manager, Exists, OuterRef, Subquery, Case, When, Value, F, CharField
+from rest_framework import fields
+import recipeAPIapp.serializers.categorical as categorical_serializers
+import recipeAPIapp.serializers.recipe as recipe_serializers
+import recipeAPIapp.serializers.user as user_serializers
+from recipeAPIapp.models.user import User
+from recipeAPIapp.models.categorical import Category, Ingredient, UserIngredient
+from recipeAPIapp.models.recipe import Recipe, RecipePhoto, Rating
+
+
+
+datetime = fields.DateTimeField().to_representation
+
+
+def url(model):
+    """ Converts stored file name to url the same way as serializers.ImageField """
+    storage = model._meta.get_field('photo').storage
+    return lambda name: storage.url(name) if name else None
+
+
+def amount(model):
+    """ Converts annotated decimal to string the same way as model's loaded DecimalField """
+    exponent = Decimal(1).scaleb(-model._meta.get_field('amount').decimal_places)
+    return lambda value: str(value.quantize(exponent))
+
+
+class Column:
+    """ Output field read from one fetched column, optionally computed by annotation """
+    def __init__(self, lookup: str, convert=None, annotate=None):
+        self.lookup = lookup
+        self.convert = convert
+        self.annotate = annotate
+
+
+class Nested:
+    """ Output field assembled by other lean serializer from columns of related object """
+    def __init__(self, relation: str, serializer):
+        self.relation = relation
+        self.serializer = serializer
+
+
+class LeanSerializer:
+    """
+        Serializes queryset from values_list rows using field plan precomputed from serializer's Meta.fields,
+        output is identical to the one of the serializer
+    """
+    serializer = None
+    columns = {}
+    compiled = {}
+
+    def __init__(self, qryset: Manager, user: User = None, fields: tuple[str] = None):
+        self.qryset = qryset
+        self.user = user
+        self.flat, self.assemble = self.compile(tuple(fields) if fields is not None else None)
+
+    @classmethod
+    def plan(cls, fields=None):
+        return [(name, cls.columns[name]) for name in cls.serializer.Meta.fields if fields is None or name in fields]
+
+    @classmethod
+    def flatten(cls, fields=None, prefix='', outer='pk'):
+        """ Yields (column path, outer reference path, column) in plan order """
+        for _, column in cls.plan(fields):
+            if isinstance(column, Nested):
+                yield from column.serializer.flatten(None, f'{prefix}{column.relation}__', f'{prefix}{column.relation}')
+            else:
+                yield f'{prefix}{column.lookup}', outer, column
+
+    @classmethod
+    def assembler(cls, indexes, fields=None):
+        getters = []
+        for name, column in cls.plan(fields):
+            if isinstance(column, Nested):
+                getters.append((name, column.serializer.assembler(indexes)))
+            elif column.convert is None:
+                getters.append((name, itemgetter(next(indexes))))
+            else:
+                index, convert = next(indexes), column.convert
+                getters.append((name, lambda row, i=index, c=convert: None if row[i] is None else c(row[i])))
+        return lambda row: {name: getter(row) for name, getter in getters}
+
+    @classmethod
+    def compile(cls, fields=None):
+        """ Returns cached (flattened columns, row assembler) for selected fields """
+        key = (cls, fields)
+        if key not in LeanSerializer.compiled:
+            flat = list(cls.flatten(fields))
+            LeanSerializer.compiled[key] = flat, cls.assembler(iter(range(len(flat))), fields)
+        return LeanSerializer.compiled[key]
+
+    @property
+    def data(self):
+        lookups, annotations = [], {}
+        for path, outer, column in self.flat:
+            if column.annotate is None:
+                lookups.append(path)
+            else:
+                alias = f"lean_{path.replace('__', '_')}"
+                expression = column.annotate(self.user, outer)
+                annotations[alias] = expression if expression is not None else Value(None, output_field=CharField())
+                lookups.append(alias)
+        rows = self.qryset.annotate(**annotations).values_list(*(lookups or ['pk']))
+        return [self.assemble(row) for row in rows]
+
+
+def first_photo(_, outer):
+    return Subquery(RecipePhoto.objects.filter(recipe=OuterRef(outer)).order_by('number').values('photo')[:1])
+
+
+def favoured(model):
+    through = model.favoured_by.through
+    related = f'{model._meta.model_name}_id'
+    def annotate(user, outer):
+        if isinstance(user, User):
+            return Exists(through.objects.filter(user_id=user.pk, **{related: OuterRef(outer)}))
+        return None
+    return annotate
+
+
+def liked(user, outer):
+    if isinstance(user, User):
+        return Exists(Rating.liked_by.through.objects.filter(user_id=user.pk, rating_id=OuterRef(outer)))
+    return None
+
+
+def deny_message(user, _):
+    if isinstance(user, User):
+        return Case(When(user_id=user.pk, then=F('deny_message')), default=Value(None), output_field=CharField())
+    return None
+
+
+def self_amount(user, outer):
+    if isinstance(user, User):
+        return Subquery(UserIngredient.objects.filter(user=user, ingredient=OuterRef(outer)).values('amount')[:1])
+    return None
+
+
+class UserSmallData(LeanSerializer):
+    serializer = user_serializers.UserSmallData
+    columns = {
+        'id': Column('id'),
+        'photo': Column('photo', url(User)),
+        'name': Column('name'),
+        'created_at': Column('created_at', datetime),
+    }
+
+
+class UserFilterData(LeanSerializer):
+    serializer = user_serializers.UserFilterData
+    columns = UserSmallData.columns | {
+        'rating_count': Column('rating_count'),
+        'recipe_count': Column('recipe_count'),
+        'avg_rating': Column('avg_rating', float),
+    }
+
+
+class UserModeratorFilterData(UserFilterData):
+    serializer = user_serializers.UserModeratorFilterData
+    columns = UserFilterData.columns | {
+        'moderator': Column('moderator', bool),
+        'report_count': Column('report_count'),
+    }
+
+
+class CategoryData(LeanSerializer):
+    serializer = categorical_serializers.CategoryData
+    columns = {
+        'id': Column('id'),
+        'photo': Column('photo', url(Category)),
+        'name': Column('name'),
+        'about': Column('about'),
+        'recipe_count': Column('recipe_count'),
+        'self_recipe_count': Column('self_recipe_count'),
+        'favoured': Column('favoured', annotate=favoured(Category)),
+    }
+
+
+class IngredientData(LeanSerializer):
+    serializer = categorical_serializers.IngredientData
+    columns = {
+        'id': Column('id'),
+        'photo': Column('photo', url(Ingredient)),
+        'unit': Column('unit'),
+        'name': Column('name'),
+        'about': Column('about'),
+        'recipe_count': Column('recipe_count'),
+        'self_recipe_count': Column('self_recipe_count'),
+        'self_amount': Column('self_amount', amount(UserIngredient), annotate=self_amount),
+    }
+
+
+class RecipeSmallData(LeanSerializer):
+    serializer = recipe_serializers.RecipeSmallData
+    columns = {
+        'id': Column('id'),
+        'photo': Column('photo', url(RecipePhoto), annotate=first_photo),
+        'user': Nested('user', UserSmallData),
+        'name': Column('name'),
+        'title': Column('title'),
+        'prep_time': Column('prep_time'),
+        'calories': Column('calories'),
+        'created_at': Column('created_at', datetime),
+    }
+
+
+class RecipeBaseData(RecipeSmallData):
+    serializer = recipe_serializers.RecipeBaseData
+    columns = RecipeSmallData.columns | {
+        'submit_status': Column('submit_status'),
+        'deny_message': Column('deny_message', annotate=deny_message),
+        'rating_count': Column('rating_count'),
+        'avg_rating': Column('avg_rating', float),
+        'favoured': Column('favoured', annotate=favoured(Recipe)),
+    }
+
+
+class RatingAbstractData(LeanSerializer):
+    columns = {
+        'id': Column('id'),
+        'photo': Column('photo', url(Rating)),
+        'stars': Column('stars'),
+        'content': Column('content'),
+        'created_at': Column('created_at', datetime),
+        'edited_at': Column('edited_at', datetime),
+        'like_count': Column('like_count'),
+        'liked': Column('liked', annotate=liked),
+        'user': Nested('user', UserSmallData),
+        'recipe': Nested('recipe', RecipeSmallData),
+    }
+
+
+class RatingRecipeData(RatingAbstractData):
+    serializer = recipe_serializers.RatingRecipeData
+
+
+class RatingUserData(RatingAbstractData):
+    serializer = recipe_serializers.RatingUserData
+
+
+class RatingData(RatingAbstractData):
+    serializer = recipe_serializers.RatingData
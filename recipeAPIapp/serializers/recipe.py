@@ -1,11 +1,18 @@
-from django.db.models import Avg, Min, ExpressionWrapper, IntegerField, DecimalField, Subquery, F, OuterRef, Value, Exists
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.conf import settings
+from django.db.models import Avg, Min, Sum, Case, When, ExpressionWrapper, IntegerField, DecimalField, Subquery, F, OuterRef, Value, Exists
 from django.db.models.functions import Coalesce
+from django.db.models.fields.files import FieldFile
 from rest_framework import serializers
 from rest_framework.request import Request
 import recipeAPIapp.serializers.categorical as categorical_serializers
 import recipeAPIapp.serializers.user as user_serializers
 import recipeAPIapp.utils.permission as permission
 import recipeAPIapp.utils.validation as validation
+import recipeAPIapp.utils.ordering as ordering
+import recipeAPIapp.utils.counters as counters
+import recipeAPIapp.utils.reference as reference
 from recipeAPIapp.apps import Config
 from recipeAPIapp.models.user import User
 from recipeAPIapp.models.timestamp import utc_now
@@ -53,6 +60,7 @@ class RecipePhotoCreateSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         data = super().validate(data)
+        ordering.lock(self.recipe)
         self.photo_count = RecipePhoto.objects.filter(recipe=self.recipe).count()
         if Config.PerRecipeLimits.photos <= self.photo_count:
             raise serializers.ValidationError("photo limit exceeded.")
@@ -60,11 +68,7 @@ class RecipePhotoCreateSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data['recipe'] = self.recipe
-        validated_data['number'] = min(self.photo_count + 1, validated_data['number'])
-        range = {'number__gte': validated_data['number']}
-        for photo in RecipePhoto.objects.filter(recipe=self.recipe, **range):
-            photo.number += 1
-            photo.save()
+        validated_data['number'] = ordering.insert(RecipePhoto, self.recipe, validated_data['number'])
         self.recipe.submit_status = Statuses.UNSUBMITTED
         self.recipe.deny_message = None
         self.recipe.save()
@@ -80,18 +84,8 @@ class RecipePhotoUpdateSerializer(serializers.ModelSerializer):
         return validation.photo(value)
 
     def update(self, instance: RecipePhoto, validated_data):
-        if 'number' in validated_data and validated_data['number'] != instance.number:
-            photo_count = RecipePhoto.objects.filter(recipe=instance.recipe).count()
-            validated_data['number'] = min(photo_count, validated_data['number'])
-            if validated_data['number'] > instance.number:
-                range = {'number__gt': instance.number, 'number__lte': validated_data['number']}
-                movement = -1
-            else:
-                range = {'number__gte': validated_data['number'], 'number__lt': instance.number}
-                movement = 1
-            for photo in RecipePhoto.objects.filter(recipe=instance.recipe, **range):
-                photo.number += movement
-                photo.save()
+        if 'number' in validated_data:
+            validated_data['number'] = ordering.move(instance, validated_data['number'])
         instance.recipe.submit_status = Statuses.UNSUBMITTED
         instance.recipe.deny_message = None
         instance.recipe.save()
@@ -112,6 +106,7 @@ class RecipeInstructionCreateSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         data = super().validate(data)
+        ordering.lock(self.recipe)
         self.instruction_count = RecipeInstruction.objects.filter(recipe=self.recipe).count()
         if Config.PerRecipeLimits.instructions <= self.instruction_count:
             raise serializers.ValidationError("instruction limit exceeded.")
@@ -119,11 +114,7 @@ class RecipeInstructionCreateSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data['recipe'] = self.recipe
-        validated_data['number'] = min(self.instruction_count + 1, validated_data['number'])
-        range = {'number__gte': validated_data['number']}
-        for instruction in RecipeInstruction.objects.filter(recipe=self.recipe, **range):
-            instruction.number += 1
-            instruction.save()
+        validated_data['number'] = ordering.insert(RecipeInstruction, self.recipe, validated_data['number'])
         self.recipe.submit_status = Statuses.UNSUBMITTED
         self.recipe.deny_message = None
         self.recipe.save()
@@ -139,24 +130,36 @@ class RecipeInstructionUpdateSerializer(serializers.ModelSerializer):
         return validation.photo(value)
 
     def update(self, instance: RecipeInstruction, validated_data):
-        if 'number' in validated_data and validated_data['number'] != instance.number:
-            instruction_count = RecipeInstruction.objects.filter(recipe=instance.recipe).count()
-            validated_data['number'] = min(instruction_count, validated_data['number'])
-            if validated_data['number'] > instance.number:
-                range = {'number__gt': instance.number, 'number__lte': validated_data['number']}
-                movement = -1
-            else:
-                range = {'number__gte': validated_data['number'], 'number__lt': instance.number}
-                movement = 1
-            for instruction in RecipeInstruction.objects.filter(recipe=instance.recipe, **range):
-                instruction.number += movement
-                instruction.save()
+        if 'number' in validated_data:
+            validated_data['number'] = ordering.move(instance, validated_data['number'])
         instance.recipe.submit_status = Statuses.UNSUBMITTED
         instance.recipe.deny_message = None
         instance.recipe.save()
         return super().update(instance, validated_data)
 
 
+class RecipeReorderSerializer(serializers.Serializer):
+    order = serializers.ListField(child=serializers.IntegerField())
+
+    def __init__(self, *args, model, recipe: Recipe, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.model = model
+        self.recipe = recipe
+
+    def validate_order(self, value):
+        ids = set(self.model.objects.filter(recipe=self.recipe).values_list('pk', flat=True))
+        if len(value) != len(ids) or set(value) != ids:
+            raise serializers.ValidationError("order has to contain every item exactly once.")
+        return value
+
+    def save(self):
+        ordering.reorder(self.model, self.recipe, self.validated_data['order'])
+        self.recipe.submit_status = Statuses.UNSUBMITTED
+        self.recipe.deny_message = None
+        self.recipe.save()
+        return self.recipe
+
+
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeIngredient
@@ -169,6 +172,7 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         data = super().validate(data)
+        ordering.lock(self.recipe)
         ingredient_count = RecipeIngredient.objects.filter(recipe=self.recipe).count()
         if Config.PerRecipeLimits.ingredients <= ingredient_count:
             raise serializers.ValidationError("ingredient limit exceeded.")
@@ -180,6 +184,126 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class RecipeBulkInstructionSerializer(serializers.ModelSerializer):
+    photo = serializers.FileField(required=False, allow_null=True)
+
+    class Meta:
+        model = RecipeInstruction
+        fields = ('photo', 'title', 'content')
+
+
+class RecipeBulkIngredientSerializer(serializers.Serializer):
+    ingredient = serializers.IntegerField()
+    amount = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=Decimal('0.01'))
+
+
+class RecipeBulkSerializer(serializers.ModelSerializer):
+    """ Validates and writes whole recipe with photos, instructions and ingredients """
+    categories = serializers.ListField(child=serializers.IntegerField())
+    photos = serializers.ListField(child=serializers.FileField(), required=False)
+    instructions = RecipeBulkInstructionSerializer(many=True, required=False)
+    ingredients = RecipeBulkIngredientSerializer(many=True, required=False)
+
+    class Meta:
+        model = Recipe
+        fields = ('categories', 'name', 'title', 'prep_time', 'calories', 'photos', 'instructions', 'ingredients')
+
+    def __init__(self, *args, user: User = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+
+    def validate_categories(self, value):
+        if len(value) > Config.PerRecipeLimits.categories:
+            raise serializers.ValidationError("category limit exceeded.")
+        existing = set(Category.objects.filter(pk__in=value).values_list('pk', flat=True))
+        for pk in value:
+            if pk not in existing:
+                raise serializers.ValidationError(f'Invalid pk "{pk}" - object does not exist.')
+        return list(dict.fromkeys(value))
+
+    def validate_photos(self, value):
+        if len(value) > Config.PerRecipeLimits.photos:
+            raise serializers.ValidationError("photo limit exceeded.")
+        return validation.photos(value)
+
+    def validate_instructions(self, value):
+        if len(value) > Config.PerRecipeLimits.instructions:
+            raise serializers.ValidationError("instruction limit exceeded.")
+        validation.photos([instruction.get('photo') for instruction in value])
+        return value
+
+    def validate_ingredients(self, value):
+        if len(value) > Config.PerRecipeLimits.ingredients:
+            raise serializers.ValidationError("ingredient limit exceeded.")
+        ids = [ingredient['ingredient'] for ingredient in value]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError("duplicate ingredients.")
+        existing = set(Ingredient.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        for pk in ids:
+            if pk not in existing:
+                raise serializers.ValidationError(f'Invalid pk "{pk}" - object does not exist.')
+        return value
+
+    def create(self, validated_data):
+        recipe = Recipe.objects.create(user=self.user, **self.recipe_data(validated_data))
+        self.write_graph(recipe, validated_data)
+        return recipe
+
+    def update(self, instance: Recipe, validated_data):
+        for key, value in self.recipe_data(validated_data).items():
+            setattr(instance, key, value)
+        instance.submit_status = Statuses.UNSUBMITTED
+        instance.deny_message = None
+        instance.save()
+        Recipe.categories.through.objects.filter(recipe=instance).delete()
+        RecipePhoto.objects.filter(recipe=instance).delete()
+        RecipeInstruction.objects.filter(recipe=instance).delete()
+        RecipeIngredient.objects.filter(recipe=instance).delete()
+        self.write_graph(instance, validated_data)
+        return instance
+
+    def save(self, **kwargs):
+        """ Deletes photos already written to storage when writing the recipe fails, the rows are rolled back """
+        self.stored: list[FieldFile] = []
+        try:
+            return super().save(**kwargs)
+        except BaseException:
+            for photo in self.stored:
+                photo.storage.delete(photo.name)
+            raise
+
+    def recipe_data(self, validated_data):
+        return {key: validated_data[key] for key in ('name', 'title', 'prep_time', 'calories')}
+
+    def write_graph(self, recipe: Recipe, validated_data):
+        Recipe.categories.through.objects.bulk_create([
+            Recipe.categories.through(recipe=recipe, category_id=pk) for pk in validated_data['categories']
+        ])
+        photos = [
+            RecipePhoto(recipe=recipe, photo=photo, number=number)
+            for number, photo in enumerate(validated_data.get('photos', []), start=1)
+        ]
+        instructions = [
+            RecipeInstruction(recipe=recipe, number=number, **instruction)
+            for number, instruction in enumerate(validated_data.get('instructions', []), start=1)
+        ]
+        self.store_photos([obj.photo for obj in photos + instructions if obj.photo])
+        RecipePhoto.objects.bulk_create(photos)
+        RecipeInstruction.objects.bulk_create(instructions)
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=recipe, ingredient_id=ingredient['ingredient'], amount=ingredient['amount'])
+            for ingredient in validated_data.get('ingredients', [])
+        ])
+
+    def store_photos(self, photos: list[FieldFile]):
+        """ Writes uploaded photos to storage concurrently, bulk_create then finds them committed """
+        def store(photo: FieldFile):
+            photo.save(photo.name, photo.file, save=False)
+            self.stored.append(photo)
+        with ThreadPoolExecutor(max_workers=settings.PHOTO_PROCESSING_WORKERS) as executor:
+            list(executor.map(store, photos))
+
+
 class RecipeSubmitSerializer(serializers.Serializer):
     def __init__(self, *args, recipe: Recipe, **kwargs):
         super().__init__(*args, **kwargs)
@@ -225,6 +349,60 @@ class RecipeCookSerializer(serializers.Serializer):
         return data
 
 
+class RecipePlanItemSerializer(serializers.Serializer):
+    recipe = serializers.IntegerField()
+    servings = serializers.IntegerField(default=1, min_value=1)
+
+
+class RecipePlanSerializer(serializers.Serializer):
+    """ Aggregates ingredients required by several recipes and compares them with user's inventory """
+    recipes = RecipePlanItemSerializer(many=True, allow_empty=False)
+    apply = serializers.BooleanField(default=False)
+
+    def __init__(self, *args, user: User, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+
+    def validate_recipes(self, value):
+        if len(value) > Config.ContentLimits.plan_recipes:
+            raise serializers.ValidationError("recipe limit exceeded.")
+        servings = {}
+        for item in value:
+            servings[item['recipe']] = servings.get(item['recipe'], 0) + item['servings']
+        existing = set(Recipe.objects.filter(pk__in=servings, submit_status=Statuses.ACCEPTED).values_list('pk', flat=True))
+        for pk in servings:
+            if pk not in existing:
+                raise serializers.ValidationError(f'Invalid pk "{pk}" - object does not exist.')
+        return servings
+
+    def validate(self, data):
+        data = super().validate(data)
+        if data['apply']:
+            User.objects.select_for_update().filter(pk=self.user.pk).exists()
+        servings = Case(
+            *[When(recipeingredient__recipe_id=pk, then=Value(count)) for pk, count in data['recipes'].items()],
+            output_field=DecimalField()
+        )
+        owned = UserIngredient.objects.filter(user=self.user, ingredient=OuterRef('pk')).values('amount')[:1]
+        qryset = Ingredient.objects.filter(recipeingredient__recipe__in=data['recipes'])
+        qryset = qryset.annotate(required=Sum(F('recipeingredient__amount') * servings, output_field=DecimalField()))
+        qryset = qryset.annotate(owned=Coalesce(Subquery(owned), Value(Decimal(0)), output_field=DecimalField()))
+        self.ingredients = list(qryset.order_by('name'))
+        self.sufficient = all(ingredient.owned >= ingredient.required for ingredient in self.ingredients)
+        if data['apply'] and not self.sufficient:
+            raise serializers.ValidationError("insufficient ingredients.")
+        return data
+
+    def save(self):
+        required = Case(
+            *[When(ingredient_id=ingredient.pk, then=Value(ingredient.required)) for ingredient in self.ingredients],
+            output_field=DecimalField()
+        )
+        query = UserIngredient.objects.filter(user=self.user, ingredient__in=self.ingredients)
+        query.update(amount=F('amount') - required)
+        UserIngredient.objects.filter(user=self.user, amount__lte=Decimal(0)).delete()
+
+
 class RecipeSmallData(serializers.ModelSerializer):
     photo = serializers.SerializerMethodField()
     user = user_serializers.UserSmallData()
@@ -289,12 +467,44 @@ class RecipeIngredientData(serializers.ModelSerializer):
         fields = ('ingredient', 'amount')
 
 
+class RecipePlanIngredientData(categorical_serializers.IngredientSmallData):
+    required = serializers.DecimalField(max_digits=None, decimal_places=2)
+    owned = serializers.DecimalField(max_digits=None, decimal_places=2)
+    missing = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Ingredient
+        fields = categorical_serializers.IngredientSmallData.Meta.fields + ('required', 'owned', 'missing')
+
+    def get_missing(self, obj: Ingredient):
+        return str(max(obj.required - obj.owned, Decimal(0)).quantize(Decimal('0.01')))
+
+
+def links(recipes: list[Recipe]):
+    """
+        Loads category ids and (ingredient id, amount) rows of recipes with one query each,
+        RecipeData reads them from the recipes instead of querying per recipe
+    """
+    recipes = {recipe.pk: recipe for recipe in recipes}
+    for recipe in recipes.values():
+        recipe.category_ids, recipe.ingredient_rows = [], []
+    through = Recipe.categories.through.objects.filter(recipe__in=recipes).order_by('recipe', 'category')
+    for recipe_id, category_id in through.values_list('recipe', 'category'):
+        recipes[recipe_id].category_ids.append(category_id)
+    rows = RecipeIngredient.objects.filter(recipe__in=recipes).order_by('recipe', 'pk')
+    for recipe_id, ingredient_id, amount in rows.values_list('recipe', 'ingredient', 'amount'):
+        recipes[recipe_id].ingredient_rows.append((ingredient_id, amount))
+    return list(recipes.values())
+
+
 class RecipeData(RecipeBaseData):
     rating_count = serializers.SerializerMethodField()
     avg_rating = serializers.SerializerMethodField()
     favoured_count = serializers.SerializerMethodField()
+    view_count = serializers.SerializerMethodField()
+    cook_count = serializers.SerializerMethodField()
     cookable_portions = serializers.SerializerMethodField()
-    categories = categorical_serializers.CategorySmallData(many=True)
+    categories = serializers.SerializerMethodField()
     ingredients = serializers.SerializerMethodField()
     photos = serializers.SerializerMethodField()
     instructions = serializers.SerializerMethodField()
@@ -302,10 +512,16 @@ class RecipeData(RecipeBaseData):
     class Meta:
         model = Recipe
         fields = RecipeBaseData.Meta.fields + (
-            'cookable_portions', 'favoured_count',
+            'cookable_portions', 'favoured_count', 'view_count', 'cook_count',
             'categories', 'ingredients', 'photos', 'instructions'
         )
 
+    def __init__(self, *args, fields: tuple[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     def get_rating_count(self, obj: Recipe):
         return Rating.objects.filter(recipe=obj).count()
 
@@ -315,6 +531,12 @@ class RecipeData(RecipeBaseData):
 
     def get_favoured_count(self, obj: Recipe):
         return obj.favoured_by.count()
+
+    def get_view_count(self, obj: Recipe):
+        return obj.view_count + counters.buffer.get(Recipe, 'view_count', obj.pk)
+
+    def get_cook_count(self, obj: Recipe):
+        return obj.cook_count + counters.buffer.get(Recipe, 'cook_count', obj.pk)
     
     def get_cookable_portions(self, obj: Recipe):
         if isinstance(self.user, User):
@@ -323,9 +545,18 @@ class RecipeData(RecipeBaseData):
             return RecipeIngredient.objects.filter(recipe=obj).annotate(TUH=expression).aggregate(min=Min('TUH'))['min']
         return None
 
+    def get_categories(self, obj: Recipe):
+        if not hasattr(obj, 'category_ids'):
+            links([obj])
+        return reference.snapshot.lookup('category', obj.category_ids)
+
     def get_ingredients(self, obj: Recipe):
-        qryset = RecipeIngredient.objects.filter(recipe=obj)
-        return [RecipeIngredientData(instance=ingredient).data for ingredient in qryset]
+        if not hasattr(obj, 'ingredient_rows'):
+            links([obj])
+        rows = obj.ingredient_rows
+        ingredients = reference.snapshot.lookup('ingredient', [pk for pk, _ in rows])
+        amount = RecipeIngredientData().fields['amount'].to_representation
+        return [{'ingredient': ingredient, 'amount': amount(value)} for ingredient, (_, value) in zip(ingredients, rows)]
 
     def get_photos(self, obj: Recipe):
         qryset = RecipePhoto.objects.filter(recipe=obj).order_by('number')
@@ -345,10 +576,15 @@ class RecipeFilter(serializers.Serializer):
     prep_time_limit = serializers.IntegerField(required=False, min_value=0)
     favourite_category = serializers.BooleanField(default=False)
     sufficient_ingrediens = serializers.BooleanField(default=False)
+    missing_ingredients = serializers.IntegerField(required=False, min_value=0)
+    missing_share = serializers.IntegerField(required=False, min_value=0, max_value=100)
     favoured = serializers.BooleanField(default=False)
     search_string = serializers.CharField(required=False)
+    fuzzy = serializers.BooleanField(default=False)
     order_by = serializers.ListField(child=serializers.CharField(), required=False)
     order_time_window = serializers.IntegerField(min_value=1, required=False)
+    fields = serializers.ListField(child=serializers.CharField(), required=False)
+    exclude = serializers.ListField(child=serializers.CharField(), required=False)
     page = serializers.IntegerField(default=1, min_value=1)
     page_size = serializers.IntegerField(default=20, min_value=1, max_value=100)
     
@@ -369,7 +605,76 @@ class RecipeFilter(serializers.Serializer):
         return value
 
     def validate_order_by(self, value):
-        return validation.order_by(value, ['name', 'rating_count', 'avg_rating', 'prep_time', 'calories', 'created_at'])
+        options = ['name', 'rating_count', 'avg_rating', 'prep_time', 'calories', 'created_at', 'trending', 'relevance']
+        return validation.order_by(value, options)
+
+    def validate(self, data):
+        return validation.relevance(super().validate(data))
+
+    def validate_fields(self, value):
+        return validation.fields(value, RecipeBaseData.Meta.fields)
+
+    def validate_exclude(self, value):
+        return validation.fields(value, RecipeBaseData.Meta.fields)
+
+
+class RecipeDetailFilter(serializers.Serializer):
+    fields = serializers.ListField(child=serializers.CharField(), required=False)
+    exclude = serializers.ListField(child=serializers.CharField(), required=False)
+
+    def validate_fields(self, value):
+        return validation.fields(value, RecipeData.Meta.fields)
+
+    def validate_exclude(self, value):
+        return validation.fields(value, RecipeData.Meta.fields)
+
+
+class RecipeSimilarFilter(serializers.Serializer):
+    count = serializers.IntegerField(default=20, min_value=1, max_value=100)
+    fields = serializers.ListField(child=serializers.CharField(), required=False)
+    exclude = serializers.ListField(child=serializers.CharField(), required=False)
+
+    def validate_fields(self, value):
+        return validation.fields(value, RecipeBaseData.Meta.fields)
+
+    def validate_exclude(self, value):
+        return validation.fields(value, RecipeBaseData.Meta.fields)
+
+
+class RecipeRandomFilter(serializers.Serializer):
+    categories = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), required=False, many=True)
+    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.filter(banned=False), required=False)
+    calories_limit = serializers.IntegerField(required=False, min_value=0)
+    servings = serializers.IntegerField(default=1, min_value=1)
+    prep_time_limit = serializers.IntegerField(required=False, min_value=0)
+    search_string = serializers.CharField(required=False)
+    count = serializers.IntegerField(default=1, min_value=1, max_value=20)
+    fields = serializers.ListField(child=serializers.CharField(), required=False)
+    exclude = serializers.ListField(child=serializers.CharField(), required=False)
+
+    def validate_search_string(self, value):
+        if '\0' in value:
+            raise serializers.ValidationError("invalid search_string value.")
+        return value
+
+    def validate_fields(self, value):
+        return validation.fields(value, RecipeBaseData.Meta.fields)
+
+    def validate_exclude(self, value):
+        return validation.fields(value, RecipeBaseData.Meta.fields)
+
+
+class RecipeRecommendedFilter(serializers.Serializer):
+    fields = serializers.ListField(child=serializers.CharField(), required=False)
+    exclude = serializers.ListField(child=serializers.CharField(), required=False)
+    page = serializers.IntegerField(default=1, min_value=1)
+    page_size = serializers.IntegerField(default=20, min_value=1, max_value=100)
+
+    def validate_fields(self, value):
+        return validation.fields(value, RecipeBaseData.Meta.fields)
+
+    def validate_exclude(self, value):
+        return validation.fields(value, RecipeBaseData.Meta.fields)
 
 
 class RatingCreateSerializer(serializers.ModelSerializer):
@@ -468,4 +773,7 @@ class RatingFilter(serializers.Serializer):
     page_size = serializers.IntegerField(default=20, min_value=1, max_value=100)
 
     def validate_order_by(self, value):
-        return validation.order_by(value, ['like_count', 'created_at', 'stars'])
+        return validation.order_by(value, ['like_count', 'created_at', 'stars', 'relevance'])
+
+    def validate(self, data):
+        return validation.relevance(super().validate(data))
@@ -1,12 +1,9 @@
-from django.db.models import Avg
 from django.contrib.auth import password_validation
 from rest_framework import serializers
 import recipeAPIapp.utils.security as security
 import recipeAPIapp.utils.validation as validation
 import recipeAPIapp.utils.verification as verification
-from recipeAPIapp.models.user import User, UserReport
-from recipeAPIapp.models.recipe import Recipe, Rating
-from recipeAPIapp.models.recipe import SubmitStatuses as Statuses
+from recipeAPIapp.models.user import User, UserReport, UserStats
 
 
 
@@ -88,6 +85,11 @@ class UserModeratorFilterData(UserFilterData):
         fields = UserFilterData.Meta.fields + ('moderator', 'report_count')
 
 
+def stats(user: User):
+    """ Returns user's statistics row, zeros when it was not created yet (rebuildstats creates missing rows) """
+    return getattr(user, 'stats', None) or UserStats(user=user)
+
+
 class UserData(serializers.ModelSerializer):
     rating_count = serializers.SerializerMethodField()
     recipe_count = serializers.SerializerMethodField()
@@ -98,13 +100,13 @@ class UserData(serializers.ModelSerializer):
         fields = UserFilterData.Meta.fields + ('about',)
     
     def get_rating_count(self, obj: User):
-        return Rating.objects.filter(recipe__user=obj).count()
+        return stats(obj).rating_count
 
     def get_recipe_count(self, obj: User):
-        return Recipe.objects.filter(user=obj, submit_status=Statuses.ACCEPTED).count()
+        return stats(obj).recipe_count
     
     def get_avg_rating(self, obj: User):
-        return Rating.objects.filter(recipe__user=obj).aggregate(Avg('stars'))['stars__avg'] or 0 
+        return stats(obj).rating_sum / stats(obj).rating_count if stats(obj).rating_count else 0
 
 
 class UserModeratorData(UserData):
@@ -115,7 +117,7 @@ class UserModeratorData(UserData):
         fields = UserData.Meta.fields + ('email', 'moderator', 'report_count',)
 
     def get_report_count(self, obj: User):
-        return UserReport.objects.filter(reported=obj).count()
+        return stats(obj).report_count
 
 
 class UserSelfData(UserData):
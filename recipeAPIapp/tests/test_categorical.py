@@ -1,6 +1,8 @@
+import io
 from decimal import Decimal
 from unittest.mock import patch
 from django.test import override_settings
+from django.core.management import call_command
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.test import APITestCase
@@ -376,6 +378,63 @@ class TestIngredientInventory(APITestCase):
         self.assertEqual(response.data['detail'], {'non_field_errors': ['inventory limit exceeded.']})
         self.assertFalse(UserIngredient.objects.filter(user=self.user, ingredient=self.ingredient2).exists())
 
+    def test_sync_inventory(self):
+        ingredient3 = Ingredient.objects.create(name="Ingredient 3", unit="g", photo=media_utils.generate_test_image())
+        UserIngredient.objects.create(user=self.user, ingredient=self.ingredient, amount=1.0)
+        UserIngredient.objects.create(user=self.user, ingredient=self.ingredient2, amount=2.0)
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.user_token}'}
+        items = [
+            {'ingredient': self.ingredient.pk, 'amount': 1.25},
+            {'ingredient': self.ingredient2.pk, 'amount': -2.0},
+            {'ingredient': ingredient3.pk, 'amount': 4, 'absolute': True},
+        ]
+        response: Response = self.client.post('/ingredient/inventory', data={'items': items}, format='json', **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {
+                'ingredient': {
+                    'id': self.ingredient.pk, 'photo': self.ingredient.photo.url,
+                    'unit': 'kg', 'name': 'Ingredient'
+                },
+                'amount': '2.25'
+            }, {
+                'ingredient': {
+                    'id': ingredient3.pk, 'photo': ingredient3.photo.url,
+                    'unit': 'g', 'name': 'Ingredient 3'
+                },
+                'amount': '4.00'
+            }
+        ])
+        self.assertFalse(UserIngredient.objects.filter(user=self.user, ingredient=self.ingredient2).exists())
+
+    def test_sync_inventory_invalid_items(self):
+        UserIngredient.objects.create(user=self.user, ingredient=self.ingredient, amount=999.0)
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.user_token}'}
+        batches = [
+            ([{'ingredient': self.ingredient.pk, 'amount': 1}], {'non_field_errors': [f'amount of ingredient {self.ingredient.pk} out of range.']}),
+            ([{'ingredient': self.ingredient2.pk, 'amount': 1}] * 2, {'items': ['duplicate ingredients.']}),
+            ([{'ingredient': 0, 'amount': 1}], {'items': ['Invalid pk "0" - object does not exist.']}),
+            ([{'ingredient': self.ingredient2.pk, 'amount': -1, 'absolute': True}], {'items': {0: {'non_field_errors': ["absolute amount can't be negative."]}}}),
+        ]
+        for items, errors in batches:
+            response: Response = self.client.post('/ingredient/inventory', data={'items': items}, format='json', **headers)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data['detail'], errors)
+        self.assertEqual(UserIngredient.objects.get(user=self.user).amount, Decimal('999'))
+
+    @patch('recipeAPIapp.apps.Config.ContentLimits.inventory_limit', 1)
+    def test_sync_inventory_limit_exceeded(self):
+        UserIngredient.objects.create(user=self.user, ingredient=self.ingredient, amount=1.0)
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.user_token}'}
+        items = [{'ingredient': self.ingredient2.pk, 'amount': 1}]
+        response: Response = self.client.post('/ingredient/inventory', data={'items': items}, format='json', **headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['detail'], {'non_field_errors': ['inventory limit exceeded.']})
+        items.append({'ingredient': self.ingredient.pk, 'amount': 0, 'absolute': True})
+        response: Response = self.client.post('/ingredient/inventory', data={'items': items}, format='json', **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(UserIngredient.objects.filter(user=self.user).values_list('ingredient', flat=True)), [self.ingredient2.pk])
+
     def test_add_ingredient_unauthorized(self):
         response: Response = self.client.post(
             f'/ingredient/inventory/{self.ingredient.pk}', 
@@ -391,3 +450,73 @@ class TestIngredientInventory(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
         self.assertFalse(UserIngredient.objects.filter(user=unverified_user, ingredient=self.ingredient).exists())
+
+
+@override_settings(DEFAULT_FILE_STORAGE=media_utils.TEST_DEFAULT_FILE_STORAGE)
+@override_settings(MEDIA_ROOT=media_utils.TEST_MEDIA_ROOT)
+class TestRecipeCounts(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="user@example.com", name="Regular User")
+        self.category1 = Category.objects.create(name="Category 1", photo=media_utils.generate_test_image())
+        self.category2 = Category.objects.create(name="Category 2", photo=media_utils.generate_test_image())
+        self.ingredient = Ingredient.objects.create(name="Ingredient", unit="g", photo=media_utils.generate_test_image())
+        self.recipe = Recipe.objects.create(
+            user=self.user, name="Recipe", title="Recipe Title",
+            prep_time=10, calories=100, submit_status=SubmitStatuses.SUBMITTED
+        )
+        self.recipe.categories.add(self.category1, self.category2)
+        RecipeIngredient.objects.create(recipe=self.recipe, ingredient=self.ingredient, amount=Decimal('1.0'))
+
+    def tearDown(self):
+        media_utils.delete_test_media()
+
+    def counts(self):
+        return (
+            Category.objects.get(pk=self.category1.pk).recipe_count,
+            Category.objects.get(pk=self.category2.pk).recipe_count,
+            Ingredient.objects.get(pk=self.ingredient.pk).recipe_count,
+        )
+
+    def test_maintained(self):
+        self.assertEqual(self.counts(), (0, 0, 0))
+        self.recipe.submit_status = SubmitStatuses.ACCEPTED
+        self.recipe.save()
+        self.assertEqual(self.counts(), (1, 1, 1))
+        self.recipe.categories.remove(self.category1)
+        self.category2.recipes.clear()
+        self.assertEqual(self.counts(), (0, 0, 1))
+        self.category1.recipes.add(self.recipe)
+        RecipeIngredient.objects.filter(recipe=self.recipe).delete()
+        self.assertEqual(self.counts(), (1, 0, 0))
+        self.recipe.submit_status = SubmitStatuses.DENIED
+        self.recipe.save()
+        self.assertEqual(self.counts(), (0, 0, 0))
+
+    def test_stale_edit(self):
+        category = Category.objects.get(pk=self.category1.pk)
+        ingredient = Ingredient.objects.get(pk=self.ingredient.pk)
+        self.recipe.submit_status = SubmitStatuses.ACCEPTED
+        self.recipe.save()
+        category.about = "Edited about"
+        category.save()
+        ingredient.unit = "kg"
+        ingredient.save()
+        self.assertEqual(self.counts(), (1, 1, 1))
+        self.assertEqual(Category.objects.get(pk=self.category1.pk).about, "Edited about")
+
+    def test_recipe_deleted(self):
+        self.recipe.submit_status = SubmitStatuses.ACCEPTED
+        self.recipe.save()
+        self.user.delete()
+        self.assertEqual(self.counts(), (0, 0, 0))
+
+    def test_verify(self):
+        self.recipe.submit_status = SubmitStatuses.ACCEPTED
+        self.recipe.save()
+        Category.objects.filter(pk=self.category1.pk).update(recipe_count=5)
+        output = io.StringIO()
+        call_command('verifycounts', stdout=output)
+        self.assertIn(f"Category {self.category1.pk} - stored 5, recomputed 1", output.getvalue())
+        self.assertEqual(self.counts(), (5, 1, 1))
+        call_command('verifycounts', '--fix', stdout=io.StringIO())
+        self.assertEqual(self.counts(), (1, 1, 1))
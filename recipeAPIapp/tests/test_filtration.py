@@ -1,14 +1,26 @@
+import io, os, tempfile, time
+from unittest.mock import patch
 from datetime import timedelta
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.conf import settings
+from django.core.management import call_command
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.test import APITestCase
+import recipeAPIapp.utils.catalog as catalog
+import recipeAPIapp.utils.counters as counters
+import recipeAPIapp.utils.fulltext as fulltext
 import recipeAPIapp.utils.security as security
 import recipeAPIapp.tests.media_utils as media_utils
+from recipeAPIapp.utils.snapshot import Snapshot
 from recipeAPIapp.models.timestamp import utc_now
 from recipeAPIapp.models.user import User, UserReport
 from recipeAPIapp.models.recipe import Recipe, Rating, SubmitStatuses, RecipeIngredient, RecipePhoto
 from recipeAPIapp.models.categorical import Category, Ingredient, UserIngredient
+from recipeAPIapp.models.trigram import Trigram
+from recipeAPIapp.models.recommendation import Recommendation
 
 
 
@@ -1023,3 +1035,598 @@ class TestRecipeFilter(APITestCase):
         self.assertEqual(response.data['results'][3]['avg_rating'], None)
         self.assertEqual(response.data['results'][4]['id'], self.recipe3.pk)
         self.assertEqual(response.data['results'][4]['avg_rating'], 3.0)
+
+
+    def test_fields(self):
+        params = {
+            'fields': ['id', 'name', 'rating_count'], 'exclude': ['rating_count'],
+            'order_by': ['-rating_count', 'name'], 'page': 1, 'page_size': 5
+        }
+        response: Response = self.client.get(f'/recipe/filter/paged', params, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0], {'id': self.recipe6.pk, 'name': self.recipe6.name})
+        self.assertEqual(response.data['results'][1], {'id': self.recipe3.pk, 'name': self.recipe3.name})
+        params = {'fields': ['id', 'ingredients'], 'page': 1, 'page_size': 5}
+        response: Response = self.client.get(f'/recipe/filter/paged', params, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'detail': {'fields': ['invalid fields parameters.']}})
+
+
+    def test_missing_ingredients(self):
+        headers = {'HTTP_AUTHORIZATION': f"Bearer {self.user_token}"}
+        params = {'missing_ingredients': 1, 'servings': 3, 'page': 1, 'page_size': 5}
+        response: Response = self.client.get(f'/recipe/filter/paged', params, format='json', **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 5)
+        recipes = [self.recipe4, self.recipe3, self.recipe1, self.recipe6, self.recipe5]
+        self.assertEqual([recipe['id'] for recipe in response.data['results']], [recipe.pk for recipe in recipes])
+        self.assertEqual(response.data['results'][1]['rating_count'], 3)
+        params = {'missing_share': 30, 'servings': 3, 'page': 2, 'page_size': 3}
+        response: Response = self.client.get(f'/recipe/filter/paged', params, format='json', **headers)
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual([recipe['id'] for recipe in response.data['results']], [self.recipe6.pk])
+        params = {'missing_ingredients': 0, 'categories': [self.category1.pk], 'servings': 3, 'page': 1, 'page_size': 5}
+        response: Response = self.client.get(f'/recipe/filter/paged', params, format='json', **headers)
+        self.assertEqual([recipe['id'] for recipe in response.data['results']], [self.recipe4.pk, self.recipe1.pk])
+        RecipeIngredient.objects.filter(recipe=self.recipe6, ingredient=self.ingredient4).delete()
+        response: Response = self.client.get(f'/recipe/filter/paged', params, format='json', **headers)
+        self.assertEqual([recipe['id'] for recipe in response.data['results']], [self.recipe6.pk, self.recipe4.pk, self.recipe1.pk])
+
+    def test_missing_ingredients_submitted(self):
+        headers = {'HTTP_AUTHORIZATION': f"Bearer {self.moderator_token}"}
+        for owned in UserIngredient.objects.filter(user=self.test_user):
+            UserIngredient.objects.create(user=self.moderator_user, ingredient=owned.ingredient, amount=owned.amount)
+        Recipe.objects.filter(submit_status=SubmitStatuses.ACCEPTED).update(submit_status=SubmitStatuses.SUBMITTED)
+        params = {'missing_ingredients': 1, 'submit_status': SubmitStatuses.SUBMITTED, 'servings': 3, 'page': 1, 'page_size': 10}
+        response: Response = self.client.get(f'/recipe/filter/paged', params, format='json', **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 5)
+        recipes = [self.recipe4, self.recipe3, self.recipe1, self.recipe6, self.recipe5]
+        self.assertEqual([recipe['id'] for recipe in response.data['results']], [recipe.pk for recipe in recipes])
+        params = {'missing_share': 30, 'submit_status': SubmitStatuses.SUBMITTED, 'servings': 3, 'page': 1, 'page_size': 10}
+        response: Response = self.client.get(f'/recipe/filter/paged', params, format='json', **headers)
+        self.assertEqual([recipe['id'] for recipe in response.data['results']], [recipe.pk for recipe in recipes[:4]])
+        params['missing_share'] = 40
+        response: Response = self.client.get(f'/recipe/filter/paged', params, format='json', **headers)
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(response.data['results'][-1]['id'], self.recipe7.pk)
+
+    def test_similar(self):
+        response: Response = self.client.get(f'/recipe/similar/{self.recipe1.pk}', format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        recipes = [self.recipe3, self.recipe6, self.recipe4, self.recipe5]
+        self.assertEqual([recipe['id'] for recipe in response.data], [recipe.pk for recipe in recipes])
+        self.assertEqual(response.data[1]['rating_count'], 4)
+        params = {'count': 2, 'fields': ['id', 'name']}
+        response: Response = self.client.get(f'/recipe/similar/{self.recipe1.pk}', params, format='json')
+        self.assertEqual(response.data, [
+            {'id': self.recipe3.pk, 'name': self.recipe3.name}, {'id': self.recipe6.pk, 'name': self.recipe6.name}
+        ])
+        RecipeIngredient.objects.filter(recipe=self.recipe3, ingredient=self.ingredient4).delete()
+        self.recipe7.submit_status = SubmitStatuses.ACCEPTED
+        self.recipe7.save()
+        response: Response = self.client.get(f'/recipe/similar/{self.recipe1.pk}', format='json')
+        recipes = [self.recipe6, self.recipe3, self.recipe4, self.recipe7, self.recipe5]
+        self.assertEqual([recipe['id'] for recipe in response.data], [recipe.pk for recipe in recipes])
+        self.recipe6.categories.remove(self.category1, self.category3)
+        response: Response = self.client.get(f'/recipe/similar/{self.recipe1.pk}', format='json')
+        self.assertEqual(response.data[0]['id'], self.recipe3.pk)
+
+    def test_similar_visibility(self):
+        response: Response = self.client.get(f'/recipe/similar/{self.recipe2.pk}', format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        headers = {'HTTP_AUTHORIZATION': f"Bearer {self.user_token}"}
+        response: Response = self.client.get(f'/recipe/similar/{self.recipe2.pk}', format='json', **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([recipe['id'] for recipe in response.data], [self.recipe4.pk, self.recipe1.pk])
+
+    def test_recommended(self):
+        call_command('recommend', stdout=io.StringIO())
+        popular = [self.recipe1.pk, self.recipe3.pk, self.recipe6.pk, self.recipe5.pk]
+        response: Response = self.client.get(f'/recipe/recommended', {'fields': ['id']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual([recipe['id'] for recipe in response.data['results']], popular)
+        headers = {'HTTP_AUTHORIZATION': f"Bearer {security.generate_token(self.user1)}"}
+        response: Response = self.client.get(f'/recipe/recommended', format='json', **headers)
+        """ Recipe 6 co-occurs with user1's good rating but user1 rated it 2 stars """
+        recipes = [self.recipe5, self.recipe1]
+        self.assertEqual([recipe['id'] for recipe in response.data['results']], [recipe.pk for recipe in recipes])
+        self.assertEqual(response.data['results'][1]['rating_count'], 2)
+        """ Every recipe co-occurring with test user's feedback is already liked by them """
+        headers = {'HTTP_AUTHORIZATION': f"Bearer {self.user_token}"}
+        params = {'fields': ['id'], 'page': 2, 'page_size': 3}
+        response: Response = self.client.get(f'/recipe/recommended', params, format='json', **headers)
+        self.assertEqual(response.data['results'], [{'id': self.recipe5.pk}])
+        self.recipe6.submit_status = SubmitStatuses.DENIED
+        self.recipe6.save()
+        response: Response = self.client.get(f'/recipe/recommended', format='json', **headers)
+        self.assertEqual(response.data['count'], 3)
+
+    def test_recommended_blocks(self):
+        stored = lambda: list(Recommendation.objects.order_by('user', 'rank').values_list('user', 'recipe', 'score'))
+        call_command('recommend', stdout=io.StringIO())
+        expected = stored()
+        with override_settings(RECOMMENDATION_BLOCK=1):
+            call_command('recommend', stdout=io.StringIO())
+        self.assertEqual(stored(), expected)
+
+    @override_settings(FEED_CACHE_CATEGORIES=1)
+    def test_favourite_category_feed(self):
+        headers = {'HTTP_AUTHORIZATION': f"Bearer {self.user_token}"}
+        params = {'favourite_category': True, 'fields': ['id'], 'page': 1, 'page_size': 5}
+        response: Response = self.client.get(f'/recipe/filter/paged', params, format='json', **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 4)
+        recipes = [self.recipe4, self.recipe1, self.recipe5, self.recipe6]
+        self.assertEqual([recipe['id'] for recipe in response.data['results']], [recipe.pk for recipe in recipes])
+        params = params | {'prep_time_limit': 100, 'order_by': ['-created_at'], 'page': 2, 'page_size': 2}
+        response: Response = self.client.get(f'/recipe/filter/paged', params, format='json', **headers)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([recipe['id'] for recipe in response.data['results']], [self.recipe6.pk])
+        recipe = Recipe.objects.create(
+            user=self.user1, name="Recipe 8", title="Newest Recipe 8",
+            submit_status=SubmitStatuses.ACCEPTED, prep_time=10, calories=100
+        )
+        recipe.categories.add(self.category3)
+        self.recipe4.categories.remove(self.category1, self.category6)
+        params = {'favourite_category': True, 'fields': ['id'], 'page': 1, 'page_size': 2}
+        response: Response = self.client.get(f'/recipe/filter/paged', params, format='json', **headers)
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual([recipe['id'] for recipe in response.data['results']], [recipe.pk, self.recipe1.pk])
+        params = params | {'order_by': ['name']}
+        response: Response = self.client.get(f'/recipe/filter/paged', params, format='json', **headers)
+        self.assertEqual([recipe['id'] for recipe in response.data['results']], [self.recipe1.pk, self.recipe5.pk])
+        params = {'favourite_category': True, 'search_string': 'recipe 6', 'fuzzy': True, 'fields': ['id'], 'page': 1, 'page_size': 5}
+        response: Response = self.client.get(f'/recipe/filter/paged', params, format='json', **headers)
+        self.assertEqual(response.data['results'][0]['id'], self.recipe6.pk)
+
+    def test_trending(self):
+        headers = {'HTTP_AUTHORIZATION': f"Bearer {self.user_token}"}
+        start, half_life = time.time(), settings.TRENDING_HALF_LIFE * 3600
+        with patch('time.time', return_value=start), self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/recipe/change-favourite/{self.recipe6.pk}', format='json', **headers)
+            self.client.post(f'/recipe/change-favourite/{self.recipe6.pk}', format='json', **headers)
+        with patch('time.time', return_value=start + half_life), self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/recipe/change-favourite/{self.recipe4.pk}', format='json', **headers)
+        with patch('time.time', return_value=start + half_life):
+            call_command('renormalizetrending', stdout=io.StringIO())
+        with patch('time.time', return_value=start + 2 * half_life), self.captureOnCommitCallbacks(execute=True):
+            data = {'stars': 4, 'content': 'Trending rating content.'}
+            response: Response = self.client.post(f'/rating/{self.recipe5.pk}', data, format='json', **headers)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with patch('time.time', return_value=start + 2 * half_life):
+            counters.buffer.flush()
+        scores = dict(Recipe.objects.values_list('pk', 'trending'))
+        self.assertAlmostEqual(scores[self.recipe6.pk], 0.5)
+        self.assertAlmostEqual(scores[self.recipe4.pk], 1.0)
+        self.assertAlmostEqual(scores[self.recipe5.pk], 2.0)
+        params = {'order_by': ['-trending', 'name'], 'fields': ['id'], 'page': 1, 'page_size': 5}
+        response: Response = self.client.get(f'/recipe/filter/paged', params, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        recipes = [self.recipe5, self.recipe4, self.recipe6, self.recipe1, self.recipe3]
+        self.assertEqual([recipe['id'] for recipe in response.data['results']], [recipe.pk for recipe in recipes])
+
+    def test_trending_stale_save(self):
+        Recipe.objects.filter(pk=self.recipe4.pk).update(trending=4.0)
+        stale = Recipe.objects.get(pk=self.recipe4.pk)
+        start, half_life = time.time(), settings.TRENDING_HALF_LIFE * 3600
+        with patch('time.time', return_value=start):
+            call_command('renormalizetrending', stdout=io.StringIO())
+        with patch('time.time', return_value=start + half_life):
+            call_command('renormalizetrending', stdout=io.StringIO())
+        stale.name = "Renamed Recipe"
+        stale.save()
+        self.assertAlmostEqual(Recipe.objects.get(pk=self.recipe4.pk).trending, 2.0, places=3)
+
+
+@override_settings(DEFAULT_FILE_STORAGE=media_utils.TEST_DEFAULT_FILE_STORAGE)
+@override_settings(MEDIA_ROOT=media_utils.TEST_MEDIA_ROOT)
+@override_settings(SNAPSHOT_CHECK_INTERVAL=60)
+class TestAutocomplete(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="user@example.com", name="Regular User")
+        self.tomato = Ingredient.objects.create(name="Tomato", unit="g", photo=media_utils.generate_test_image())
+        self.paste = Ingredient.objects.create(name="Tomato Paste", unit="g", photo=media_utils.generate_test_image())
+        self.tofu = Ingredient.objects.create(name="Tofu", unit="g", photo=media_utils.generate_test_image())
+        self.category = Category.objects.create(name="Crème Brûlée", photo=media_utils.generate_test_image())
+        Ingredient.objects.filter(pk=self.paste.pk).update(recipe_count=5)
+        Ingredient.objects.filter(pk=self.tofu.pk).update(recipe_count=2)
+        self.soup = Recipe.objects.create(
+            user=self.user, name="Tomato Soup", title="Tomato Soup Title",
+            prep_time=10, calories=100, submit_status=SubmitStatuses.ACCEPTED
+        )
+        self.hidden = Recipe.objects.create(
+            user=self.user, name="Tomato Salad", title="Tomato Salad Title",
+            prep_time=10, calories=100, submit_status=SubmitStatuses.SUBMITTED
+        )
+
+    def tearDown(self):
+        media_utils.delete_test_media()
+
+    def test_ingredient_autocomplete(self):
+        response: Response = self.client.get('/ingredient/autocomplete', {'q': 'to'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {'id': self.paste.pk, 'name': "Tomato Paste"},
+            {'id': self.tofu.pk, 'name': "Tofu"},
+            {'id': self.tomato.pk, 'name': "Tomato"},
+        ])
+        response: Response = self.client.get('/ingredient/autocomplete', {'q': 'PAS', 'count': 1}, format='json')
+        self.assertEqual(response.data, [{'id': self.paste.pk, 'name': "Tomato Paste"}])
+        response: Response = self.client.get('/ingredient/autocomplete', {'count': 100}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_incremental_updates(self):
+        self.client.get('/ingredient/autocomplete', {'q': 'to'}, format='json')
+        self.tofu.name = "Bean Curd"
+        self.tofu.save()
+        Ingredient.objects.create(name="Tortilla", unit="g", photo=media_utils.generate_test_image())
+        self.tomato.delete()
+        response: Response = self.client.get('/ingredient/autocomplete', {'q': 'to'}, format='json')
+        self.assertEqual([item['name'] for item in response.data], ["Tomato Paste", "Tortilla"])
+        response: Response = self.client.get('/ingredient/autocomplete', {'q': 'curd'}, format='json')
+        self.assertEqual(response.data, [{'id': self.tofu.pk, 'name': "Bean Curd"}])
+
+    def test_category_autocomplete(self):
+        response: Response = self.client.get('/category/autocomplete', {'q': 'creme bru'}, format='json')
+        self.assertEqual(response.data, [{'id': self.category.pk, 'name': "Crème Brûlée"}])
+        with self.assertNumQueries(0):
+            response: Response = self.client.get('/category/autocomplete', {'q': 'brulee'}, format='json')
+        self.assertEqual(len(response.data), 1)
+
+    def test_recipe_autocomplete(self):
+        response: Response = self.client.get('/recipe/autocomplete', {'q': 'tomato'}, format='json')
+        self.assertEqual(response.data, [{'id': self.soup.pk, 'name': "Tomato Soup"}])
+        self.hidden.submit_status = SubmitStatuses.ACCEPTED
+        self.hidden.save()
+        response: Response = self.client.get('/recipe/autocomplete', {'q': 'sal'}, format='json')
+        self.assertEqual(response.data, [{'id': self.hidden.pk, 'name': "Tomato Salad"}])
+
+    def test_short_prefix(self):
+        for q in ['t', 'T!', '!!']:
+            response: Response = self.client.get('/ingredient/autocomplete', {'q': q}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data, [])
+
+    def test_popularity_refresh(self):
+        self.client.get('/ingredient/autocomplete', {'q': 'to'}, format='json')
+        Ingredient.objects.filter(pk=self.tomato.pk).update(recipe_count=9)
+        response: Response = self.client.get('/ingredient/autocomplete', {'q': 'to', 'count': 1}, format='json')
+        self.assertEqual(response.data, [{'id': self.paste.pk, 'name': "Tomato Paste"}])
+        with override_settings(AUTOCOMPLETE_RANK_INTERVAL=0):
+            response: Response = self.client.get('/ingredient/autocomplete', {'q': 'to', 'count': 1}, format='json')
+        self.assertEqual(response.data, [{'id': self.tomato.pk, 'name': "Tomato"}])
+
+
+@override_settings(DEFAULT_FILE_STORAGE=media_utils.TEST_DEFAULT_FILE_STORAGE)
+@override_settings(MEDIA_ROOT=media_utils.TEST_MEDIA_ROOT)
+class TestFuzzySearch(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="user@example.com", name="Regular User")
+        self.tomato = Ingredient.objects.create(name="Tomato", unit="g", photo=media_utils.generate_test_image())
+        self.potato = Ingredient.objects.create(name="Potato", unit="g", photo=media_utils.generate_test_image())
+        self.category = Category.objects.create(name="Italian", photo=media_utils.generate_test_image())
+        self.spaghetti = Recipe.objects.create(
+            user=self.user, name="Spaghetti Carbonara", title="Creamy Pasta",
+            prep_time=10, calories=100, submit_status=SubmitStatuses.ACCEPTED
+        )
+        self.soup = Recipe.objects.create(
+            user=self.user, name="Soup", title="Tomato Spaghetti Soup",
+            prep_time=10, calories=100, submit_status=SubmitStatuses.ACCEPTED
+        )
+
+    def tearDown(self):
+        media_utils.delete_test_media()
+
+    def test_ingredient_fuzzy(self):
+        query = {'search_string': 'tomatoe'}
+        response: Response = self.client.get('/ingredient/filter/paged', query, format='json')
+        self.assertEqual(response.data['count'], 0)
+        response: Response = self.client.get('/ingredient/filter/paged', query | {'fuzzy': True}, format='json')
+        self.assertEqual([item['id'] for item in response.data['results']], [self.tomato.pk])
+
+    def test_category_fuzzy(self):
+        query = {'search_string': 'italien', 'fuzzy': True}
+        response: Response = self.client.get('/category/filter/paged', query, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data['results']], [self.category.pk])
+
+    def test_recipe_fuzzy(self):
+        query = {'search_string': 'spagetti', 'fuzzy': True}
+        response: Response = self.client.get('/recipe/filter/paged', query, format='json')
+        self.assertEqual([item['id'] for item in response.data['results']], [self.spaghetti.pk, self.soup.pk])
+        query = {'search_string': 'tomato spagetti', 'fuzzy': True}
+        response: Response = self.client.get('/recipe/filter/paged', query, format='json')
+        self.assertEqual([item['id'] for item in response.data['results']], [self.soup.pk])
+        query |= {'order_by': ['name']}
+        response: Response = self.client.get('/recipe/filter/paged', query, format='json')
+        self.assertEqual(response.data['count'], 1)
+
+    def test_index_maintenance(self):
+        self.tomato.name = "Cherry Tomato"
+        self.tomato.save()
+        self.potato.delete()
+        query = {'search_string': 'chery', 'fuzzy': True}
+        response: Response = self.client.get('/ingredient/filter/paged', query, format='json')
+        self.assertEqual([item['id'] for item in response.data['results']], [self.tomato.pk])
+        Trigram.objects.all().delete()
+        out = io.StringIO()
+        call_command('rebuildtrigrams', stdout=out)
+        self.assertIn("4 objects", out.getvalue())
+        query = {'search_string': 'potatos', 'fuzzy': True}
+        response: Response = self.client.get('/ingredient/filter/paged', query, format='json')
+        self.assertEqual(response.data['count'], 0)
+        response: Response = self.client.get('/ingredient/filter/paged', query | {'search_string': 'tomatos'}, format='json')
+        self.assertEqual(response.data['count'], 1)
+
+
+class TestRelevance(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="user@example.com", name="Regular User")
+        self.base = Recipe.objects.create(
+            user=self.user, name="Vegetable Soup", title="On Tomato Base",
+            prep_time=10, calories=100, submit_status=SubmitStatuses.ACCEPTED
+        )
+        self.soup = Recipe.objects.create(
+            user=self.user, name="Tomato Soup", title="Hearty Soup",
+            prep_time=10, calories=100, submit_status=SubmitStatuses.ACCEPTED
+        )
+        self.bread = Recipe.objects.create(
+            user=self.user, name="Bread", title="Plain Bread",
+            prep_time=10, calories=100, submit_status=SubmitStatuses.ACCEPTED
+        )
+        self.long = Rating.objects.create(
+            user=self.user, recipe=self.soup, stars=4,
+            content="Soup was fine, although the evening was long and the bread arrived late.",
+        )
+        self.short = Rating.objects.create(user=self.user, recipe=self.base, stars=5, content="Great soup!")
+
+    def test_recipe_relevance(self):
+        query = {'search_string': 'tomato', 'order_by': ['relevance']}
+        response: Response = self.client.get('/recipe/filter/paged', query, format='json')
+        self.assertEqual([item['id'] for item in response.data['results']], [self.soup.pk, self.base.pk])
+        query = {'search_string': 'tomato', 'order_by': ['-relevance']}
+        response: Response = self.client.get('/recipe/filter/paged', query, format='json')
+        self.assertEqual([item['id'] for item in response.data['results']], [self.base.pk, self.soup.pk])
+        query = {'search_string': 'tomato', 'order_by': ['relevance'], 'page_size': 1, 'page': 2}
+        response: Response = self.client.get('/recipe/filter/paged', query, format='json')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([item['id'] for item in response.data['results']], [self.base.pk])
+        response: Response = self.client.get('/recipe/filter/paged', {'order_by': ['relevance']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_punctuation(self):
+        self.assertEqual(fulltext.tsquery("o'brien mac&cheese (tomato:* | !soup)", '|'), 'o:* | brien:* | mac:* | cheese:* | tomato:* | soup:*')
+        self.assertEqual(fulltext.tsquery("&& !", '&'), '')
+        for search_string in ["o'brien", "mac&cheese", "tomato | (soup:*", '"!"']:
+            query = {'search_string': search_string, 'order_by': ['relevance']}
+            response: Response = self.client.get('/recipe/filter/paged', query, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        query = {'search_string': "tomato's (soup)!", 'order_by': ['relevance']}
+        response: Response = self.client.get('/rating/filter/paged', query, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_rating_relevance(self):
+        query = {'search_string': 'soup', 'order_by': ['relevance']}
+        response: Response = self.client.get('/rating/filter/paged', query, format='json')
+        self.assertEqual([item['id'] for item in response.data['results']], [self.short.pk, self.long.pk])
+
+    def test_index_maintenance(self):
+        self.soup.name = "Soup"
+        self.soup.save()
+        self.bread.title = "Tomato Bread"
+        self.bread.save()
+        self.base.delete()
+        query = {'search_string': 'tomato', 'order_by': ['relevance']}
+        response: Response = self.client.get('/recipe/filter/paged', query, format='json')
+        self.assertEqual([item['id'] for item in response.data['results']], [self.bread.pk])
+        out = io.StringIO()
+        call_command('rebuildfulltext', stdout=out)
+        self.assertIn("3 objects", out.getvalue())
+        query = {'search_string': 'bread', 'order_by': ['relevance']}
+        response: Response = self.client.get('/recipe/filter/paged', query, format='json')
+        self.assertEqual([item['id'] for item in response.data['results']], [self.bread.pk])
+
+
+@override_settings(DEFAULT_FILE_STORAGE=media_utils.TEST_DEFAULT_FILE_STORAGE)
+@override_settings(MEDIA_ROOT=media_utils.TEST_MEDIA_ROOT)
+class TestSearch(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="user@example.com", name="Tomas Tomato")
+        self.banned = User.objects.create(email="banned@example.com", name="Tomato Banned", banned=True)
+        self.tomato = Ingredient.objects.create(name="Tomato", unit="g", photo=media_utils.generate_test_image())
+        self.paste = Ingredient.objects.create(name="Tomato Paste", unit="g", photo=media_utils.generate_test_image())
+        self.category = Category.objects.create(name="Soups", photo=media_utils.generate_test_image())
+        self.soup = Recipe.objects.create(
+            user=self.user, name="Tomato Soup", title="Hearty Soup",
+            prep_time=10, calories=100, submit_status=SubmitStatuses.ACCEPTED
+        )
+        self.salad = Recipe.objects.create(
+            user=self.user, name="Salad", title="Fresh Tomato Salad",
+            prep_time=10, calories=100, submit_status=SubmitStatuses.SUBMITTED
+        )
+
+    def tearDown(self):
+        media_utils.delete_test_media()
+
+    def test_search(self):
+        with self.assertNumQueries(1):
+            response: Response = self.client.get('/search', {'q': 'tomato'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'recipe': [{'id': self.soup.pk, 'name': "Tomato Soup"}],
+            'category': [],
+            'ingredient': [{'id': self.tomato.pk, 'name': "Tomato"}, {'id': self.paste.pk, 'name': "Tomato Paste"}],
+            'user': [{'id': self.user.pk, 'name': "Tomas Tomato"}],
+        })
+        response: Response = self.client.get('/search', {'q': 'tom sou', 'count': 1}, format='json')
+        self.assertEqual(response.data['recipe'], [{'id': self.soup.pk, 'name': "Tomato Soup"}])
+        self.assertEqual(response.data['ingredient'], [])
+        response: Response = self.client.get('/search', {'q': 'soup', 'count': 1}, format='json')
+        self.assertEqual(response.data['category'], [{'id': self.category.pk, 'name': "Soups"}])
+        response: Response = self.client.get('/search', {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_visibility_updates(self):
+        self.salad.submit_status = SubmitStatuses.ACCEPTED
+        self.salad.save()
+        self.soup.submit_status = SubmitStatuses.DENIED
+        self.soup.save()
+        self.paste.delete()
+        self.user.name = "Tom"
+        self.user.save()
+        response: Response = self.client.get('/search', {'q': 'tomato'}, format='json')
+        self.assertEqual(response.data['recipe'], [{'id': self.salad.pk, 'name': "Salad"}])
+        self.assertEqual(response.data['ingredient'], [{'id': self.tomato.pk, 'name': "Tomato"}])
+        self.assertEqual(response.data['user'], [])
+        out = io.StringIO()
+        call_command('rebuildfulltext', stdout=out)
+        self.assertIn("4 search entries", out.getvalue())
+
+    def test_unchanged_text_not_reindexed(self):
+        salad = Recipe.objects.get(pk=self.salad.pk)
+        salad.submit_status = SubmitStatuses.ACCEPTED
+        with CaptureQueriesContext(connection) as queries:
+            salad.save()
+        statements = ' '.join(query['sql'] for query in queries)
+        self.assertIn('search_fts', statements)
+        self.assertNotIn('recipe_fts', statements)
+        self.assertNotIn(Trigram._meta.db_table, statements)
+        with CaptureQueriesContext(connection) as queries:
+            salad.save()
+        self.assertNotIn('search_fts', ' '.join(query['sql'] for query in queries))
+        salad.title = "Green Salad Bowl"
+        with CaptureQueriesContext(connection) as queries:
+            salad.save()
+        statements = ' '.join(query['sql'] for query in queries)
+        self.assertIn('search_fts', statements)
+        self.assertIn('recipe_fts', statements)
+        response: Response = self.client.get('/search', {'q': 'green'}, format='json')
+        self.assertEqual(response.data['recipe'], [{'id': self.salad.pk, 'name': "Salad"}])
+
+    def test_unchanged_user_not_reindexed(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.vcode = "123456"
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertNotIn('search_fts', ' '.join(query['sql'] for query in queries))
+        user.name = "Tom"
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertIn('search_fts', ' '.join(query['sql'] for query in queries))
+
+    def test_punctuation(self):
+        self.assertEqual(fulltext.tsquery("o'brien tomato:*", '&'), 'o:* & brien:* & tomato:*')
+        for q in ["o'brien", "tomato & (soup", "!"]:
+            response: Response = self.client.get('/search', {'q': q}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TestCatalog(APITestCase):
+    def setUp(self):
+        self.users = [User.objects.create(email=f"user{i}@example.com", name=f"User {i}") for i in range(3)]
+        self.categories = [Category.objects.create(name=f"Category {i}") for i in range(3)]
+        self.recipes = []
+        for i in range(12):
+            recipe = Recipe.objects.create(
+                user=self.users[i % 3], name=f"Recipe {(i * 7) % 12:02}", title="Great Dish" if i % 2 else "Plain Dish",
+                prep_time=(i * 5) % 13 * 10, calories=100 + (i * 11) % 12 * 50,
+                submit_status=SubmitStatuses.ACCEPTED if i % 4 else SubmitStatuses.SUBMITTED,
+                created_at=utc_now() - timedelta(days=i)
+            )
+            recipe.categories.add(*self.categories[:i % 3 + 1])
+            self.recipes.append(recipe)
+
+    def assertSameAsDatabase(self, params: dict):
+        params = {'page': 1, 'page_size': 4} | params
+        response: Response = self.client.get('/recipe/filter/paged', params, format='json')
+        with patch('recipeAPIapp.utils.catalog.answerable', return_value=False):
+            expected: Response = self.client.get('/recipe/filter/paged', params, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, expected.data)
+
+    def test_filters(self):
+        self.assertSameAsDatabase({'order_by': ['name']})
+        self.assertSameAsDatabase({'order_by': ['-calories'], 'page': 2})
+        self.assertSameAsDatabase({'order_by': ['prep_time'], 'calories_limit': 900, 'servings': 2})
+        self.assertSameAsDatabase({'order_by': ['-created_at'], 'categories': [self.categories[2].pk]})
+        self.assertSameAsDatabase({'order_by': ['name'], 'user': self.users[1].pk, 'prep_time_limit': 80})
+        self.assertSameAsDatabase({'order_by': ['-calories'], 'search_string': "great recipe's"})
+        self.assertSameAsDatabase({'order_by': ['-prep_time', 'name'], 'page_size': 10})
+        self.assertSameAsDatabase({'categories': [self.categories[1].pk, self.categories[2].pk], 'page_size': 10})
+        self.assertFalse(catalog.answerable(None, {'order_by': ['-prep_time', 'name']}))
+
+    def test_queries(self):
+        self.client.get('/recipe/filter/paged', {'order_by': ['name']}, format='json')
+        with self.assertNumQueries(1):
+            response: Response = self.client.get('/recipe/filter/paged', {'order_by': ['name'], 'page_size': 3}, format='json')
+        self.assertEqual(response.data['count'], 9)
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_incremental_updates(self):
+        self.client.get('/recipe/filter/paged', {'order_by': ['name']}, format='json')
+        self.recipes[0].submit_status = SubmitStatuses.ACCEPTED
+        self.recipes[0].save()
+        self.recipes[1].name = "Renamed"
+        self.recipes[1].calories = 10
+        self.recipes[1].save()
+        self.recipes[2].categories.clear()
+        self.recipes[3].delete()
+        self.assertSameAsDatabase({'order_by': ['-name'], 'page_size': 20})
+        self.assertSameAsDatabase({'order_by': ['calories'], 'categories': [self.categories[0].pk], 'page_size': 20})
+        self.assertSameAsDatabase({'search_string': "renamed"})
+        self.assertSameAsDatabase({'order_by': ['calories'], 'user': self.users[1].pk, 'page_size': 20})
+        with override_settings(CATALOG_DELTA_LIMIT=1):
+            self.recipes[5].name = "Rebuilt"
+            self.recipes[5].save()
+            self.assertSameAsDatabase({'order_by': ['name'], 'page_size': 20})
+
+    def test_shared_file(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(CATALOG_DIR=directory):
+            catalog.index.reset()
+            self.assertSameAsDatabase({'order_by': ['-name'], 'page_size': 20})
+            files = os.listdir(directory)
+            self.assertEqual(len(files), 1)
+            other = catalog.RecipeCatalog()
+            other.cursor = catalog.index.cursor
+            try:
+                with self.assertNumQueries(0):
+                    buffer = other.load()
+                self.assertEqual(catalog.Columns(buffer).count, 9)
+            finally:
+                Snapshot.instances.remove(other)
+            catalog.index.reset()
+
+    def test_shared_file_rebuild(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(CATALOG_DIR=directory, CATALOG_DELTA_LIMIT=2):
+            catalog.index.reset()
+            self.assertSameAsDatabase({'order_by': ['name'], 'page_size': 20})
+            stale = os.path.join(directory, 'catalog-0.bin')
+            open(stale, 'wb').close()
+            for recipe in self.recipes[::4]:
+                recipe.submit_status = SubmitStatuses.ACCEPTED
+                recipe.save()
+                self.assertSameAsDatabase({'order_by': ['name'], 'page_size': 20})
+            self.assertEqual(catalog.index.select({'order_by': ['name'], 'page': 1, 'page_size': 20})[0], 12)
+            self.assertFalse(os.path.exists(stale))
+            self.assertEqual(os.listdir(directory), [f'catalog-{catalog.index.cursor[0]}.bin'])
+            catalog.index.reset()
+
+    def test_random(self):
+        accepted = {recipe.pk for recipe in self.recipes if recipe.submit_status == SubmitStatuses.ACCEPTED}
+        for _ in range(5):
+            response: Response = self.client.get('/recipe/random', {'count': 3, 'fields': ['id']}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            picked = [item['id'] for item in response.data]
+            self.assertEqual(len(set(picked)), 3)
+            self.assertTrue(set(picked) <= accepted)
+        params = {'count': 20, 'categories': [self.categories[2].pk], 'calories_limit': 1000, 'servings': 2}
+        response: Response = self.client.get('/recipe/random', params, format='json')
+        expected = Recipe.objects.filter(pk__in=accepted, categories=self.categories[2], calories__lte=500)
+        self.assertEqual({item['id'] for item in response.data}, set(expected.values_list('pk', flat=True)))
+        self.assertEqual(len(response.data), expected.count())
+        response: Response = self.client.get('/recipe/random', {'search_string': "missing"}, format='json')
+        self.assertEqual(response.data, [])
+        response: Response = self.client.get('/recipe/random', {'count': 21}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
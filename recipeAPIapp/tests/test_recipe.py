@@ -2,9 +2,12 @@ from decimal import Decimal
 from datetime import timedelta
 from unittest.mock import patch
 from django.test import override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.test import APITestCase
+import recipeAPIapp.utils.counters as counters
+import recipeAPIapp.utils.ordering as ordering
 import recipeAPIapp.utils.security as security
 import recipeAPIapp.tests.media_utils as media_utils
 from recipeAPIapp.models.timestamp import utc_now
@@ -279,6 +282,37 @@ class TestRecipePhotoCUD(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertTrue(RecipePhoto.objects.filter(pk=photo.pk).exists())
 
+    def test_reorder_recipe_photos(self):
+        photos = [
+            RecipePhoto.objects.create(recipe=self.recipe, photo=media_utils.generate_test_image(), number=number)
+            for number in [1, 2, 3]
+        ]
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.user_token}'}
+        order = [photos[2].pk, photos[0].pk, photos[1].pk]
+        response: Response = self.client.put(f'/recipe/photo/reorder/{self.recipe.pk}', {'order': order}, format='json', **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(RecipePhoto.objects.filter(recipe=self.recipe).order_by('number').values_list('pk', flat=True)), order)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.submit_status, SubmitStatuses.UNSUBMITTED)
+
+    def test_reorder_recipe_photos_invalid_permutation(self):
+        photos = [
+            RecipePhoto.objects.create(recipe=self.recipe, photo=media_utils.generate_test_image(), number=number)
+            for number in [1, 2]
+        ]
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.user_token}'}
+        for order in [[photos[0].pk], [photos[0].pk, photos[0].pk], [photos[1].pk, photos[0].pk, 0]]:
+            response: Response = self.client.put(f'/recipe/photo/reorder/{self.recipe.pk}', {'order': order}, format='json', **headers)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data, {'detail': {'order': ['order has to contain every item exactly once.']}})
+        self.assertEqual([photo.number for photo in RecipePhoto.objects.filter(recipe=self.recipe).order_by('pk')], [1, 2])
+
+    def test_reorder_recipe_photos_unauthorized(self):
+        photo = RecipePhoto.objects.create(recipe=self.recipe, photo=media_utils.generate_test_image(), number=1)
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.moderator_token}'}
+        response: Response = self.client.put(f'/recipe/photo/reorder/{self.recipe.pk}', {'order': [photo.pk]}, format='json', **headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
 
 @override_settings(DEFAULT_FILE_STORAGE=media_utils.TEST_DEFAULT_FILE_STORAGE)
 @override_settings(MEDIA_ROOT=media_utils.TEST_MEDIA_ROOT)
@@ -428,6 +462,36 @@ class TestRecipeInstructionCUD(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertTrue(RecipeInstruction.objects.filter(pk=instruction.pk).exists())
 
+    def test_reorder_recipe_instructions(self):
+        instructions = [
+            RecipeInstruction.objects.create(
+                recipe=self.recipe, number=number, title=f"Instruction 0{number}",
+                content=f"This is the content of instruction 0{number}."
+            ) for number in [1, 2, 3, 4]
+        ]
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.user_token}'}
+        order = [instructions[1].pk, instructions[0].pk, instructions[3].pk, instructions[2].pk]
+        response: Response = self.client.put(f'/recipe/instruction/reorder/{self.recipe.pk}', {'order': order}, format='json', **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(RecipeInstruction.objects.filter(recipe=self.recipe).order_by('number').values_list('pk', flat=True)), order)
+
+    def test_stale_positions(self):
+        instructions = [
+            RecipeInstruction.objects.create(
+                recipe=self.recipe, number=number, title=f"Instruction 0{number}",
+                content=f"This is the content of instruction 0{number}."
+            ) for number in [1, 2, 3]
+        ]
+        numbers = lambda: list(RecipeInstruction.objects.filter(recipe=self.recipe).order_by('number').values_list('pk', 'number'))
+        stale = RecipeInstruction.objects.get(pk=instructions[0].pk)
+        ordering.move(RecipeInstruction.objects.get(pk=instructions[0].pk), 3)
+        self.assertEqual(ordering.move(stale, 1), 1)
+        self.assertEqual(numbers(), [(instructions[0].pk, 1), (instructions[1].pk, 2), (instructions[2].pk, 3)])
+        stale = RecipeInstruction.objects.get(pk=instructions[2].pk)
+        ordering.move(RecipeInstruction.objects.get(pk=instructions[2].pk), 1)
+        ordering.remove(stale)
+        self.assertEqual(numbers(), [(instructions[0].pk, 1), (instructions[1].pk, 2)])
+
 
 @override_settings(DEFAULT_FILE_STORAGE=media_utils.TEST_DEFAULT_FILE_STORAGE)
 @override_settings(MEDIA_ROOT=media_utils.TEST_MEDIA_ROOT)
@@ -544,6 +608,114 @@ class TestRecipeIngredients(APITestCase):
         self.assertTrue(RecipeIngredient.objects.filter(recipe=self.recipe, ingredient=self.ingredient).exists())
 
 
+@override_settings(DEFAULT_FILE_STORAGE=media_utils.TEST_DEFAULT_FILE_STORAGE)
+@override_settings(MEDIA_ROOT=media_utils.TEST_MEDIA_ROOT)
+class TestRecipeBulk(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="user@example.com", name="Regular User")
+        self.user_token = security.generate_token(self.user)
+        self.other_user = User.objects.create(email="other_user@example.com", name="Other User")
+        self.other_user_token = security.generate_token(self.other_user)
+        self.category1 = Category.objects.create(name="Category 1", photo=media_utils.generate_test_image())
+        self.category2 = Category.objects.create(name="Category 2", photo=media_utils.generate_test_image())
+        self.ingredient1 = Ingredient.objects.create(name="Ingredient 1", unit="kg", photo=media_utils.generate_test_image())
+        self.ingredient2 = Ingredient.objects.create(name="Ingredient 2", unit="g", photo=media_utils.generate_test_image())
+
+    def tearDown(self):
+        media_utils.delete_test_media()
+
+    def recipe_data(self):
+        return {
+            'name': 'Bulk Recipe', 'title': 'Bulk Recipe Title', 'prep_time': 30, 'calories': 200,
+            'categories': [self.category2.pk, self.category1.pk],
+            'photos': [media_utils.generate_test_image(), media_utils.generate_test_image((255, 0, 0))],
+            'instructions[0]title': 'First step', 'instructions[0]content': 'Content of the first instruction.',
+            'instructions[0]photo': media_utils.generate_test_image(),
+            'instructions[1]title': 'Second step', 'instructions[1]content': 'Content of the second instruction.',
+            'ingredients[0]ingredient': self.ingredient1.pk, 'ingredients[0]amount': '1.5',
+            'ingredients[1]ingredient': self.ingredient2.pk, 'ingredients[1]amount': '0.25',
+        }
+
+    def test_create_recipe_bulk(self):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.user_token}'}
+        response: Response = self.client.post('/recipe/bulk', self.recipe_data(), format='multipart', **headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(pk=response.data['id'])
+        self.assertEqual(recipe.user, self.user)
+        self.assertEqual(recipe.submit_status, SubmitStatuses.UNSUBMITTED)
+        self.assertEqual(set(recipe.categories.all()), {self.category1, self.category2})
+        photos = RecipePhoto.objects.filter(recipe=recipe).order_by('number')
+        self.assertEqual([photo.number for photo in photos], [1, 2])
+        self.assertTrue(all(photo.photo.storage.exists(photo.photo.name) for photo in photos))
+        instructions = RecipeInstruction.objects.filter(recipe=recipe).order_by('number')
+        self.assertEqual([(instr.number, instr.title) for instr in instructions], [(1, 'First step'), (2, 'Second step')])
+        self.assertTrue(instructions[0].photo)
+        self.assertFalse(instructions[1].photo)
+        ingredients = RecipeIngredient.objects.filter(recipe=recipe).order_by('ingredient')
+        self.assertEqual([ingr.amount for ingr in ingredients], [Decimal('1.5'), Decimal('0.25')])
+        response: Response = self.client.put(f'/recipe/submit/{recipe.pk}', format='json', **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_replace_recipe_bulk(self):
+        recipe = Recipe.objects.create(
+            user=self.user, name="Old Recipe", title="Old Recipe Title", prep_time=10, calories=100,
+            submit_status=SubmitStatuses.DENIED, deny_message="Denied."
+        )
+        recipe.categories.add(self.category1)
+        RecipePhoto.objects.create(recipe=recipe, photo=media_utils.generate_test_image(), number=1)
+        RecipeInstruction.objects.create(recipe=recipe, title="Old step", content="Content of the old instruction.", number=1)
+        RecipeIngredient.objects.create(recipe=recipe, ingredient=self.ingredient2, amount=3)
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.user_token}'}
+        data = self.recipe_data() | {'categories': [self.category2.pk], 'photos': [media_utils.generate_test_image()]}
+        response: Response = self.client.put(f'/recipe/bulk/{recipe.pk}', data, format='multipart', **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Bulk Recipe')
+        self.assertEqual(recipe.submit_status, SubmitStatuses.UNSUBMITTED)
+        self.assertIsNone(recipe.deny_message)
+        self.assertEqual(list(recipe.categories.all()), [self.category2])
+        self.assertEqual(RecipePhoto.objects.filter(recipe=recipe).count(), 1)
+        self.assertEqual(RecipeInstruction.objects.filter(recipe=recipe).count(), 2)
+        self.assertEqual(RecipeIngredient.objects.get(recipe=recipe, ingredient=self.ingredient2).amount, Decimal('0.25'))
+
+    def test_replace_recipe_bulk_unauthorized(self):
+        recipe = Recipe.objects.create(user=self.user, name="Old Recipe", title="Old Recipe Title", prep_time=10, calories=100)
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.other_user_token}'}
+        response: Response = self.client.put(f'/recipe/bulk/{recipe.pk}', self.recipe_data(), format='multipart', **headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @patch('recipeAPIapp.apps.Config.PerRecipeLimits.photos', 1)
+    @patch('recipeAPIapp.apps.Config.PerRecipeLimits.instructions', 1)
+    def test_create_recipe_bulk_limits_exceeded(self):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.user_token}'}
+        response: Response = self.client.post('/recipe/bulk', self.recipe_data(), format='multipart', **headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'detail': {
+            'photos': ['photo limit exceeded.'], 'instructions': ['instruction limit exceeded.']
+        }})
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_create_recipe_bulk_invalid_content(self):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.user_token}'}
+        invalid_photo = SimpleUploadedFile('photo.jpg', b'not an image', content_type='image/jpeg')
+        data = self.recipe_data() | {'instructions[1]photo': invalid_photo, 'ingredients[1]ingredient': self.ingredient1.pk}
+        response: Response = self.client.post('/recipe/bulk', data, format='multipart', **headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'detail': {
+            'instructions': ['photo file is not an image.'], 'ingredients': ['duplicate ingredients.']
+        }})
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_create_recipe_bulk_failure_removes_photos(self):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.user_token}'}
+        with patch.object(RecipeIngredient.objects, 'bulk_create', side_effect=RuntimeError):
+            response: Response = self.client.post('/recipe/bulk', self.recipe_data(), format='multipart', **headers)
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertFalse(Recipe.objects.exists())
+        for folder in ('recipe', 'instruction'):
+            self.assertEqual(list((media_utils.TEST_MEDIA_ROOT / folder).glob('*')), [])
+
+
 @override_settings(DEFAULT_FILE_STORAGE=media_utils.TEST_DEFAULT_FILE_STORAGE)
 @override_settings(MEDIA_ROOT=media_utils.TEST_MEDIA_ROOT)
 class TestRecipeSubmission(APITestCase):
@@ -809,6 +981,59 @@ class TestCookRecipe(APITestCase):
         response: Response = self.client.post(f'/recipe/cook/{self.recipe.pk}', format='json', **headers)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    def test_plan_recipes_apply(self):
+        recipe2 = Recipe.objects.create(
+            name="Test Recipe 2", title="Test Recipe Title 2",
+            user=self.user, prep_time=30, calories=200,
+            submit_status=SubmitStatuses.ACCEPTED
+        )
+        RecipeIngredient.objects.create(recipe=recipe2, ingredient=self.ingredient1, amount=Decimal('1.0'))
+        RecipeIngredient.objects.create(recipe=recipe2, ingredient=self.ingredient4, amount=Decimal('0.5'))
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.user_token}'}
+        recipes = [{'recipe': self.recipe.pk, 'servings': 1}, {'recipe': recipe2.pk}, {'recipe': self.recipe.pk}]
+        with self.captureOnCommitCallbacks(execute=True):
+            response: Response = self.client.post('/recipe/plan', {'recipes': recipes, 'apply': True}, format='json', **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['sufficient'])
+        self.assertEqual(
+            [(item['id'], item['required'], item['owned'], item['missing']) for item in response.data['ingredients']], [
+                (self.ingredient1.pk, '2.00', '2.00', '0.00'), (self.ingredient2.pk, '1.80', '1.80', '0.00'),
+                (self.ingredient3.pk, '1.60', '3.00', '0.00'), (self.ingredient4.pk, '0.50', '1.00', '0.00'),
+            ]
+        )
+        inventory = UserIngredient.objects.filter(user=self.user).order_by('ingredient')
+        self.assertEqual([(item.ingredient, item.amount) for item in inventory], [
+            (self.ingredient3, Decimal('1.4')), (self.ingredient4, Decimal('0.5'))
+        ])
+        counters.buffer.flush()
+        for recipe in (self.recipe, recipe2):
+            recipe.refresh_from_db()
+            self.assertEqual(recipe.cook_count, 1)
+            self.assertGreater(recipe.trending, 0)
+
+    def test_plan_recipes_shopping_list(self):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.user_token}'}
+        recipes = [{'recipe': self.recipe.pk, 'servings': 3}]
+        response: Response = self.client.post('/recipe/plan', {'recipes': recipes}, format='json', **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['sufficient'])
+        self.assertEqual(response.data['ingredients'][1], {
+            'id': self.ingredient2.pk, 'photo': self.ingredient2.photo.url, 'unit': 'g', 'name': 'Ingredient 2',
+            'required': '2.70', 'owned': '1.80', 'missing': '0.90'
+        })
+        response: Response = self.client.post('/recipe/plan', {'recipes': recipes, 'apply': True}, format='json', **headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'detail': {'non_field_errors': ['insufficient ingredients.']}})
+        self.assertEqual(UserIngredient.objects.get(user=self.user, ingredient=self.ingredient2).amount, Decimal('1.8'))
+
+    def test_plan_recipes_not_accepted(self):
+        self.recipe.submit_status = SubmitStatuses.SUBMITTED
+        self.recipe.save()
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.user_token}'}
+        response: Response = self.client.post('/recipe/plan', {'recipes': [{'recipe': self.recipe.pk}]}, format='json', **headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'detail': {'recipes': [f'Invalid pk "{self.recipe.pk}" - object does not exist.']}})
+
 
 @override_settings(DEFAULT_FILE_STORAGE=media_utils.TEST_DEFAULT_FILE_STORAGE)
 @override_settings(MEDIA_ROOT=media_utils.TEST_MEDIA_ROOT)
@@ -919,7 +1144,8 @@ class TestRecipeDetail(APITestCase):
             'deny_message': None,
             'rating_count': 2, 'avg_rating': 3.0,
             'favoured': True, 'cookable_portions': 2,
-            'favoured_count': 2, 'categories': [
+            'favoured_count': 2, 'view_count': 0,
+            'cook_count': 0, 'categories': [
                 {
                     'id': self.category1.pk, 
                     'photo': self.category1.photo.url, 
@@ -1008,6 +1234,38 @@ class TestRecipeDetail(APITestCase):
         self.assertIsNone(response.data['favoured'])
         self.assertIsNone(response.data['cookable_portions'])
 
+    def test_get_recipe_detail_view_count(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(f'/recipe/detail/{self.recipe.pk}', format='json')
+        response: Response = self.client.get(f'/recipe/detail/{self.recipe.pk}', format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['view_count'], 1)
+        counters.buffer.flush()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.view_count, 1)
+        response: Response = self.client.get(f'/recipe/detail/{self.recipe.pk}', format='json')
+        self.assertEqual(response.data['view_count'], 1)
+
+    def test_get_recipe_detail_fields(self):
+        params = {'fields': ['id', 'name', 'photos']}
+        response: Response = self.client.get(f'/recipe/detail/{self.recipe.pk}', params, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'id': self.recipe.pk, 'name': 'Test Recipe',
+            'photos': [
+                {'id': self.photo2.pk, 'photo': self.photo2.photo.url}, 
+                {'id': self.photo1.pk, 'photo': self.photo1.photo.url}
+            ]
+        })
+        params = {'exclude': ['instructions', 'ingredients', 'categories']}
+        response: Response = self.client.get(f'/recipe/detail/{self.recipe.pk}', params, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('instructions', response.data)
+        self.assertEqual(response.data['rating_count'], 2)
+        params = {'exclude': ['unknown']}
+        response: Response = self.client.get(f'/recipe/detail/{self.recipe.pk}', params, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 @override_settings(DEFAULT_FILE_STORAGE=media_utils.TEST_DEFAULT_FILE_STORAGE)
 @override_settings(MEDIA_ROOT=media_utils.TEST_MEDIA_ROOT)
@@ -0,0 +1,99 @@
+from decimal import Decimal
+from datetime import timedelta
+from django.db.models import Count, Avg, Q, Value
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+import recipeAPIapp.serializers.categorical as categorical_serializers
+import recipeAPIapp.serializers.recipe as recipe_serializers
+import recipeAPIapp.serializers.user as user_serializers
+import recipeAPIapp.serializers.lean as lean
+import recipeAPIapp.tests.media_utils as media_utils
+from recipeAPIapp.models.timestamp import utc_now
+from recipeAPIapp.models.user import User, UserReport
+from recipeAPIapp.models.categorical import Category, Ingredient, UserIngredient
+from recipeAPIapp.models.recipe import Recipe, RecipePhoto, RecipeIngredient, Rating
+from recipeAPIapp.models.recipe import SubmitStatuses as Statuses
+
+
+
+@override_settings(DEFAULT_FILE_STORAGE=media_utils.TEST_DEFAULT_FILE_STORAGE)
+@override_settings(MEDIA_ROOT=media_utils.TEST_MEDIA_ROOT)
+class TestLeanSerialization(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="user@example.com", name="User", photo=media_utils.generate_test_image())
+        self.other = User.objects.create(email="other@example.com", name="Other", moderator=True)
+        UserReport.objects.create(user=self.user, reported=self.other)
+        self.category = Category.objects.create(name="Italian", photo=media_utils.generate_test_image(), about="About")
+        Category.objects.create(name="Mexican", photo=media_utils.generate_test_image())
+        self.category.favoured_by.add(self.user)
+        self.tomato = Ingredient.objects.create(name="Tomato", unit="kg", photo=media_utils.generate_test_image())
+        self.cheese = Ingredient.objects.create(name="Cheese", unit="kg", photo=media_utils.generate_test_image(), about="Hard")
+        UserIngredient.objects.create(user=self.user, ingredient=self.tomato, amount=Decimal('0.6'))
+        UserIngredient.objects.create(user=self.user, ingredient=self.cheese, amount=Decimal('12'))
+        self.recipes = [
+            Recipe.objects.create(
+                user=user, name=f"Recipe {idx}", title="Recipe Title", prep_time=10 * idx, calories=100 * idx,
+                submit_status=status, deny_message="Denied." if status == Statuses.DENIED else None,
+                created_at=utc_now() - timedelta(days=idx, microseconds=idx)
+            ) for idx, (user, status) in enumerate([
+                (self.user, Statuses.ACCEPTED), (self.other, Statuses.ACCEPTED),
+                (self.user, Statuses.DENIED), (self.other, Statuses.DENIED)
+            ])
+        ]
+        self.recipes[0].categories.add(self.category)
+        self.recipes[1].favoured_by.add(self.user)
+        for number in [2, 1]:
+            RecipePhoto.objects.create(recipe=self.recipes[0], photo=media_utils.generate_test_image(), number=number)
+        RecipeIngredient.objects.create(recipe=self.recipes[0], ingredient=self.tomato, amount=Decimal('0.5'))
+        RecipeIngredient.objects.create(recipe=self.recipes[1], ingredient=self.tomato, amount=Decimal('1.5'))
+        Rating.objects.create(user=self.other, recipe=self.recipes[0], stars=4, content="Very good recipe.")
+        rating = Rating.objects.create(
+            user=self.user, recipe=self.recipes[1], stars=3,
+            photo=media_utils.generate_test_image(), edited_at=utc_now()
+        )
+        rating.liked_by.add(self.user)
+
+    def tearDown(self):
+        media_utils.delete_test_media()
+
+    def assertIdentical(self, serializer, lean_serializer, qryset, **kwargs):
+        expected = JSONRenderer().render(serializer(qryset.all(), many=True, **kwargs).data)
+        self.assertEqual(JSONRenderer().render(lean_serializer(qryset.all(), **kwargs).data), expected)
+        self.assertIn(b'"id"', expected)
+
+    def test_recipe_base_data(self):
+        qryset = Recipe.objects.all()
+        qryset = qryset.annotate(rating_count=Count('rating', distinct=True))
+        qryset = qryset.annotate(avg_rating=Avg('rating__stars', distinct=True))
+        qryset = qryset.order_by('name')
+        for user in [self.user, self.other, None]:
+            self.assertIdentical(recipe_serializers.RecipeBaseData, lean.RecipeBaseData, qryset, user=user)
+            self.assertIdentical(recipe_serializers.RecipeBaseData, lean.RecipeBaseData, qryset[1:3], user=user)
+
+    def test_rating_data(self):
+        qryset = Rating.objects.annotate(like_count=Count('liked_by', distinct=True)).order_by('pk')
+        for user in [self.user, self.other, None]:
+            self.assertIdentical(recipe_serializers.RatingData, lean.RatingData, qryset, user=user)
+            self.assertIdentical(recipe_serializers.RatingRecipeData, lean.RatingRecipeData, qryset, user=user)
+            self.assertIdentical(recipe_serializers.RatingUserData, lean.RatingUserData, qryset, user=user)
+
+    def test_category_data(self):
+        qryset = Category.objects.annotate(self_recipe_count=Count('recipes', distinct=True, filter=Q(recipes__user=self.user)))
+        self.assertIdentical(categorical_serializers.CategoryData, lean.CategoryData, qryset.order_by('name'), user=self.user)
+        qryset = qryset.annotate(self_recipe_count=Value(0))
+        self.assertIdentical(categorical_serializers.CategoryData, lean.CategoryData, qryset.order_by('-name'), user=None)
+
+    def test_ingredient_data(self):
+        qryset = Ingredient.objects.annotate(self_recipe_count=Count('recipeingredient', distinct=True, filter=Q(recipeingredient__recipe__user=self.user)))
+        self.assertIdentical(categorical_serializers.IngredientData, lean.IngredientData, qryset.order_by('name'), user=self.user)
+        self.assertIdentical(categorical_serializers.IngredientData, lean.IngredientData, qryset.order_by('name'), user=self.other)
+        self.assertIdentical(categorical_serializers.IngredientData, lean.IngredientData, qryset.order_by('name'), user=None)
+
+    def test_user_filter_data(self):
+        qryset = User.objects.annotate(recipe_count=Count('recipe', distinct=True, filter=Q(recipe__submit_status=Statuses.ACCEPTED)))
+        qryset = qryset.annotate(rating_count=Count('recipe__rating', distinct=True))
+        qryset = qryset.annotate(avg_rating=Avg('recipe__rating__stars', distinct=True))
+        qryset = qryset.annotate(report_count=Count('reported', distinct=True)).order_by('name')
+        self.assertIdentical(user_serializers.UserFilterData, lean.UserFilterData, qryset)
+        self.assertIdentical(user_serializers.UserModeratorFilterData, lean.UserModeratorFilterData, qryset)
@@ -1,11 +1,13 @@
+import io
 from django.test import override_settings
+from django.core.management import call_command
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.test import APITestCase
 import recipeAPIapp.utils.security as security
 import recipeAPIapp.tests.media_utils as media_utils
 from recipeAPIapp.apps import Config
-from recipeAPIapp.models.user import User, UserReport
+from recipeAPIapp.models.user import User, UserReport, UserStats
 from recipeAPIapp.models.recipe import Recipe, Rating, SubmitStatuses
 
 
@@ -386,3 +388,56 @@ class TestUserSelfDetail(APITestCase):
     def test_self_detail_unauthenticated(self):
         response: Response = self.client.get('/user/self-detail', format='json')
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestUserStats(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create(email="author@example.com", name="Author")
+        self.rater = User.objects.create(email="rater@example.com", name="Rater")
+        self.recipe = Recipe.objects.create(
+            user=self.author, name="Recipe", title="Recipe Title",
+            submit_status=SubmitStatuses.ACCEPTED, prep_time=10, calories=100
+        )
+        self.rating = Rating.objects.create(user=self.rater, recipe=self.recipe, stars=4)
+        UserReport.objects.create(user=self.rater, reported=self.author)
+
+    def stats(self):
+        stats = UserStats.objects.get(user=self.author)
+        return stats.recipe_count, stats.rating_count, stats.rating_sum, stats.report_count
+
+    def test_maintained(self):
+        self.assertEqual(self.stats(), (1, 1, 4, 1))
+        self.rating.stars = 2
+        self.rating.save()
+        self.assertEqual(self.stats(), (1, 1, 2, 1))
+        self.recipe.submit_status = SubmitStatuses.UNSUBMITTED
+        self.recipe.save()
+        self.assertEqual(self.stats(), (0, 1, 2, 1))
+        UserReport.objects.filter(reported=self.author).delete()
+        self.rater.delete()
+        self.assertEqual(self.stats(), (0, 0, 0, 0))
+
+    def test_recipe_deleted(self):
+        self.recipe.delete()
+        self.assertEqual(self.stats(), (0, 0, 0, 1))
+
+    def test_rebuild(self):
+        UserStats.objects.filter(user=self.author).update(recipe_count=5, rating_sum=0)
+        UserStats.objects.filter(user=self.rater).delete()
+        call_command('rebuildstats', stdout=io.StringIO())
+        self.assertEqual(self.stats(), (1, 1, 4, 1))
+        self.assertEqual(UserStats.objects.get(user=self.rater).recipe_count, 0)
+
+    def test_detail_queries(self):
+        with self.assertNumQueries(1):
+            response: Response = self.client.get(f'/user/detail/{self.author.pk}', format='json')
+        self.assertEqual(response.data['avg_rating'], 4.0)
+
+    def test_missing_row(self):
+        UserStats.objects.filter(user=self.author).delete()
+        response: Response = self.client.get(f'/user/detail/{self.author.pk}', format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['recipe_count'], response.data['avg_rating']), (0, 0))
+        response: Response = self.client.get('/user/filter/paged', {'order_by': ['-recipe_count'], 'page': 1, 'page_size': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([user['recipe_count'] for user in response.data['results']], [0, 0])
@@ -1,32 +1,53 @@
-import logging, jwt, io
+import logging, jwt, io, gzip, json, os, tempfile
+from array import array
+from unittest.mock import patch
+from decimal import Decimal
 import django.core.mail as mail
 import django.utils.crypto as django_crypto
 from datetime import timedelta
 from PIL import Image
 from django.urls import path
-from django.http import Http404
+from django.http import Http404, HttpResponse
+from django.core.cache import caches
 from django.test import override_settings
 from django.conf import settings
+from django.db import transaction
 from django.core.exceptions import PermissionDenied
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.db.models import Count, Avg
 from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.utils.functional import lazy
 from rest_framework import status, serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.test import APITestCase, APIRequestFactory
+import recipeAPIapp.utils.compression as Compression
+import recipeAPIapp.utils.counters as Counters
 import recipeAPIapp.utils.exception as Exceptions
 import recipeAPIapp.utils.filtering as Filtering
+import recipeAPIapp.utils.instrumentation as Instrumentation
+import recipeAPIapp.utils.metrics as Metrics
 import recipeAPIapp.utils.permission as Permissions
+import recipeAPIapp.utils.rendering as Rendering
+import recipeAPIapp.utils.recommendation as Recommendations
+import recipeAPIapp.utils.reference as References
 import recipeAPIapp.utils.security as Security
+import recipeAPIapp.utils.snapshot as Snapshots
 import recipeAPIapp.utils.validation as Validation
 import recipeAPIapp.utils.verification as Verification
 import recipeAPIapp.tests.media_utils as media_utils
+import recipeAPIapp.serializers.categorical as categorical_serializers
+import recipeAPIapp.serializers.recipe as recipe_serializers
 from recipeAPIapp.apps import Config
 from recipeAPIapp.utils.exception import VerificationException
 from recipeAPIapp.models.timestamp import utc_now
 from recipeAPIapp.models.user import User, EmailRecord
-from recipeAPIapp.models.recipe import Recipe, Rating, SubmitStatuses
+from recipeAPIapp.models.change import Change
+from recipeAPIapp.models.categorical import Category, Ingredient
+from recipeAPIapp.models.recipe import Recipe, Rating, RecipeIngredient, SubmitStatuses
+from recipeAPIapp.models.recommendation import Recommendation
 
 
 
@@ -53,8 +74,29 @@ class ExceptionView(APIView):
                 raise Exception("An internal error occurred.")
 
 
+class PayloadView(APIView):
+    def get(self, request, size):
+        response = Response([{'id': idx, 'name': 'Recipe Name'} for idx in range(size)])
+        if 'cache_control' in request.query_params:
+            response['Cache-Control'] = request.query_params['cache_control']
+        return response
+
+
+class ImagePayloadView(APIView):
+    def get(self, _):
+        return HttpResponse(b'0' * 4096, content_type='image/jpeg')
+
+
+class QueryView(APIView):
+    def get(self, _, count):
+        return Response([User.objects.filter(pk=pk).exists() for pk in range(count)])
+
+
 urlpatterns = [
     path('test/exceptions/<str:exception_type>', ExceptionView.as_view()),
+    path('test/payload/<int:size>', PayloadView.as_view()),
+    path('test/image-payload', ImagePayloadView.as_view()),
+    path('test/queries/<int:count>', QueryView.as_view()),
 ]
 
 
@@ -676,3 +718,422 @@ class TestMedia(APITestCase):
     def test_non_existent_file(self):
         response: Response = self.client.get('/media/user/non_existent_file.jpg')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(ROOT_URLCONF='recipeAPIapp.tests.test_utils')
+@override_settings(COMPRESSION_MIN_SIZE=1024, COMPRESSION_CACHE='default')
+class TestCompression(APITestCase):
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_negotiate(self):
+        available = ['br', 'zstd', 'gzip']
+        self.assertEqual(Compression.negotiate('gzip, deflate, br', available), 'br')
+        self.assertEqual(Compression.negotiate('gzip;q=1.0, br;q=0.5', available), 'gzip')
+        self.assertEqual(Compression.negotiate('br;q=0, *;q=0.1', available), 'zstd')
+        self.assertEqual(Compression.negotiate('identity', available), None)
+        self.assertEqual(Compression.negotiate('', available), None)
+
+    def test_gzip_response(self):
+        response = self.client.get('/test/payload/200', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        plain = self.client.get('/test/payload/200')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_small_and_media_responses_skipped(self):
+        response = self.client.get('/test/payload/2', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.get('/test/image-payload', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, b'0' * 4096)
+
+    def test_compressed_body_reused(self):
+        with patch('recipeAPIapp.utils.compression.gzip.compress', wraps=gzip.compress) as compress:
+            first = self.client.get('/test/payload/200', HTTP_ACCEPT_ENCODING='gzip')
+            second = self.client.get('/test/payload/200', HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(compress.call_count, 1)
+            self.assertEqual(first.content, second.content)
+            with override_settings(COMPRESSION_CACHE=None):
+                self.client.get('/test/payload/200', HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(compress.call_count, 2)
+
+    def test_cache_control_respected(self):
+        params = {'cache_control': 'public, no-transform'}
+        response = self.client.get('/test/payload/200', params, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        with patch('recipeAPIapp.utils.compression.gzip.compress', wraps=gzip.compress) as compress:
+            for _ in range(2):
+                params = {'cache_control': 'private, max-age=60'}
+                response = self.client.get('/test/payload/200', params, HTTP_ACCEPT_ENCODING='gzip')
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(compress.call_count, 2)
+
+
+@override_settings(ROOT_URLCONF='recipeAPIapp.tests.test_utils', QUERY_INSTRUMENTATION=True, DEBUG=True)
+class TestInstrumentation(APITestCase):
+    def setUp(self):
+        Instrumentation.routes.clear()
+
+    def test_shape(self):
+        first = 'SELECT "id" FROM "user" WHERE "id" IN (%s, %s, %s) AND "name" = \'a\' LIMIT 21'
+        second = 'SELECT "id" FROM "user" WHERE "id" IN (%s) AND "name" = \'b\' LIMIT 5'
+        self.assertEqual(Instrumentation.shape(first), Instrumentation.shape(second))
+        self.assertIn('IN (...)', Instrumentation.shape(first))
+
+    def test_request_recorded(self):
+        response = self.client.get('/test/queries/2')
+        self.assertEqual(response['X-Query-Count'], '2')
+        self.assertEqual(response['X-Query-Repeated'], '0')
+        self.assertGreaterEqual(float(response['X-Query-Time']), 0)
+        with override_settings(DEBUG=False):
+            response = self.client.get('/test/queries/2')
+            self.assertFalse(response.has_header('X-Query-Count'))
+        report = Instrumentation.routes.report()['test/queries/<int:count>']
+        self.assertEqual((report['requests'], report['queries'], report['max_queries']), (2, 4, 2))
+        self.assertEqual(report['over_budget'], 0)
+        self.assertEqual(report['repeated'], [])
+        with override_settings(QUERY_INSTRUMENTATION=False):
+            response = self.client.get('/test/queries/2')
+            self.assertFalse(response.has_header('X-Query-Count'))
+        self.assertEqual(Instrumentation.routes.report()['test/queries/<int:count>']['requests'], 2)
+
+    @override_settings(QUERY_REPEAT_THRESHOLD=5, QUERY_BUDGETS={'test/queries/<int:count>': 4})
+    def test_repeated_queries_and_budget(self):
+        with self.assertLogs('recipeAPIapp.utils.instrumentation', level='WARNING') as logs:
+            response = self.client.get('/test/queries/6')
+        self.assertEqual(response['X-Query-Repeated'], '6')
+        self.assertTrue(any('Query budget exceeded' in line for line in logs.output))
+        self.assertTrue(any('Repeated query' in line for line in logs.output))
+        report = Instrumentation.routes.report()['test/queries/<int:count>']
+        self.assertEqual(report['over_budget'], 1)
+        self.assertEqual(len(report['repeated']), 1)
+        self.assertEqual(report['repeated'][0]['count'], 6)
+        self.assertLessEqual(len(report['slowest']), settings.QUERY_SLOWEST)
+
+    @override_settings(ROOT_URLCONF='recipeAPI.urls', APP_ADMIN_CODE='TEST_ADMIN_CODE')
+    def test_metrics_endpoint(self):
+        self.client.get('/search', {'q': 'tomato'})
+        response = self.client.get('/metrics/queries')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get('/metrics/queries', HTTP_ADMINCODE='TEST_ADMIN_CODE')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['search']['requests'], 1)
+
+
+@override_settings(ROOT_URLCONF='recipeAPIapp.tests.test_utils', METRICS=True, METRICS_DIR=None)
+class TestMetrics(APITestCase):
+    def setUp(self):
+        caches['default'].clear()
+        Metrics.registry.clear()
+        Metrics.recommended.checked = None
+
+    def test_requests_recorded(self):
+        self.client.get('/test/queries/3')
+        self.client.get('/test/queries/3')
+        self.client.get('/test/exceptions/not-found')
+        text = Metrics.exposition()
+        self.assertIn('# TYPE http_requests_total counter', text)
+        self.assertIn('http_requests_total{method="GET",route="test/queries/<int:count>",status="200"} 2', text)
+        self.assertIn('http_requests_total{method="GET",route="test/exceptions/<str:exception_type>",status="404"} 1', text)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="test/queries/<int:count>",le="+Inf"} 2', text)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="test/queries/<int:count>"} 2', text)
+        self.assertIn('http_request_db_seconds_count{method="GET",route="test/queries/<int:count>"} 2', text)
+        self.assertIn('counter_buffer_pending{pid="%d"} 0' % os.getpid(), text)
+        with override_settings(METRICS=False):
+            self.client.get('/test/queries/3')
+        self.assertIn('status="200"} 2', Metrics.exposition())
+
+    def test_histogram_buckets(self):
+        with override_settings(METRICS_BUCKETS=(0.125, 1)):
+            for value in (0.0625, 0.125, 0.5, 3):
+                Metrics.registry.observe('http_request_duration_seconds', value, route='r', method='GET')
+            text = Metrics.exposition()
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="r",le="0.125"} 2', text)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="r",le="1"} 3', text)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="r",le="+Inf"} 4', text)
+        self.assertIn('http_request_duration_seconds_sum{method="GET",route="r"} 3.6875', text)
+
+    def test_cache_hit_ratio(self):
+        for _ in range(4):
+            self.client.get('/test/payload/200', HTTP_ACCEPT_ENCODING='gzip')
+        text = Metrics.exposition()
+        self.assertIn('cache_requests_total{cache="compression",result="hit"} 3', text)
+        self.assertIn('cache_requests_total{cache="compression",result="miss"} 1', text)
+        self.assertIn('cache_hit_ratio{cache="compression"} 0.75', text)
+
+    def test_worker_processes_summed(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            self.client.get('/test/queries/1')
+            labels = [['method', 'GET'], ['route', 'test/queries/<int:count>'], ['status', '200']]
+            """ Parent pid is alive, its older file was left by an exited worker the pid was reused from """
+            for pid, started, count in ((os.getppid(), 2, 2), (os.getppid(), 1, 4), (4194305, 1, 2)):
+                with open(os.path.join(directory, f'metrics-{pid}-{started}.json'), 'w') as file:
+                    json.dump({
+                        'counters': [['http_requests_total', labels, count]], 'histograms': [],
+                        'gauges': [['counter_buffer_pending', [['pid', str(pid)]], count + 5]],
+                    }, file)
+            text = Metrics.exposition()
+            self.assertIn('http_requests_total{method="GET",route="test/queries/<int:count>",status="200"} 9', text)
+            self.assertIn('counter_buffer_pending{pid="%d"} 7' % os.getppid(), text)
+            self.assertNotIn('counter_buffer_pending{pid="4194305"}', text)
+            files = sorted(os.listdir(directory))
+            self.assertEqual(files, sorted([
+                Metrics.registry.name, f'metrics-{os.getppid()}-2.json', 'metrics-archive.json', 'metrics-archive.lock'
+            ]))
+            text = Metrics.exposition()
+            self.assertIn('http_requests_total{method="GET",route="test/queries/<int:count>",status="200"} 9', text)
+
+    def test_recommendation_age_cached(self):
+        user = User.objects.create(email="user@example.com", name="Regular User")
+        recipe = Recipe.objects.create(user=user, name="Soup", title="Soup", prep_time=10, calories=100)
+        Recommendation.objects.create(user=user, recipe=recipe, rank=0, score=1)
+        self.assertIn('recommendation_age_seconds ', Metrics.exposition())
+        with self.assertNumQueries(0):
+            self.assertIn('recommendation_age_seconds ', Metrics.exposition())
+        with override_settings(METRICS_FLUSH_INTERVAL=0), self.assertNumQueries(1):
+            Metrics.exposition()
+
+    @override_settings(ROOT_URLCONF='recipeAPI.urls', APP_ADMIN_CODE='TEST_ADMIN_CODE')
+    def test_metrics_endpoint(self):
+        self.client.get('/search', {'q': 'tomato'})
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get('/metrics', HTTP_ADMINCODE='TEST_ADMIN_CODE')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('http_requests_total{method="GET",route="search",status="200"} 1', response.content.decode())
+
+
+class TestRendering(APITestCase):
+    def setUp(self):
+        self.data = {
+            'amount': Decimal('10.50'),
+            'created_at': utc_now(),
+            'date': utc_now().date(),
+            'url': lazy(lambda: '/media/recipe/photo.jpg', str)(),
+            'text': 'Line\u2028separator \u00e9',
+            'nested': [{'id': 1, 'avg_rating': 4.333333333333333, 'photo': None}],
+            1: True,
+        }
+
+    @override_settings(JSON_BACKEND='orjson')
+    def test_orjson_render_matches_stdlib(self):
+        self.assertEqual(Rendering.backend(), 'orjson' if Rendering.orjson is not None else 'json')
+        self.assertEqual(Rendering.JSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    @override_settings(JSON_BACKEND='orjson')
+    def test_orjson_render_falls_back(self):
+        data = {'big': 2 ** 70, 'indent': True}
+        self.assertEqual(Rendering.JSONRenderer().render(data), JSONRenderer().render(data))
+        media_type = 'application/json; indent=2'
+        self.assertEqual(
+            Rendering.JSONRenderer().render(data, media_type),
+            JSONRenderer().render(data, media_type)
+        )
+
+    @override_settings(JSON_BACKEND='orjson')
+    def test_orjson_rejects_non_finite(self):
+        for value in (float('nan'), float('inf')):
+            data = {'nested': [{'avg_rating': value, 'photo': None}]}
+            with self.assertRaises(ValueError):
+                JSONRenderer().render(data)
+            with self.assertRaises(ValueError):
+                Rendering.JSONRenderer().render(data)
+
+    @override_settings(JSON_BACKEND='json')
+    def test_stdlib_backend(self):
+        self.assertEqual(Rendering.backend(), 'json')
+        self.assertEqual(Rendering.JSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    @override_settings(JSON_BACKEND='orjson')
+    def test_parse(self):
+        content = '{"name": "P\u00e9sto", "amount": 10.5, "list": [1, 2]}'.encode()
+        data = Rendering.JSONParser().parse(io.BytesIO(content))
+        self.assertEqual(data, {'name': 'P\u00e9sto', 'amount': 10.5, 'list': [1, 2]})
+        with self.assertRaises(ParseError):
+            Rendering.JSONParser().parse(io.BytesIO(b'{"name": '))
+
+
+class CountingSnapshot(Snapshots.Snapshot):
+    topics = ('recipe',)
+
+    def build(self):
+        return {'builds': 1, 'keys': set()}
+
+    def update(self, data, keys):
+        data['keys'] |= keys['recipe']
+        return data
+
+
+class TestSnapshot(APITestCase):
+    def setUp(self):
+        self.snapshot = CountingSnapshot()
+
+    def tearDown(self):
+        Snapshots.Snapshot.instances.remove(self.snapshot)
+
+    def test_local_changes(self):
+        self.assertEqual(self.snapshot.get(), {'builds': 1, 'keys': set()})
+        Snapshots.record('recipe', 4, 5)
+        Snapshots.record('user', 6)
+        self.assertEqual(self.snapshot.get(), {'builds': 1, 'keys': {4, 5}})
+
+    def test_other_process_changes(self):
+        self.snapshot.get()
+        Change.objects.create(topic='recipe', key=7)
+        with override_settings(SNAPSHOT_CHECK_INTERVAL=60):
+            self.assertEqual(self.snapshot.get()['keys'], set())
+        with override_settings(SNAPSHOT_CHECK_INTERVAL=0):
+            self.assertEqual(self.snapshot.get()['keys'], {7})
+
+    def test_rolled_back_changes(self):
+        Snapshots.record('recipe', 1)
+        self.snapshot.get()['builds'] += 1
+        Change.objects.all().delete()
+        Snapshots.record('recipe', 2)
+        self.assertEqual(self.snapshot.get(), {'builds': 1, 'keys': set()})
+
+
+class TestSparse(APITestCase):
+    def test_triplets(self):
+        matrix = Recommendations.Sparse.triplets(
+            array('q', [7, 3, 7, 3, 7]), array('q', [2, 5, 1, 5, 2]), array('d', [1.0, 2.0, 3.0, 0.5, 1.0])
+        )
+        self.assertEqual(list(matrix.keys), [3, 7])
+        self.assertEqual(list(matrix.row(3)), [(5, 2.5)])
+        self.assertEqual(list(matrix.row(7)), [(1, 3.0), (2, 2.0)])
+        self.assertEqual(list(matrix.row(4)), [])
+
+    def test_transpose(self):
+        matrix = Recommendations.Sparse.triplets(array('q', [1, 1, 2]), array('q', [5, 6, 5]), array('d', [1.0, 2.0, 3.0]))
+        transposed = matrix.transpose()
+        self.assertEqual(list(transposed.keys), [5, 6])
+        self.assertEqual(list(transposed.row(5)), [(1, 1.0), (2, 3.0)])
+        self.assertEqual(list(transposed.row(6)), [(1, 2.0)])
+
+
+@override_settings(COUNTER_FLUSH_THRESHOLD=3, COUNTER_FLUSH_INTERVAL=60)
+class TestCounters(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="user@example.com", name="Regular User")
+        self.recipe = Recipe.objects.create(
+            name="Recipe", title="Title", user=self.user,
+            prep_time=10, calories=100, submit_status=SubmitStatuses.ACCEPTED
+        )
+        self.counters = Counters.Counters()
+
+    def test_threshold_flush(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.counters.add(Recipe, 'view_count', self.recipe.pk)
+            self.counters.add(Recipe, 'view_count', self.recipe.pk)
+            self.counters.add(Recipe, 'cook_count', self.recipe.pk, 2)
+        self.recipe.refresh_from_db()
+        self.assertEqual((self.recipe.view_count, self.recipe.cook_count), (2, 2))
+        self.assertEqual(self.counters.get(Recipe, 'view_count', self.recipe.pk), 0)
+
+    def test_pending_increments(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.counters.add(Recipe, 'view_count', self.recipe.pk)
+            self.counters.add(Recipe, 'view_count', self.recipe.pk)
+        self.assertEqual(self.counters.get(Recipe, 'view_count', self.recipe.pk), 2)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.view_count, 0)
+        self.counters.flush()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.view_count, 2)
+
+    def test_interval_flush(self):
+        now = self.counters.anchor
+        with patch('time.time', return_value=now), self.captureOnCommitCallbacks(execute=True):
+            self.counters.add(Recipe, 'view_count', self.recipe.pk)
+        with patch('time.time', return_value=now + 61), self.captureOnCommitCallbacks(execute=True):
+            self.counters.add(Recipe, 'view_count', self.recipe.pk)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.view_count, 2)
+
+    def test_rolled_back_increments(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ValueError), transaction.atomic():
+                self.counters.add(Recipe, 'view_count', self.recipe.pk)
+                raise ValueError()
+        self.assertEqual(self.counters.get(Recipe, 'view_count', self.recipe.pk), 0)
+
+    def test_idle_flush(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.counters.add(Recipe, 'view_count', self.recipe.pk)
+        timer = self.counters.timer
+        self.assertEqual(timer.interval, 60)
+        with patch('recipeAPIapp.utils.counters.connections'):
+            timer.function()
+        self.assertIsNone(self.counters.timer)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.view_count, 1)
+
+    def test_stale_save(self):
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                self.counters.add(Recipe, 'view_count', self.recipe.pk)
+        self.counters.flush()
+        stale.submit_status = SubmitStatuses.SUBMITTED
+        stale.save()
+        self.recipe.refresh_from_db()
+        self.assertEqual((self.recipe.view_count, self.recipe.submit_status), (3, SubmitStatuses.SUBMITTED))
+
+
+@override_settings(DEFAULT_FILE_STORAGE=media_utils.TEST_DEFAULT_FILE_STORAGE)
+@override_settings(MEDIA_ROOT=media_utils.TEST_MEDIA_ROOT)
+@override_settings(SNAPSHOT_CHECK_INTERVAL=60)
+class TestReferenceData(APITestCase):
+    def setUp(self):
+        self.snapshot = References.ReferenceData()
+        self.category = Category.objects.create(name="Category", photo=media_utils.generate_test_image())
+        self.ingredient = Ingredient.objects.create(name="Ingredient", unit="g")
+
+    def tearDown(self):
+        Snapshots.Snapshot.instances.remove(self.snapshot)
+        media_utils.delete_test_media()
+
+    def test_lookup(self):
+        self.assertEqual(self.snapshot.lookup('category', [self.category.pk]), [
+            categorical_serializers.CategorySmallData(instance=self.category).data
+        ])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.snapshot.lookup('ingredient', [self.ingredient.pk]), [
+                categorical_serializers.IngredientSmallData(instance=self.ingredient).data
+            ])
+
+    def test_written(self):
+        self.snapshot.lookup('category', [self.category.pk])
+        self.category.name = "Renamed"
+        self.category.save()
+        self.assertEqual(self.snapshot.lookup('category', [self.category.pk])[0]['name'], "Renamed")
+        self.category.delete()
+        self.assertEqual(self.snapshot.lookup('category', [self.category.pk]), [])
+
+    def test_recipe_links(self):
+        user = User.objects.create(email="user@example.com", name="User")
+        for number in range(3):
+            recipe = Recipe.objects.create(user=user, name=f"Recipe {number}", title="Title", prep_time=10, calories=100)
+            recipe.categories.add(self.category)
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=self.ingredient, amount=number + 1)
+        References.snapshot.lookup('category', [self.category.pk])
+        References.snapshot.lookup('ingredient', [self.ingredient.pk])
+        recipes = list(Recipe.objects.order_by('pk'))
+        with self.assertNumQueries(2):
+            recipe_serializers.links(recipes)
+        fields = ('id', 'categories', 'ingredients')
+        with self.assertNumQueries(0):
+            data = recipe_serializers.RecipeData(recipes, many=True, user=None, fields=fields).data
+        self.assertEqual([recipe['categories'][0]['id'] for recipe in data], [self.category.pk] * 3)
+        self.assertEqual([recipe['ingredients'][0]['amount'] for recipe in data], ['1.00', '2.00', '3.00'])
+
+    def test_unsynced(self):
+        self.snapshot.lookup('ingredient', [])
+        created = Ingredient.objects.bulk_create([Ingredient(name="Other", unit="kg")])[0]
+        result = self.snapshot.lookup('ingredient', [created.pk, self.ingredient.pk])
+        self.assertEqual([ingredient['name'] for ingredient in result], ["Other", "Ingredient"])
@@ -0,0 +1,111 @@
+import heapq, re, time, unicodedata
+from bisect import bisect_left, insort
+from django.conf import settings
+import recipeAPIapp.utils.metrics as metrics
+from recipeAPIapp.utils.snapshot import Snapshot
+from recipeAPIapp.models.categorical import Category, Ingredient
+from recipeAPIapp.models.recipe import Recipe
+from recipeAPIapp.models.recipe import SubmitStatuses as Statuses
+
+
+
+def normalize(text: str):
+    """ Lowercases text, strips accents and punctuation and collapses whitespace """
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def suffixes(name: str):
+    """ Returns normalized name from each of its words on, so prefixes of any word match """
+    words = normalize(name).split(' ')
+    return {' '.join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+class Prefixes:
+    """ Sorted (key, pk) pairs of name suffixes, prefix matches are one contiguous range """
+    def __init__(self, names: dict[int, tuple[str, float]]):
+        self.names = names
+        self.keys = sorted((key, pk) for pk, (name, _) in names.items() for key in suffixes(name))
+        self.cache = {}
+
+    def add(self, pk: int, name: str, popularity: float):
+        self.names[pk] = name, popularity
+        for key in suffixes(name):
+            insort(self.keys, (key, pk))
+
+    def rank(self, popularity: dict[int, float]):
+        """ Replaces stored popularity of indexed objects """
+        for pk, (name, _) in self.names.items():
+            self.names[pk] = name, popularity.get(pk, 0)
+        self.cache.clear()
+
+    def remove(self, pk: int):
+        name, _ = self.names.pop(pk, (None, None))
+        if name is not None:
+            for key in suffixes(name):
+                del self.keys[bisect_left(self.keys, (key, pk))]
+
+    def complete(self, prefix: str, count: int):
+        """ Returns count most popular (pk, name) whose normalized name or some of its words starts with prefix """
+        prefix = normalize(prefix)
+        if len(prefix) < settings.AUTOCOMPLETE_MIN_PREFIX:
+            return []
+        if len(prefix) <= settings.AUTOCOMPLETE_CACHE_LENGTH:
+            metrics.registry.inc('cache_requests_total', cache='autocomplete', result='hit' if (prefix, count) in self.cache else 'miss')
+        if (prefix, count) in self.cache:
+            return self.cache[(prefix, count)]
+        matches = set()
+        for i in range(bisect_left(self.keys, (prefix,)), len(self.keys)):
+            key, pk = self.keys[i]
+            if not key.startswith(prefix):
+                break
+            matches.add(pk)
+        top = heapq.nlargest(count, matches, key=lambda pk: (self.names[pk][1], -pk))
+        result = [(pk, self.names[pk][0]) for pk in top]
+        if len(prefix) <= settings.AUTOCOMPLETE_CACHE_LENGTH:
+            self.cache[(prefix, count)] = result
+        return result
+
+
+class Autocomplete(Snapshot):
+    """
+        Prefix index over names of one model's objects, ranked by popularity stored when object was last synced,
+        counters written by queryset updates record no changes, so popularity is reloaded every AUTOCOMPLETE_RANK_INTERVAL seconds
+    """
+    def __init__(self, topic: str, qryset, popularity: str):
+        super().__init__()
+        self.topics = (topic,)
+        self.qryset = qryset
+        self.popularity = popularity
+        self.ranked = 0
+
+    def load(self, pks=None):
+        rows = self.qryset if pks is None else self.qryset.filter(pk__in=pks)
+        return {pk: (name, score) for pk, name, score in rows.values_list('pk', 'name', self.popularity).iterator()}
+
+    def build(self):
+        self.ranked = time.monotonic()
+        return Prefixes(self.load())
+
+    def update(self, prefixes: Prefixes, keys: dict[str, set[int]]):
+        changed = keys[self.topics[0]]
+        for pk in changed:
+            prefixes.remove(pk)
+        for pk, (name, popularity) in self.load(changed).items():
+            prefixes.add(pk, name, popularity)
+        prefixes.cache.clear()
+        return prefixes
+
+    def complete(self, prefix: str, count: int):
+        with self.lock:
+            prefixes = self.get()
+            if time.monotonic() - self.ranked >= settings.AUTOCOMPLETE_RANK_INTERVAL:
+                prefixes.rank(dict(self.qryset.values_list('pk', self.popularity).iterator()))
+                self.ranked = time.monotonic()
+            return [{'id': pk, 'name': name} for pk, name in prefixes.complete(prefix, count)]
+
+
+categories = Autocomplete('category', Category.objects.all(), 'recipe_count')
+ingredients = Autocomplete('ingredient', Ingredient.objects.all(), 'recipe_count')
+recipes = Autocomplete('recipe', Recipe.objects.filter(submit_status=Statuses.ACCEPTED), 'trending')
@@ -0,0 +1,353 @@
+import glob, heapq, json, mmap, operator, os, random, struct, tempfile
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from functools import reduce
+from itertools import islice
+from django.conf import settings
+from recipeAPIapp.utils.filtering import words
+from recipeAPIapp.utils.snapshot import Snapshot
+from recipeAPIapp.models.user import User
+from recipeAPIapp.models.recipe import Recipe
+from recipeAPIapp.models.recipe import SubmitStatuses as Statuses
+
+NUMERIC = (('id', 'q'), ('user', 'q'), ('calories', 'q'), ('prep_time', 'q'), ('created_at', 'd'))
+ORDERS = ('name', 'prep_time', 'calories', 'created_at')
+SAMPLE_DENSITY = 16
+
+
+
+def rows(recipe_ids=None):
+    """ Returns accepted recipes as {id: (user, calories, prep_time, created_at, name, title, categories)} """
+    qryset = Recipe.objects.filter(submit_status=Statuses.ACCEPTED)
+    links = Recipe.categories.through.objects.filter(recipe__submit_status=Statuses.ACCEPTED)
+    if recipe_ids is not None:
+        qryset, links = qryset.filter(pk__in=recipe_ids), links.filter(recipe__in=recipe_ids)
+    fields = ('pk', 'user', 'calories', 'prep_time', 'created_at', 'name', 'title')
+    result = {
+        pk: (user, calories, prep_time, created_at.timestamp(), name, title, set())
+        for pk, user, calories, prep_time, created_at, name, title in qryset.values_list(*fields).iterator()
+    }
+    for recipe_id, category_id in links.values_list('recipe', 'category').iterator():
+        if recipe_id in result:
+            result[recipe_id][6].add(category_id)
+    return result
+
+
+def text(name: str, title: str):
+    """ Searched text of recipe, lowercased like icontains compares it, fields separated so words can't span them """
+    return f'{name.lower()}\0{title.lower()}'
+
+
+def encode(recipes: dict[int, tuple]) -> bytes:
+    """
+        Lays accepted recipes out as columns in one buffer: JSON header with section offsets followed by
+        numeric arrays, names and searched texts with their offsets, sort permutations and category bitsets,
+        rows sorted by user are stored too so user filters are a binary search
+    """
+    ids = sorted(recipes)
+    count, size = len(ids), (len(ids) + 7) // 8
+    columns = {name: array(code) for name, code in NUMERIC}
+    names, texts = bytearray(), bytearray()
+    name_offsets, text_offsets = array('q'), array('q')
+    categories: dict[int, bytearray] = {}
+    for row, pk in enumerate(ids):
+        user, calories, prep_time, created_at, name, title, category_ids = recipes[pk]
+        for (column, _), value in zip(NUMERIC, (pk, user, calories, prep_time, created_at)):
+            columns[column].append(value)
+        name_offsets.append(len(names))
+        names += name.encode()
+        text_offsets.append(len(texts))
+        texts += text(name, title).encode()
+        for category_id in category_ids:
+            categories.setdefault(category_id, bytearray(size))[row >> 3] |= 1 << (row & 7)
+    name_offsets.append(len(names))
+    text_offsets.append(len(texts))
+    for key in ORDERS + ('user',):
+        value = (lambda row: recipes[ids[row]][4]) if key == 'name' else columns[key].__getitem__
+        columns[f'order_{key}'] = array('q', sorted(range(count), key=lambda row: (value(row), ids[row])))
+    columns |= {
+        'name_offsets': name_offsets, 'names': array('B', names),
+        'text_offsets': text_offsets, 'texts': array('B', texts),
+        'category_bits': array('B', b''.join(categories.values())),
+    }
+    sections, offset = {}, 0
+    for name, column in columns.items():
+        sections[name] = (column.typecode, offset, len(column) * column.itemsize)
+        offset += aligned(len(column) * column.itemsize)
+    header = json.dumps({'count': count, 'categories': list(categories), 'sections': sections}).encode()
+    start = aligned(8 + len(header))
+    buffer = bytearray(start + offset)
+    struct.pack_into('<Q', buffer, 0, len(header))
+    buffer[8:8 + len(header)] = header
+    for name, column in columns.items():
+        _, position, length = sections[name]
+        buffer[start + position:start + position + length] = column.tobytes()
+    return bytes(buffer)
+
+
+def aligned(size: int):
+    """ Rounds size up to 8 bytes so every section starts aligned for its item size """
+    return -(-size // 8) * 8
+
+
+class Columns:
+    """ Read-only columns decoded from catalog buffer without copying, buffer may be memory map shared by processes """
+    def __init__(self, buffer):
+        size, = struct.unpack_from('<Q', buffer, 0)
+        header = json.loads(bytes(buffer[8:8 + size]))
+        self.buffer = buffer
+        self.count = header['count']
+        self.categories = {category_id: index for index, category_id in enumerate(header['categories'])}
+        self.sections = header['sections']
+        self.start = aligned(8 + size)
+        view = memoryview(buffer)
+        for name, (code, offset, length) in self.sections.items():
+            setattr(self, name, view[self.start + offset:self.start + offset + length].cast(code))
+
+    def category(self, category_id: int):
+        """ Returns bitset of rows in category read from buffer, 0 for categories without shared rows """
+        if category_id not in self.categories:
+            return 0
+        size = (self.count + 7) // 8
+        index = self.categories[category_id]
+        return int.from_bytes(self.category_bits[index * size:(index + 1) * size], 'little')
+
+    def rows(self, key: str, low: float, high: float):
+        """ Returns shared rows whose value of key is between low and high, a slice of key's permutation """
+        column, permutation = getattr(self, key), getattr(self, f'order_{key}')
+        start = bisect_left(permutation, low, key=column.__getitem__)
+        return permutation[start:bisect_right(permutation, high, start, key=column.__getitem__)]
+
+    def name(self, row: int):
+        return bytes(self.names[self.name_offsets[row]:self.name_offsets[row + 1]]).decode()
+
+    def find(self, word: bytes, bits: bytearray):
+        """ Sets bits of rows whose searched text contains word, searched in buffer itself """
+        _, offset, length = self.sections['texts']
+        start, offsets = self.start + offset, self.text_offsets
+        position, row = self.buffer.find(word, start, start + length), 0
+        while position != -1:
+            row = bisect_right(offsets, position - start, row) - 1
+            bits[row >> 3] |= 1 << (row & 7)
+            row += 1
+            position = self.buffer.find(word, start + offsets[row], start + length)
+
+
+class Catalog:
+    """
+        Columns of accepted recipes shared as built, rows of recipes changed since are tombstoned in alive bitset
+        and appended to process-local delta columns merged into sort order on read
+    """
+    def __init__(self, columns: Columns):
+        self.columns = columns
+        self.alive = (1 << columns.count) - 1
+        self.categories: dict[int, int] = {}
+        self.delta = {name: [] for name in ('id', 'user', 'calories', 'prep_time', 'created_at', 'name', 'text')}
+        self.sorted = {key: [] for key in ('id',) + ORDERS}
+        self.rows: dict[int, int] = {}
+        self.users: dict[int, int] = {}
+
+    @property
+    def size(self):
+        return self.columns.count + len(self.delta['id'])
+
+    def value(self, key: str, row: int):
+        if row >= self.columns.count:
+            return self.delta[key][row - self.columns.count]
+        return self.columns.name(row) if key == 'name' else getattr(self.columns, key)[row]
+
+    def row(self, pk: int):
+        if pk in self.rows:
+            return self.rows[pk]
+        row = bisect_left(self.columns.id, pk)
+        return row if row < self.columns.count and self.columns.id[row] == pk else None
+
+    def remove(self, pk: int):
+        row = self.row(pk)
+        if row is not None:
+            self.alive &= ~(1 << row)
+            self.users.clear()
+
+    def add(self, pk: int, user: int, calories: int, prep_time: int, created_at: float, name: str, title: str, categories):
+        row = self.size
+        for column, value in zip(self.delta, (pk, user, calories, prep_time, created_at, name, text(name, title))):
+            self.delta[column].append(value)
+        for key in self.sorted:
+            insort(self.sorted[key], (self.value(key, row), pk, row))
+        for category_id in categories:
+            self.categories[category_id] = self.categories.get(category_id, 0) | 1 << row
+        self.alive |= 1 << row
+        self.rows[pk] = row
+        self.users.clear()
+
+    def category(self, category_id: int):
+        """ Returns bitset of rows in category, shared rows read from buffer and delta rows added since """
+        return self.columns.category(category_id) | self.categories.get(category_id, 0)
+
+    def user(self, user_id: int):
+        """ Returns bitset of rows of user's recipes, cached until the next change """
+        if user_id not in self.users:
+            bits = bytearray((self.size + 7) // 8)
+            for row in self.columns.rows('user', user_id, user_id):
+                bits[row >> 3] |= 1 << (row & 7)
+            for index, value in enumerate(self.delta['user']):
+                if value == user_id:
+                    row = self.columns.count + index
+                    bits[row >> 3] |= 1 << (row & 7)
+            self.users[user_id] = int.from_bytes(bits, 'little')
+        return self.users[user_id]
+
+    def matching(self, word: str):
+        """ Returns bitset of rows whose name or title contains word """
+        bits = bytearray((self.size + 7) // 8)
+        self.columns.find(word.encode(), bits)
+        for index, searched in enumerate(self.delta['text']):
+            if word in searched:
+                row = self.columns.count + index
+                bits[row >> 3] |= 1 << (row & 7)
+        return int.from_bytes(bits, 'little')
+
+    def order(self, key: str, descending: bool):
+        """ Yields rows ordered by key, then by id, shared permutation is merged with sorted delta """
+        base = range(self.columns.count) if key == 'id' else getattr(self.columns, f'order_{key}')
+        base = reversed(base) if descending else iter(base)
+        delta = reversed(self.sorted[key]) if descending else iter(self.sorted[key])
+        if not self.sorted[key]:
+            return base
+        keyed = ((self.value(key, row), self.value('id', row), row) for row in base)
+        return (row for _, _, row in heapq.merge(keyed, delta, reverse=descending))
+
+    def mask(self, vdata):
+        """ Returns bitset of rows of accepted recipes passing filters """
+        mask = self.alive
+        if vdata.get('categories'):
+            mask &= reduce(operator.or_, [self.category(category.pk) for category in vdata['categories']])
+        if 'user' in vdata:
+            mask &= self.user(vdata['user'].pk)
+        for word in words(vdata.get('search_string', '')):
+            mask &= self.matching(word)
+        if 'calories_limit' in vdata:
+            mask &= self.at_most('calories', vdata['calories_limit'] / vdata['servings'])
+        if 'prep_time_limit' in vdata:
+            mask &= self.at_most('prep_time', vdata['prep_time_limit'])
+        return mask
+
+    def select(self, vdata):
+        """ Returns count of accepted recipes passing filters and ids of the requested page in order """
+        mask = self.mask(vdata)
+        bits = mask.to_bytes((self.size + 7) // 8, 'little')
+        passes = lambda row: bits[row >> 3] >> (row & 7) & 1
+        offset = (vdata['page'] - 1) * vdata['page_size']
+        end = offset + vdata['page_size']
+        order_by = vdata.get('order_by', [])
+        key = order_by[0].lstrip('-') if order_by else 'id'
+        count, page = mask.bit_count(), []
+        if offset < count:
+            rows = (row for row in self.order(key, bool(order_by) and order_by[0].startswith('-')) if passes(row))
+            page = [self.value('id', row) for row in islice(rows, offset, end)]
+        return count, page
+
+    def sample(self, vdata, count: int, rnd=random):
+        """
+            Returns ids of up to count distinct random accepted recipes passing filters, rows are drawn uniformly
+            and redrawn when filtered out or already drawn, sparse selections are listed and sampled instead
+        """
+        mask = self.mask(vdata)
+        total = mask.bit_count()
+        bits = mask.to_bytes((self.size + 7) // 8, 'little')
+        if total * SAMPLE_DENSITY < self.size or total <= count * 2:
+            rows = [
+                index * 8 + bit for index, byte in enumerate(bits) if byte for bit in range(8) if byte >> bit & 1
+            ]
+            return [self.value('id', row) for row in rnd.sample(rows, min(count, total))]
+        drawn = {}
+        while len(drawn) < count:
+            row = rnd.randrange(self.size)
+            if bits[row >> 3] >> (row & 7) & 1:
+                drawn.setdefault(row, self.value('id', row))
+        return list(drawn.values())
+
+    def at_most(self, key: str, limit: float):
+        """ Returns bitset of rows whose value is at most limit, shared rows are a prefix of key's permutation """
+        bits = bytearray((self.size + 7) // 8)
+        for row in self.columns.rows(key, float('-inf'), limit):
+            bits[row >> 3] |= 1 << (row & 7)
+        for index, value in enumerate(self.delta[key]):
+            if value <= limit:
+                row = self.columns.count + index
+                bits[row >> 3] |= 1 << (row & 7)
+        return int.from_bytes(bits, 'little')
+
+
+def answerable(user, vdata):
+    """ Anonymous filtering of accepted recipes by catalog columns, ordered by one catalog column at most """
+    order_by = [param.lstrip('-') for param in vdata.get('order_by', [])]
+    return (
+        not isinstance(user, User) and vdata.get('submit_status', Statuses.ACCEPTED) == Statuses.ACCEPTED
+        and not vdata.get('fuzzy') and len(order_by) <= 1 and all(param in ORDERS for param in order_by)
+        and '\0' not in vdata.get('search_string', '')
+    )
+
+
+class RecipeCatalog(Snapshot):
+    """
+        Columnar catalog of accepted recipes answering anonymous recipe filters in memory,
+        with CATALOG_DIR set it is written once per change cursor and memory mapped by every worker process
+    """
+    topics = ('recipe',)
+
+    def build(self):
+        return Catalog(Columns(self.load()))
+
+    def load(self):
+        """
+            Maps catalog file of current cursor, writing it first if no worker has yet,
+            files of older cursors are pruned while workers still reading them have them mapped or write them again
+        """
+        directory = settings.CATALOG_DIR
+        if directory is None:
+            return encode(rows())
+        path = os.path.join(directory, f'catalog-{self.cursor[0]}.bin')
+        while True:
+            if not os.path.exists(path):
+                descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+                with os.fdopen(descriptor, 'wb') as file:
+                    file.write(encode(rows()))
+                os.replace(temporary, path)
+                self.prune(directory)
+            try:
+                with open(path, 'rb') as file:
+                    return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except FileNotFoundError:
+                continue
+
+    def prune(self, directory: str):
+        for old in glob.glob(os.path.join(directory, 'catalog-*.bin')):
+            cursor = os.path.basename(old)[len('catalog-'):-len('.bin')]
+            if cursor.isdigit() and int(cursor) < self.cursor[0]:
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass
+
+    def update(self, catalog: Catalog, keys: dict[str, set[int]]):
+        if len(catalog.delta['id']) + len(keys['recipe']) > settings.CATALOG_DELTA_LIMIT:
+            self.rebuild()
+            return self.data
+        changed = rows(keys['recipe'])
+        for recipe_id in keys['recipe']:
+            catalog.remove(recipe_id)
+        for recipe_id, values in changed.items():
+            catalog.add(recipe_id, *values)
+        return catalog
+
+    def select(self, vdata):
+        with self.lock:
+            return self.get().select(vdata)
+
+    def sample(self, vdata, count: int):
+        with self.lock:
+            return self.get().sample(vdata, count)
+
+
+index = RecipeCatalog()
@@ -0,0 +1,48 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from recipeAPIapp.utils.snapshot import record
+from recipeAPIapp.models.categorical import Category, Ingredient
+from recipeAPIapp.models.recipe import Recipe, RecipeIngredient
+
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance: Recipe, **kwargs):
+    record('recipe', instance.pk)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance: RecipeIngredient, **kwargs):
+    record('recipe', instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.categories.through)
+def recipe_categories_changed(sender, instance, action: str, reverse: bool, pk_set: set[int], **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        record('recipe', instance.pk)
+    elif action == 'pre_clear':
+        record('recipe', *instance.recipes.values_list('pk', flat=True))
+    else:
+        record('recipe', *pk_set)
+
+
+@receiver(pre_delete, sender=Category)
+def category_deleted(sender, instance: Category, **kwargs):
+    """ Category links are deleted without signals """
+    record('recipe', *instance.recipes.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance: Category, **kwargs):
+    record('category', instance.pk)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, instance: Ingredient, **kwargs):
+    record('ingredient', instance.pk)
@@ -0,0 +1,108 @@
+import gzip, hashlib, re
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import patch_vary_headers
+import recipeAPIapp.utils.metrics as metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SKIPPED_TYPES = ('image/', 'video/', 'audio/', 'font/woff', 'application/octet-stream', 'application/zip', 'application/gzip')
+
+
+
+def compressors():
+    """ Available encodings in order of preference """
+    available = {}
+    if brotli is not None:
+        available['br'] = lambda data: brotli.compress(data, quality=5)
+    if zstandard is not None:
+        available['zstd'] = lambda data: zstandard.ZstdCompressor(level=3).compress(data)
+    available['gzip'] = lambda data: gzip.compress(data, compresslevel=6, mtime=0)
+    return available
+
+
+def negotiate(accept_encoding: str, available: list[str]):
+    """ Picks the best available encoding allowed by accept-encoding header """
+    qualities = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        match = re.search(r'q=([0-9.]+)', params)
+        try:
+            qualities[coding.strip().lower()] = float(match.group(1)) if match else 1.0
+        except ValueError:
+            continue
+    best, best_quality = None, 0
+    for coding in available:
+        quality = qualities.get(coding, qualities.get('*', 0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def directives(response: HttpResponse):
+    """ Returns names of response's cache-control directives """
+    return {part.split('=')[0].strip().lower() for part in response.get('Cache-Control', '').split(',')}
+
+
+class CompressionMiddleware:
+    """
+        Compresses response bodies with brotli, zstd or gzip negotiated by accept-encoding,
+        small bodies, already compressed media and no-transform responses are left as they are,
+        compressed bodies are stored in configured cache and reused for identical content unless private or no-store
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest):
+        response = self.get_response(request)
+        return self.compress(request, response)
+
+    def compress(self, request: HttpRequest, response: HttpResponse):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if response.get('Content-Type', '').startswith(SKIPPED_TYPES):
+            return response
+        control = directives(response)
+        if 'no-transform' in control:
+            return response
+        if len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        available = compressors()
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''), list(available))
+        if encoding is None:
+            return response
+        if control & {'private', 'no-store'}:
+            content = available[encoding](response.content)
+        else:
+            content = self.cached(encoding, response.content, available[encoding])
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        if response.has_header('ETag'):
+            response['ETag'] = re.sub(r'^"', 'W/"', response['ETag'])
+        return response
+
+    def cached(self, encoding: str, content: bytes, compressor):
+        alias = getattr(settings, 'COMPRESSION_CACHE', None)
+        if alias is None:
+            return compressor(content)
+        cache = caches[alias]
+        key = f'compression:{encoding}:{hashlib.blake2b(content, digest_size=20).hexdigest()}'
+        compressed = cache.get(key)
+        metrics.registry.inc('cache_requests_total', cache='compression', result='miss' if compressed is None else 'hit')
+        if compressed is None:
+            compressed = compressor(content)
+            cache.set(key, compressed)
+        return compressed
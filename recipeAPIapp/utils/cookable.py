@@ -0,0 +1,162 @@
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import compress
+from operator import le, sub
+from decimal import Decimal
+from django.db.models import Manager, Case, When, Value, F, Count, Sum, OuterRef, Subquery, ExpressionWrapper
+from django.db.models import DecimalField, FloatField
+from django.db.models.functions import Cast, Coalesce
+from recipeAPIapp.utils.snapshot import Snapshot
+from recipeAPIapp.models.categorical import UserIngredient
+from recipeAPIapp.models.recipe import Recipe, RecipeIngredient
+from recipeAPIapp.models.recipe import SubmitStatuses as Statuses
+
+
+
+class Postings:
+    """
+        Accepted recipes with required amounts grouped by ingredient count, inverted by ingredient
+        into (required amounts, recipe ids) lists sorted by amount, so recipes covered by owned amount are a prefix
+    """
+    def __init__(self, recipes: dict[int, dict[int, float]]):
+        self.recipes = recipes
+        self.size = {recipe_id: len(amounts) for recipe_id, amounts in recipes.items()}
+        self.sizes: dict[int, set[int]] = {}
+        rows: dict[int, list[tuple[float, int]]] = {}
+        for recipe_id, amounts in recipes.items():
+            self.sizes.setdefault(len(amounts), set()).add(recipe_id)
+            for ingredient_id, amount in amounts.items():
+                rows.setdefault(ingredient_id, []).append((amount, recipe_id))
+        self.ingredients: dict[int, tuple[list[float], list[int]]] = {}
+        for ingredient_id, posting in rows.items():
+            posting.sort()
+            self.ingredients[ingredient_id] = [amount for amount, _ in posting], [pk for _, pk in posting]
+
+    def add(self, recipe_id: int, amounts: dict[int, float]):
+        self.recipes[recipe_id] = amounts
+        self.size[recipe_id] = len(amounts)
+        self.sizes.setdefault(len(amounts), set()).add(recipe_id)
+        for ingredient_id, amount in amounts.items():
+            required, recipe_ids = self.ingredients.setdefault(ingredient_id, ([], []))
+            position = bisect_right(required, amount)
+            required.insert(position, amount)
+            recipe_ids.insert(position, recipe_id)
+
+    def remove(self, recipe_id: int):
+        amounts = self.recipes.pop(recipe_id, None)
+        if amounts is None:
+            return
+        del self.size[recipe_id]
+        self.sizes[len(amounts)].discard(recipe_id)
+        for ingredient_id, amount in amounts.items():
+            required, recipe_ids = self.ingredients[ingredient_id]
+            position = recipe_ids.index(recipe_id, bisect_left(required, amount))
+            del required[position], recipe_ids[position]
+
+
+def amounts(recipe_ids=None):
+    """ Returns required amounts of accepted recipes, all of them when no ids are given """
+    recipes = Recipe.objects.filter(submit_status=Statuses.ACCEPTED)
+    rows = RecipeIngredient.objects.filter(recipe__submit_status=Statuses.ACCEPTED)
+    if recipe_ids is not None:
+        recipes, rows = recipes.filter(pk__in=recipe_ids), rows.filter(recipe__in=recipe_ids)
+    result = {pk: {} for pk in recipes.values_list('pk', flat=True).iterator()}
+    for recipe_id, ingredient_id, amount in rows.values_list('recipe', 'ingredient', 'amount').iterator():
+        result.setdefault(recipe_id, {})[ingredient_id] = float(amount)
+    return result
+
+
+class CookableIndex(Snapshot):
+    """ Finds accepted recipes user can almost cook from ingredient to recipes inverted index """
+    topics = ('recipe',)
+
+    def build(self):
+        return Postings(amounts())
+
+    def update(self, postings: Postings, keys: dict[str, set[int]]):
+        changed = amounts(keys['recipe'])
+        for recipe_id in keys['recipe']:
+            postings.remove(recipe_id)
+        for recipe_id, recipe_amounts in changed.items():
+            postings.add(recipe_id, recipe_amounts)
+        return postings
+
+    def search(self, inventory: dict[int, Decimal], servings: int, max_missing: int = None, max_share: int = None):
+        """
+            Returns ids of recipes missing at most max_missing ingredients and at most max_share percent
+            of required amounts (averaged over ingredients), fewest missing ingredients first,
+            candidates are counted with C-level counters and only they are scored ingredient by ingredient
+        """
+        with self.lock:
+            postings: Postings = self.get()
+            owned = {ingredient_id: float(amount) / servings for ingredient_id, amount in inventory.items()}
+            full, touched = Counter(), Counter()
+            for ingredient_id, amount in owned.items():
+                required, recipe_ids = postings.ingredients.get(ingredient_id, ((), ()))
+                cut = bisect_right(required, amount)
+                full.update(recipe_ids[:cut])
+                if max_share is not None:
+                    touched.update(recipe_ids)
+            sizes = [(size, recipe_ids) for size, recipe_ids in postings.sizes.items() if recipe_ids]
+            candidates = None
+            if max_missing is not None:
+                candidates = within(full, postings.size, {size: max_missing for size, _ in sizes})
+                candidates |= {pk for size, recipe_ids in sizes if size <= max_missing for pk in recipe_ids if pk not in full}
+            if max_share is not None and max_share < 100:
+                limits = {size: size * max_share / 100 + 1e-9 for size, _ in sizes}
+                shared = within(touched, postings.size, limits) | postings.sizes.get(0, set())
+                candidates = shared if candidates is None else candidates & shared
+            elif candidates is None:
+                candidates = set(postings.recipes)
+            ranked = []
+            for recipe_id in candidates:
+                amounts = postings.recipes[recipe_id]
+                size, count = len(amounts), full.get(recipe_id, 0)
+                covered = count + sum(
+                    owned[ingredient_id] / needed for ingredient_id, needed in amounts.items()
+                    if 0 < owned.get(ingredient_id, 0) < needed
+                )
+                ranked.append((size - count, 1 - covered / size if size else 0.0, -recipe_id))
+        if max_missing is not None:
+            ranked = [rank for rank in ranked if rank[0] <= max_missing]
+        if max_share is not None:
+            ranked = [rank for rank in ranked if rank[1] * 100 <= max_share + 1e-9]
+        ranked.sort()
+        return [-rank[2] for rank in ranked]
+
+
+def within(counts: Counter, sizes: dict[int, int], limits: dict[int, float]):
+    """ Returns counted recipes whose size minus count is within limit of their size, without a Python level loop """
+    keys = list(counts)
+    recipe_sizes = list(map(sizes.__getitem__, keys))
+    lacking = map(sub, recipe_sizes, counts.values())
+    return set(compress(keys, map(le, lacking, map(limits.__getitem__, recipe_sizes))))
+
+
+index = CookableIndex()
+
+
+def annotated(qryset: Manager, user, servings: int, max_missing: int = None, max_share: int = None):
+    """
+        Filters and orders recipes like CookableIndex.search with correlated subqueries,
+        for submit statuses other than accepted which the index does not hold
+    """
+    owned = Subquery(UserIngredient.objects.filter(user=user, ingredient=OuterRef('ingredient')).values('amount')[:1])
+    rows = RecipeIngredient.objects.filter(recipe=OuterRef('pk')).annotate(
+        owned=Coalesce(owned, Value(Decimal(0)), output_field=DecimalField()),
+        required=ExpressionWrapper(F('amount') * Value(servings, output_field=DecimalField()), output_field=DecimalField()),
+    ).values('recipe')
+    share = Case(
+        When(owned__gte=F('required'), then=Value(1.0)),
+        default=Cast('owned', FloatField()) / Cast('required', FloatField()), output_field=FloatField()
+    )
+    lacking = rows.filter(owned__lt=F('required')).annotate(value=Count('pk')).values('value')
+    covered = rows.annotate(value=Sum(share)).values('value')
+    size = rows.annotate(value=Count('pk')).values('value')
+    ratio = Subquery(covered, output_field=FloatField()) / Cast(Subquery(size), FloatField())
+    qryset = qryset.annotate(missing=Coalesce(Subquery(lacking), 0), missing_share=Coalesce(1 - ratio, 0.0))
+    if max_missing is not None:
+        qryset = qryset.filter(missing__lte=max_missing)
+    if max_share is not None:
+        qryset = qryset.filter(missing_share__lte=max_share / 100 + 1e-9)
+    return qryset.order_by('missing', 'missing_share', '-pk')
@@ -0,0 +1,96 @@
+import atexit, logging, threading, time
+from django.conf import settings
+from django.db import transaction, connections
+from django.db.models import Model, F, Case, When, Value
+
+log = logging.getLogger(__name__)
+
+
+
+class Counters:
+    """
+        Increments accumulated per process and written as one batched UPDATE x = x + n per field,
+        flushed once COUNTER_FLUSH_THRESHOLD increments are pending or the oldest one is COUNTER_FLUSH_INTERVAL
+        seconds old, by a timer started with the first pending increment so idle processes flush too, and at exit,
+        so a crashed process loses at most threshold increments and only those of the last interval
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending: dict[tuple[type[Model], str], dict[int, float]] = {}
+        self.size = 0
+        self.anchor = time.time()
+        self.oldest = None
+        self.timer = None
+        self.scales = {}
+
+    def scale(self, model: type[Model], field: str, factory):
+        """
+            Registers factory of expression multiplying field's increments at flush,
+            called with time increments were buffered relative to
+        """
+        self.scales[(model, field)] = factory
+
+    def add(self, model: type[Model], field: str, pk: int, amount=1):
+        """
+            Buffers increment once current transaction commits,
+            amount can be function of time since buffer was last flushed
+        """
+        transaction.on_commit(lambda: self.increment(model, field, pk, amount))
+
+    def increment(self, model: type[Model], field: str, pk: int, amount):
+        with self.lock:
+            now = time.time()
+            if callable(amount):
+                amount = amount(now - self.anchor)
+            amounts = self.pending.setdefault((model, field), {})
+            amounts[pk] = amounts.get(pk, 0) + amount
+            self.size += 1
+            self.oldest = self.oldest or now
+            due = self.size >= settings.COUNTER_FLUSH_THRESHOLD or now - self.oldest >= settings.COUNTER_FLUSH_INTERVAL
+            if not due and self.timer is None:
+                self.timer = threading.Timer(settings.COUNTER_FLUSH_INTERVAL, self.expire)
+                self.timer.daemon = True
+                self.timer.start()
+        if due:
+            self.flush()
+
+    def expire(self):
+        """ Flushes from timer thread, closes the thread's database connection afterwards """
+        try:
+            self.flush()
+        finally:
+            connections.close_all()
+
+    def get(self, model: type[Model], field: str, pk: int):
+        """ Returns increment of object's field not written yet by this process """
+        with self.lock:
+            return self.pending.get((model, field), {}).get(pk, 0)
+
+    def flush(self):
+        with self.lock:
+            pending, anchor, size = self.pending, self.anchor, self.size
+            self.pending, self.anchor, self.size, self.oldest = {}, time.time(), 0, None
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if not pending:
+            return
+        try:
+            with transaction.atomic():
+                for (model, field), amounts in pending.items():
+                    amounts = list(amounts.items())
+                    for start in range(0, len(amounts), 500):
+                        self.write(model, field, amounts[start:start + 500], anchor)
+        except Exception:
+            log.exception(f"Counter flush failed - {size} increments lost")
+
+    def write(self, model: type[Model], field: str, amounts: list[tuple[int, float]], anchor: float):
+        whens = [When(pk=pk, then=Value(amount)) for pk, amount in amounts]
+        increment = Case(*whens, default=Value(0), output_field=model._meta.get_field(field))
+        if (model, field) in self.scales:
+            increment = increment * self.scales[(model, field)](anchor)
+        model.objects.filter(pk__in=[pk for pk, _ in amounts]).update(**{field: F(field) + increment})
+
+
+buffer = Counters()
+atexit.register(buffer.flush)
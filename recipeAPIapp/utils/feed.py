@@ -0,0 +1,89 @@
+import heapq
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from django.conf import settings
+import recipeAPIapp.utils.metrics as metrics
+from recipeAPIapp.utils.snapshot import Snapshot
+from recipeAPIapp.models.recipe import Recipe
+from recipeAPIapp.models.recipe import SubmitStatuses as Statuses
+
+
+
+def entries(recipe_ids=None):
+    """ Returns (sort key, categories) of accepted recipes, sort key orders newest first """
+    rows = Recipe.categories.through.objects.filter(recipe__submit_status=Statuses.ACCEPTED)
+    if recipe_ids is not None:
+        rows = rows.filter(recipe__in=recipe_ids)
+    result = {}
+    for recipe_id, category_id, created_at in rows.values_list('recipe', 'category', 'recipe__created_at').iterator():
+        result.setdefault(recipe_id, ((-created_at.timestamp(), -recipe_id), set()))[1].add(category_id)
+    return result
+
+
+class Lists:
+    """ Sort keys of accepted recipes of each category and merged lists cached for large favourite sets """
+    def __init__(self, recipes: dict[int, tuple[tuple[float, int], set[int]]]):
+        self.recipes = recipes
+        self.categories: dict[int, list[tuple[float, int]]] = {}
+        for key, categories in recipes.values():
+            for category_id in categories:
+                self.categories.setdefault(category_id, []).append(key)
+        for keys in self.categories.values():
+            keys.sort()
+        self.merged = OrderedDict()
+
+    def add(self, recipe_id: int, key: tuple[float, int], categories: set[int]):
+        self.recipes[recipe_id] = key, categories
+        for category_id in categories:
+            insort(self.categories.setdefault(category_id, []), key)
+
+    def remove(self, recipe_id: int):
+        key, categories = self.recipes.pop(recipe_id, (None, ()))
+        for category_id in categories:
+            keys = self.categories[category_id]
+            del keys[bisect_left(keys, key)]
+
+
+class CategoryFeed(Snapshot):
+    """
+        Accepted recipes of each category newest first, feed of favourite categories is their k-way merge,
+        merges of at least FEED_CACHE_CATEGORIES lists are cached until the next change
+    """
+    topics = ('recipe',)
+
+    def build(self):
+        return Lists(entries())
+
+    def update(self, lists: Lists, keys: dict[str, set[int]]):
+        changed = entries(keys['recipe'])
+        for recipe_id in keys['recipe']:
+            lists.remove(recipe_id)
+        for recipe_id, (key, categories) in changed.items():
+            lists.add(recipe_id, key, categories)
+        lists.merged.clear()
+        return lists
+
+    def merge(self, category_ids: list[int]):
+        """ Returns ids of accepted recipes in any of the categories, newest first """
+        with self.lock:
+            lists: Lists = self.get()
+            cached = len(category_ids) >= settings.FEED_CACHE_CATEGORIES
+            signature = tuple(sorted(set(category_ids)))
+            if cached:
+                metrics.registry.inc('cache_requests_total', cache='feed', result='hit' if signature in lists.merged else 'miss')
+            if cached and signature in lists.merged:
+                lists.merged.move_to_end(signature)
+                return lists.merged[signature]
+            result, last = [], None
+            for key in heapq.merge(*(lists.categories.get(category_id, ()) for category_id in signature)):
+                if key != last:
+                    result.append(-key[1])
+                    last = key
+            if cached:
+                lists.merged[signature] = result
+                if len(lists.merged) > settings.FEED_CACHE_SIZE:
+                    lists.merged.popitem(last=False)
+        return result
+
+
+index = CategoryFeed()
@@ -1,17 +1,24 @@
 import re
 from datetime import timedelta
-from django.db.models import Q, Manager
+from django.db.models import Q, Manager, Case, When, Value
+import recipeAPIapp.utils.trigram as trigram
 from recipeAPIapp.models.timestamp import utc_now
 from recipeAPIapp.models.recipe import SubmitStatuses
 
 
 
-def search(qryset: Manager, field_names: list[str], search_string: str):
-    """ Applies string search filtration on queryset """
+def words(search_string: str):
+    """ Returns lowercased search words stripped of possessive and plural endings """
     words = [re.sub(r"('s|s|s's)$", "", word.lower()) for word in search_string.split(" ")]
-    words = [word for word in words if len(word) > 0]
+    return [word for word in words if len(word) > 0]
+
+
+def search(qryset: Manager, field_names: list[str], search_string: str, fuzzy=False):
+    """ Applies string search filtration on queryset, fuzzy search tolerates typos and orders by similarity """
+    if fuzzy:
+        return trigram.search(qryset, field_names, search_string)
     qry_filter = Q()
-    for word in words:
+    for word in words(search_string):
         qry_filter_part = Q()
         for fn in field_names:
             qry_filter_part |= Q(**{f'{fn}__icontains': word})
@@ -41,6 +48,12 @@ def order_by(qryset: Manager, vdata, **recent_replace):
     return qryset
 
 
+def fields(vdata, options: tuple[str]):
+    """ Returns requested output fields in options order """
+    selected = set(vdata.get('fields', options)) - set(vdata.get('exclude', []))
+    return tuple(option for option in options if option in selected)
+
+
 def paginate(qryset: Manager, vdata, serialization_function):
     """ Paginates and serializes queryset """
     result = {'count': qryset.count(), 'page': vdata['page'], 'page_size': vdata['page_size']}
@@ -48,3 +61,36 @@ def paginate(qryset: Manager, vdata, serialization_function):
     qryset = qryset[offset:offset + vdata['page_size']]
     result['results'] = serialization_function(qryset)
     return result
+
+
+def paginate_ranked(qryset: Manager, ranked: list[int], vdata, serialization_function, chunk_size=500, filtered=True):
+    """
+        Paginates ids ranked in memory which pass queryset filters, serializes page in rank order,
+        long rankings are intersected with one scan of the queryset instead of id chunks
+    """
+    if filtered and len(ranked) > chunk_size * 10:
+        passing = set(qryset.values_list('pk', flat=True).iterator())
+        ranked = [pk for pk in ranked if pk in passing]
+    elif filtered:
+        passing = set()
+        for start in range(0, len(ranked), chunk_size):
+            passing.update(qryset.filter(pk__in=ranked[start:start + chunk_size]).values_list('pk', flat=True))
+        ranked = [pk for pk in ranked if pk in passing]
+    result = {'count': len(ranked), 'page': vdata['page'], 'page_size': vdata['page_size']}
+    offset = (vdata['page'] - 1) * vdata['page_size']
+    page = ranked[offset:offset + vdata['page_size']]
+    result['results'] = serialization_function(in_order(qryset, page)) if page else []
+    return result
+
+
+def paginate_selected(qryset: Manager, count: int, page: list[int], vdata, serialization_function):
+    """ Serializes page of ids selected in memory out of count matching objects in listed order """
+    result = {'count': count, 'page': vdata['page'], 'page_size': vdata['page_size']}
+    result['results'] = serialization_function(in_order(qryset, page)) if page else []
+    return result
+
+
+def in_order(qryset: Manager, ids: list[int]):
+    """ Filters queryset to given ids ordered as listed """
+    rank = Case(*[When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)], default=Value(len(ids)))
+    return qryset.filter(pk__in=ids).order_by(rank)
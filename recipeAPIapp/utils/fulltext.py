@@ -0,0 +1,94 @@
+import operator, re
+from functools import reduce
+from django.db import connection, transaction
+from django.db.models import Value, FloatField
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from recipeAPIapp.utils.filtering import words
+from recipeAPIapp.utils.trigram import postgres
+from recipeAPIapp.models.maintained import changed
+from recipeAPIapp.models.recipe import Recipe, Rating
+
+TABLES = {
+    Recipe: ('recipe_fts', {'name': 4.0, 'title': 1.0}),
+    Rating: ('rating_fts', {'content': 1.0}),
+}
+
+
+
+def match(search_string: str, every=False):
+    """ Returns FTS5 query matching any or every word prefix, words are quoted so operators in them are not parsed """
+    return (' AND ' if every else ' OR ').join('"{}"*'.format(word.replace('"', '""')) for word in words(search_string))
+
+
+def tsquery(search_string: str, joiner: str):
+    """ Returns PostgreSQL raw tsquery of word prefixes, words are split on non-word characters so none parses as operator """
+    return f' {joiner} '.join(f'{part}:*' for word in words(search_string) for part in re.findall(r'\w+', word))
+
+
+def relevance(model, search_string: str):
+    """
+        Returns expression of object's relevance to search string weighted by field, lower is more relevant,
+        objects not matched by full text search are least relevant
+    """
+    table, weights = TABLES[model]
+    if not words(search_string):
+        return Value(0.0)
+    if postgres():
+        from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
+        if not tsquery(search_string, '|'):
+            return Value(0.0)
+        vectors = [SearchVector(field, weight=letter, config='english') for field, letter in zip(weights, 'ABCD')]
+        vector = reduce(operator.add, vectors)
+        return -SearchRank(vector, SearchQuery(tsquery(search_string, '|'), search_type='raw', config='english'))
+    outer = f'{connection.ops.quote_name(model._meta.db_table)}.{connection.ops.quote_name("id")}'
+    columns = ', '.join(str(weight) for weight in weights.values())
+    sql = f'SELECT bm25({table}, {columns}) FROM {table} WHERE {table} MATCH %s AND rowid = {outer}'
+    return Coalesce(RawSQL(sql, (match(search_string),), output_field=FloatField()), 0.0)
+
+
+def rank(qryset, vdata):
+    """ Annotates relevance to searched string when ordering by it """
+    if 'relevance' not in [param.lstrip('-') for param in vdata.get('order_by', [])]:
+        return qryset
+    return qryset.annotate(relevance=relevance(qryset.model, vdata['search_string']))
+
+
+def rebuild():
+    """ Refills full text tables from searched fields, returns number of indexed objects """
+    if postgres():
+        return 0
+    count = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model, (table, weights) in TABLES.items():
+            columns = ', '.join(weights)
+            cursor.execute(f'DELETE FROM {table}')
+            cursor.execute(
+                f'INSERT INTO {table} (rowid, {columns}) SELECT id, {columns} FROM {model._meta.db_table}'
+            )
+            count += cursor.rowcount
+    return count
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Rating)
+def searched_saved(sender, instance, update_fields=None, **kwargs):
+    table, weights = TABLES[sender]
+    if postgres() or (update_fields is not None and not set(weights) & set(update_fields)) or not changed(instance, weights):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', (instance.pk,))
+        cursor.execute(
+            f'INSERT INTO {table} (rowid, {", ".join(weights)}) VALUES (%s{", %s" * len(weights)})',
+            (instance.pk, *[getattr(instance, field) for field in weights])
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Rating)
+def searched_deleted(sender, instance, **kwargs):
+    if not postgres():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLES[sender][0]} WHERE rowid = %s', (instance.pk,))
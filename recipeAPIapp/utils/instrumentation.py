@@ -0,0 +1,126 @@
+import heapq, logging, re, threading, time
+from collections import Counter
+from django.conf import settings
+from django.db import connection
+from django.http import HttpRequest
+
+log = logging.getLogger(__name__)
+
+
+
+def shape(sql: str):
+    """ Returns statement with literals and placeholder lists collapsed, so repeats of one query look alike """
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    sql = re.sub(r'%s|\?', '?', sql)
+    sql = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(...)', sql)
+    return ' '.join(sql.split())
+
+
+class Statements:
+    """ Execute wrapper recording every statement of one request with its duration """
+    def __init__(self):
+        self.queries: list[tuple[str, float]] = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def time(self):
+        return sum(duration for _, duration in self.queries)
+
+    def slowest(self, count: int):
+        return heapq.nlargest(count, self.queries, key=lambda query: query[1])
+
+    def repeated(self):
+        """ Returns (shape, count) of statements run at least QUERY_REPEAT_THRESHOLD times, most repeated first """
+        shapes = Counter(shape(sql) for sql, _ in self.queries)
+        return [(sql, count) for sql, count in shapes.most_common() if count >= settings.QUERY_REPEAT_THRESHOLD]
+
+
+class Routes:
+    """ Query statistics aggregated per url route by this process """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes: dict[str, dict] = {}
+
+    def add(self, route: str, statements: Statements, repeated: list[tuple[str, int]], over_budget: bool):
+        with self.lock:
+            data = self.routes.setdefault(route, {
+                'requests': 0, 'queries': 0, 'time': 0.0, 'max_queries': 0,
+                'over_budget': 0, 'repeated': Counter(), 'slowest': [],
+            })
+            data['requests'] += 1
+            data['queries'] += statements.count
+            data['time'] += statements.time
+            data['max_queries'] = max(data['max_queries'], statements.count)
+            data['over_budget'] += over_budget
+            for sql, count in repeated:
+                data['repeated'][sql] = max(data['repeated'][sql], count)
+            slowest = data['slowest'] + [(shape(sql), duration) for sql, duration in statements.slowest(settings.QUERY_SLOWEST)]
+            data['slowest'] = heapq.nlargest(settings.QUERY_SLOWEST, slowest, key=lambda query: query[1])
+
+    def report(self):
+        with self.lock:
+            return {route: {
+                'requests': data['requests'],
+                'queries': data['queries'],
+                'time': round(data['time'] * 1000, 3),
+                'max_queries': data['max_queries'],
+                'over_budget': data['over_budget'],
+                'repeated': [{'sql': sql, 'count': count} for sql, count in data['repeated'].most_common()],
+                'slowest': [{'sql': sql, 'time': round(duration * 1000, 3)} for sql, duration in data['slowest']],
+            } for route, data in sorted(self.routes.items())}
+
+    def clear(self):
+        with self.lock:
+            self.routes.clear()
+
+
+routes = Routes()
+
+
+def route(request: HttpRequest):
+    match = request.resolver_match
+    return match.route if match is not None else 'unmatched'
+
+
+def budget(route: str):
+    return settings.QUERY_BUDGETS.get(route, settings.QUERY_BUDGET)
+
+
+class QueryInstrumentationMiddleware:
+    """
+        Records count, total time and slowest statements of every request's queries when QUERY_INSTRUMENTATION is set,
+        warns of statements repeated within a request (N+1 lookups) and of routes exceeding their query budget,
+        totals per route are served by metrics/queries, in DEBUG mode request's figures are sent as X-Query headers
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest):
+        if not settings.QUERY_INSTRUMENTATION:
+            return self.get_response(request)
+        statements = Statements()
+        with connection.execute_wrapper(statements):
+            response = self.get_response(request)
+        name, repeated = route(request), statements.repeated()
+        over_budget = statements.count > budget(name)
+        if over_budget:
+            log.warning(f"Query budget exceeded - route {name}, queries {statements.count}, budget {budget(name)}")
+        for sql, count in repeated:
+            log.warning(f"Repeated query - route {name}, count {count}, query {sql}")
+        routes.add(name, statements, repeated, over_budget)
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(statements.count)
+            response['X-Query-Time'] = f'{statements.time * 1000:.3f}'
+            response['X-Query-Repeated'] = str(repeated[0][1] if repeated else 0)
+        return response
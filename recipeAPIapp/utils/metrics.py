@@ -0,0 +1,307 @@
+import atexit, json, logging, os, re, threading, time
+from bisect import bisect_left
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+from django.http import HttpRequest
+import recipeAPIapp.utils.counters as counters
+import recipeAPIapp.utils.instrumentation as instrumentation
+from recipeAPIapp.utils.snapshot import Snapshot
+from recipeAPIapp.models.timestamp import utc_now
+from recipeAPIapp.models.recommendation import Recommendation
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+METRICS = {
+    'http_requests_total': ('counter', "Requests served per route, method and status code"),
+    'http_request_duration_seconds': ('histogram', "Time spent serving requests per route"),
+    'http_request_db_seconds': ('histogram', "Time spent in database queries per request per route"),
+    'cache_requests_total': ('counter', "Cache lookups per cache and result"),
+    'cache_hit_ratio': ('gauge', "Share of cache lookups that were hits"),
+    'counter_buffer_pending': ('gauge', "Buffered view, cook and trending increments not written yet per process"),
+    'counter_buffer_age_seconds': ('gauge', "Age of the oldest buffered increment per process"),
+    'snapshot_sync_age_seconds': ('gauge', "Time since in-memory index last synced with database changes per process"),
+    'recommendation_age_seconds': ('gauge', "Time since recommend command last stored recommendations"),
+}
+
+
+
+def labelled(name: str, labels: dict):
+    """ Returns series key of metric name and its labels """
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Registry:
+    """
+        Counters and histograms of this process, written to METRICS_DIR at most every METRICS_FLUSH_INTERVAL seconds
+        and at exit, so /metrics served by any worker sums all of them
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: dict[tuple, float] = {}
+        self.histograms: dict[tuple, list[float]] = {}
+        self.written = time.monotonic()
+        self.started = time.time_ns()
+
+    def forked(self):
+        """ Forked worker starts empty under its own file instead of repeating its parent's counts """
+        self.lock = threading.Lock()
+        self.clear()
+        self.written = time.monotonic()
+        self.started = time.time_ns()
+
+    @property
+    def name(self):
+        """ File name of this process, keyed by start time too so a reused pid never overwrites an exited worker """
+        return f'metrics-{os.getpid()}-{self.started}.json'
+
+    def inc(self, name: str, amount=1, **labels):
+        key = labelled(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        """ Adds value to its bucket, histogram keeps per bucket counts followed by sum and count """
+        key, buckets = labelled(name, labels), settings.METRICS_BUCKETS
+        with self.lock:
+            histogram = self.histograms.setdefault(key, [0] * (len(buckets) + 3))
+            histogram[bisect_left(buckets, value)] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def state(self):
+        with self.lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, labels, values[:]] for (name, labels), values in self.histograms.items()],
+                'gauges': [[name, labels, value] for (name, labels), value in gauges().items()],
+            }
+
+    def due(self):
+        return settings.METRICS_DIR is not None and time.monotonic() - self.written >= settings.METRICS_FLUSH_INTERVAL
+
+    def write(self):
+        """ Replaces this process's file in METRICS_DIR """
+        if settings.METRICS_DIR is None:
+            return
+        self.written = time.monotonic()
+        store(os.path.join(settings.METRICS_DIR, self.name), self.state())
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+registry = Registry()
+atexit.register(registry.write)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry.forked)
+
+
+def store(path: str, state: dict):
+    try:
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump(state, file)
+        os.replace(f'{path}.tmp', path)
+    except OSError:
+        log.exception(f"Metrics write failed - {path}")
+
+
+def load(path: str):
+    """ Returns state stored in file, None when it is gone or partly written """
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def gauges():
+    """ Returns lag of this process's background work: buffered counter increments and snapshot syncs """
+    pid, now, result = os.getpid(), utc_now(), {}
+    with counters.buffer.lock:
+        result[labelled('counter_buffer_pending', {'pid': pid})] = counters.buffer.size
+        oldest = counters.buffer.oldest
+        result[labelled('counter_buffer_age_seconds', {'pid': pid})] = time.time() - oldest if oldest else 0
+    for snapshot in Snapshot.instances:
+        if snapshot.synced_at is not None:
+            labels = {'snapshot': ','.join(snapshot.topics), 'pid': pid}
+            result[labelled('snapshot_sync_age_seconds', labels)] = (now - snapshot.synced_at).total_seconds()
+    return result
+
+
+def alive(pid: int):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def merge(states: list[dict]):
+    """ Returns counters and histograms of states summed per (name, labels) key """
+    merged = {'counters': {}, 'histograms': {}, 'gauges': {}}
+    for state in states:
+        for name, labels, value in state['counters']:
+            key = name, tuple(map(tuple, labels))
+            merged['counters'][key] = merged['counters'].get(key, 0) + value
+        for name, labels, values in state['histograms']:
+            key = name, tuple(map(tuple, labels))
+            total = merged['histograms'].setdefault(key, [0] * len(values))
+            merged['histograms'][key] = [a + b for a, b in zip(total, values)]
+    return merged
+
+
+def archive(paths: list[str]):
+    """
+        Adds counters and histograms of exited processes' files to metrics-archive.json and removes the files,
+        returns archived state, the archive is updated under a file lock so concurrent collects neither lose nor repeat them,
+        platforms without fcntl update it unlocked
+    """
+    path = os.path.join(settings.METRICS_DIR, 'metrics-archive.json')
+    if not paths:
+        return load(path)
+    with open(os.path.join(settings.METRICS_DIR, 'metrics-archive.lock'), 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        archived = load(path) or {'counters': [], 'histograms': []}
+        states = [state for state in map(load, paths) if state is not None]
+        if not states:
+            return archived
+        merged = merge([archived, *states])
+        archived = {
+            'counters': [[name, labels, value] for (name, labels), value in merged['counters'].items()],
+            'histograms': [[name, labels, values] for (name, labels), values in merged['histograms'].items()],
+        }
+        store(path, archived)
+        for dead in paths:
+            try:
+                os.remove(dead)
+            except FileNotFoundError:
+                pass
+    return archived
+
+
+class Recommended:
+    """ Time recommendations were last stored, queried at most every METRICS_FLUSH_INTERVAL seconds instead of per scrape """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latest = None
+        self.checked = None
+
+    def get(self):
+        with self.lock:
+            if self.checked is None or time.monotonic() - self.checked >= settings.METRICS_FLUSH_INTERVAL:
+                self.latest = Recommendation.objects.aggregate(latest=Max('created_at'))['latest']
+                self.checked = time.monotonic()
+            return self.latest
+
+
+recommended = Recommended()
+
+
+def collect():
+    """
+        Returns counters, histograms and gauges summed over every process that wrote to METRICS_DIR,
+        files of exited processes are folded into one archive keeping their counters while their gauges are dropped,
+        a process whose pid was reused is told apart by the start time in its file name
+    """
+    live, dead, archived = [registry.state()], [], None
+    if settings.METRICS_DIR is not None:
+        registry.write()
+        files = {}
+        for entry in os.scandir(settings.METRICS_DIR):
+            match = re.fullmatch(r'metrics-(\d+)-(\d+)\.json', entry.name)
+            if match and entry.name != registry.name:
+                files[entry.path] = int(match[1]), int(match[2])
+        newest = {}
+        for pid, started in files.values():
+            newest[pid] = max(newest.get(pid, started), started)
+        for path, (pid, started) in files.items():
+            if alive(pid) and started == newest[pid]:
+                state = load(path)
+                live += [state] if state is not None else []
+            else:
+                dead.append(path)
+        archived = archive(dead)
+    merged = merge(live + ([archived] if archived else []))
+    for state in live:
+        for name, labels, value in state['gauges']:
+            merged['gauges'][name, tuple(map(tuple, labels))] = value
+    hits = {}
+    for (name, labels), value in merged['counters'].items():
+        if name == 'cache_requests_total':
+            labels = dict(labels)
+            hits.setdefault(labels['cache'], [0, 0])[labels['result'] == 'hit'] += value
+    for cache, (misses, hit) in hits.items():
+        merged['gauges'][labelled('cache_hit_ratio', {'cache': cache})] = hit / (hit + misses)
+    latest = recommended.get()
+    if latest is not None:
+        merged['gauges'][labelled('recommendation_age_seconds', {})] = (utc_now() - latest).total_seconds()
+    return merged
+
+
+def escape(value: str):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def series(name: str, labels: tuple, value: float):
+    text = ','.join(f'{key}="{escape(label)}"' for key, label in labels)
+    return f'{name}{{{text}}} {value}' if text else f'{name} {value}'
+
+
+def exposition():
+    """ Returns collected metrics in Prometheus text exposition format """
+    merged, lines = collect(), []
+    bounds = [f'{bound:g}' for bound in settings.METRICS_BUCKETS] + ['+Inf']
+    for name, (kind, description) in METRICS.items():
+        rows = merged[f'{kind}s']
+        keys = sorted(key for key in rows if key[0] == name)
+        if not keys:
+            continue
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+        for key in keys:
+            labels = key[1]
+            if kind != 'histogram':
+                lines.append(series(name, labels, rows[key]))
+                continue
+            cumulative = 0
+            for bound, count in zip(bounds, rows[key][:-2]):
+                cumulative += count
+                lines.append(series(f'{name}_bucket', labels + (('le', bound),), cumulative))
+            lines.append(series(f'{name}_sum', labels, rows[key][-2]))
+            lines.append(series(f'{name}_count', labels, rows[key][-1]))
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """
+        Counts requests per route, method and status code and records their latency and database time
+        in histograms when METRICS is set, served by /metrics
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest):
+        if not settings.METRICS:
+            return self.get_response(request)
+        statements = instrumentation.Statements()
+        start = time.perf_counter()
+        with connection.execute_wrapper(statements):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+        route = instrumentation.route(request)
+        registry.inc('http_requests_total', route=route, method=request.method, status=response.status_code)
+        registry.observe('http_request_duration_seconds', duration, route=route, method=request.method)
+        registry.observe('http_request_db_seconds', statements.time, route=route, method=request.method)
+        if registry.due():
+            registry.write()
+        return response
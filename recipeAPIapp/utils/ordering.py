@@ -0,0 +1,71 @@
+from django.db.models import Model, Case, When, Value, F
+from django.http import Http404
+from recipeAPIapp.models.recipe import Recipe
+
+
+
+def lock(recipe: Recipe):
+    """ Serializes concurrent reordering of one recipe until the end of transaction """
+    Recipe.objects.select_for_update().filter(pk=recipe.pk).exists()
+
+
+def current(instance: Model):
+    """ Re-reads item's position under the lock, position read before it may be stale """
+    number = type(instance).objects.filter(pk=instance.pk).values_list('number', flat=True).first()
+    if number is None:
+        raise Http404()
+    instance.number = number
+
+
+def flip(model: type[Model], recipe: Recipe):
+    """
+        Shifted rows are first written as negative positions and flipped back here,
+        so no statement produces duplicate position while unique constraint is checked per row
+    """
+    model.objects.filter(recipe=recipe, number__lt=0).update(number=-F('number'))
+
+
+def insert(model: type[Model], recipe: Recipe, number: int):
+    """ Makes space for new item, returns its clamped position """
+    lock(recipe)
+    number = min(model.objects.filter(recipe=recipe).count() + 1, number)
+    model.objects.filter(recipe=recipe, number__gte=number).update(number=-(F('number') + 1))
+    flip(model, recipe)
+    return number
+
+
+def move(instance: Model, number: int):
+    """ Moves item to clamped position shifting items in between, returns the position """
+    model, recipe = type(instance), instance.recipe
+    lock(recipe)
+    current(instance)
+    number = min(model.objects.filter(recipe=recipe).count(), number)
+    if number == instance.number:
+        return number
+    if number > instance.number:
+        range, movement = {'number__gt': instance.number, 'number__lte': number}, -1
+    else:
+        range, movement = {'number__gte': number, 'number__lt': instance.number}, 1
+    model.objects.filter(recipe=recipe, **range).update(number=-(F('number') + movement))
+    model.objects.filter(pk=instance.pk).update(number=-number)
+    flip(model, recipe)
+    instance.number = number
+    return number
+
+
+def remove(instance: Model):
+    """ Deletes item and closes the gap after it """
+    model, recipe = type(instance), instance.recipe
+    lock(recipe)
+    current(instance)
+    instance.delete()
+    model.objects.filter(recipe=recipe, number__gt=instance.number).update(number=-(F('number') - 1))
+    flip(model, recipe)
+
+
+def reorder(model: type[Model], recipe: Recipe, ids: list[int]):
+    """ Applies permutation given as list of all item ids in new order """
+    lock(recipe)
+    whens = [When(pk=pk, then=Value(-number)) for number, pk in enumerate(ids, start=1)]
+    model.objects.filter(recipe=recipe).update(number=Case(*whens, default=F('number')))
+    flip(model, recipe)
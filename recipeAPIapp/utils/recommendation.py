@@ -0,0 +1,209 @@
+import heapq, math
+from array import array
+from django.conf import settings
+from django.db import transaction
+from recipeAPIapp.models.timestamp import utc_now
+from recipeAPIapp.models.categorical import Category
+from recipeAPIapp.models.recipe import Recipe, Rating
+from recipeAPIapp.models.recipe import SubmitStatuses as Statuses
+from recipeAPIapp.models.recommendation import Recommendation
+
+FAVOURED_WEIGHT = 1.0
+CATEGORY_BOOST = 0.25
+
+
+
+class Sparse:
+    """
+        Compressed sparse rows kept in typed arrays, row of key has columns
+        indices[indptr[p]:indptr[p + 1]] with values data[indptr[p]:indptr[p + 1]] where p = positions[key]
+    """
+    def __init__(self):
+        self.keys = array('q')
+        self.positions: dict[int, int] = {}
+        self.indptr = array('q', [0])
+        self.indices = array('q')
+        self.data = array('d')
+
+    @classmethod
+    def triplets(cls, rows: array, columns: array, values: array):
+        """
+            Builds matrix from coordinates, values of repeated coordinates are summed,
+            coordinates are sorted by row * width + column codes kept in a typed array instead of tuples
+        """
+        matrix = cls()
+        width = max(columns, default=0) + 1
+        codes = array('q', [row * width + column for row, column in zip(rows, columns)])
+        order = array('q', sorted(range(len(codes)), key=codes.__getitem__))
+        del codes
+        for i in order:
+            row, column, value = rows[i], columns[i], values[i]
+            if not matrix.keys or matrix.keys[-1] != row:
+                matrix.start(row)
+            if len(matrix.indices) > matrix.indptr[-2] and matrix.indices[-1] == column:
+                matrix.data[-1] += value
+            else:
+                matrix.indices.append(column)
+                matrix.data.append(value)
+                matrix.indptr[-1] += 1
+        return matrix
+
+    def start(self, key: int):
+        self.positions[key] = len(self.keys)
+        self.keys.append(key)
+        self.indptr.append(self.indptr[-1])
+
+    def append(self, key: int, columns, values):
+        self.start(key)
+        self.indices.extend(columns)
+        self.data.extend(values)
+        self.indptr[-1] = len(self.indices)
+
+    def row(self, key: int):
+        position = self.positions.get(key)
+        if position is None:
+            return zip((), ())
+        start, end = self.indptr[position], self.indptr[position + 1]
+        return zip(self.indices[start:end], self.data[start:end])
+
+    def transpose(self):
+        rows, columns = array('q'), array('q')
+        for position, key in enumerate(self.keys):
+            rows.extend(self.indices[self.indptr[position]:self.indptr[position + 1]])
+            columns.extend([key] * (self.indptr[position + 1] - self.indptr[position]))
+        return Sparse.triplets(rows, columns, self.data)
+
+
+def feedback():
+    """ Returns user x accepted recipe matrix of implicit feedback from favourites and good ratings """
+    users, recipes, weights = array('q'), array('q'), array('d')
+    through = Recipe.favoured_by.through.objects.filter(recipe__submit_status=Statuses.ACCEPTED)
+    for user_id, recipe_id in through.values_list('user', 'recipe').iterator():
+        users.append(user_id)
+        recipes.append(recipe_id)
+        weights.append(FAVOURED_WEIGHT)
+    ratings = Rating.objects.filter(recipe__submit_status=Statuses.ACCEPTED, stars__gte=3)
+    for user_id, recipe_id, stars in ratings.values_list('user', 'recipe', 'stars').iterator():
+        users.append(user_id)
+        recipes.append(recipe_id)
+        weights.append((stars - 2) / 3)
+    return Sparse.triplets(users, recipes, weights)
+
+
+def neighbours(feedback: Sparse, count: int, block: int):
+    """
+        Returns recipe x recipe matrix of each recipe's count most cosine similar recipes by co-occurrence,
+        products are accumulated for block recipes at a time so memory stays bounded by the block
+    """
+    recipes = feedback.transpose()
+    norms = array('d', (
+        math.sqrt(sum(value * value for value in recipes.data[recipes.indptr[p]:recipes.indptr[p + 1]]))
+        for p in range(len(recipes.keys))
+    ))
+    result = Sparse()
+    for start in range(0, len(recipes.keys), block):
+        keys = recipes.keys[start:start + block]
+        raters: dict[int, list[tuple[int, float]]] = {}
+        for recipe_id in keys:
+            for user_id, weight in recipes.row(recipe_id):
+                raters.setdefault(user_id, []).append((recipe_id, weight))
+        products: dict[int, dict[int, float]] = {recipe_id: {} for recipe_id in keys}
+        for user_id, rated in raters.items():
+            row = list(feedback.row(user_id))
+            for recipe_id, weight in rated:
+                target = products[recipe_id]
+                for other_id, other_weight in row:
+                    target[other_id] = target.get(other_id, 0) + weight * other_weight
+        del raters
+        for recipe_id in keys:
+            target = products.pop(recipe_id)
+            target.pop(recipe_id, None)
+            norm = norms[recipes.positions[recipe_id]]
+            top = heapq.nlargest(count, (
+                (product / (norm * norms[recipes.positions[pk]]), pk) for pk, product in target.items()
+            ))
+            result.append(recipe_id, [pk for _, pk in top], [similarity for similarity, _ in top])
+    return result
+
+
+def recipe_data():
+    """ Returns authors and category sets of accepted recipes """
+    authors = dict(Recipe.objects.filter(submit_status=Statuses.ACCEPTED).values_list('pk', 'user').iterator())
+    categories = {}
+    through = Recipe.categories.through.objects.filter(recipe__submit_status=Statuses.ACCEPTED)
+    for recipe_id, category_id in through.values_list('recipe', 'category').iterator():
+        categories.setdefault(recipe_id, set()).add(category_id)
+    return authors, categories
+
+
+def seen(user_ids: list[int]):
+    """ Returns recipes each user already rated (with any stars) or favoured """
+    result = {}
+    ratings = Rating.objects.filter(user__in=user_ids).values_list('user', 'recipe')
+    favoured = Recipe.favoured_by.through.objects.filter(user__in=user_ids).values_list('user', 'recipe')
+    for user_id, recipe_id in [*ratings, *favoured]:
+        result.setdefault(user_id, set()).add(recipe_id)
+    return result
+
+
+def recommend(
+    user_id: int, feedback: Sparse, similar: Sparse, authors: dict, categories: dict, favourites: set, seen: set, count: int
+):
+    """ Returns count (score, recipe id) pairs best scored for user, excluding own, rated and favoured recipes """
+    scores = {}
+    for recipe_id, weight in feedback.row(user_id):
+        for other_id, similarity in similar.row(recipe_id):
+            scores[other_id] = scores.get(other_id, 0) + weight * similarity
+    for recipe_id in seen:
+        scores.pop(recipe_id, None)
+    for recipe_id, score in scores.items():
+        if favourites and categories.get(recipe_id, set()) & favourites:
+            scores[recipe_id] = score * (1 + CATEGORY_BOOST)
+    return heapq.nlargest(count, ((score, pk) for pk, score in scores.items() if authors.get(pk) != user_id))
+
+
+def store(ranked: dict[int | None, list[tuple[float, int]]]):
+    """ Replaces stored lists of given users, None key is the popularity ranking """
+    users = [user_id for user_id in ranked if user_id is not None]
+    Recommendation.objects.filter(user_id__in=users).delete()
+    if None in ranked:
+        Recommendation.objects.filter(user=None).delete()
+    Recommendation.objects.bulk_create([
+        Recommendation(user_id=user_id, recipe_id=recipe_id, rank=rank, score=score)
+        for user_id, top in ranked.items() for rank, (score, recipe_id) in enumerate(top, start=1)
+    ], batch_size=1000)
+
+
+def run():
+    """
+        Recomputes stored recommendations of all users with feedback and the popularity ranking,
+        users are processed and written in chunks, lists of users without feedback are deleted
+    """
+    started = utc_now()
+    count = settings.RECOMMENDATION_COUNT
+    chunk_size = settings.RECOMMENDATION_CHUNK
+    matrix = feedback()
+    similar = neighbours(matrix, settings.RECOMMENDATION_NEIGHBOURS, settings.RECOMMENDATION_BLOCK)
+    authors, categories = recipe_data()
+    popularity = {}
+    for recipe_id, weight in zip(matrix.indices, matrix.data):
+        popularity[recipe_id] = popularity.get(recipe_id, 0) + weight
+    with transaction.atomic():
+        store({None: heapq.nlargest(count, ((score, pk) for pk, score in popularity.items()))})
+    for start in range(0, len(matrix.keys), chunk_size):
+        user_ids = matrix.keys[start:start + chunk_size].tolist()
+        favourites = {}
+        through = Category.favoured_by.through.objects.filter(user__in=user_ids)
+        for user_id, category_id in through.values_list('user', 'category'):
+            favourites.setdefault(user_id, set()).add(category_id)
+        excluded = seen(user_ids)
+        ranked = {
+            user_id: recommend(
+                user_id, matrix, similar, authors, categories, favourites.get(user_id), excluded.get(user_id, set()), count
+            )
+            for user_id in user_ids
+        }
+        with transaction.atomic():
+            store(ranked)
+    Recommendation.objects.filter(created_at__lt=started).delete()
+    return len(matrix.keys)
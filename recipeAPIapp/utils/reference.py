@@ -0,0 +1,54 @@
+from django.db.models import Model
+from recipeAPIapp.utils.snapshot import Snapshot
+from recipeAPIapp.models.categorical import Category, Ingredient
+
+FIELDS = {
+    'category': (Category, ('id', 'photo', 'name')),
+    'ingredient': (Ingredient, ('id', 'photo', 'unit', 'name')),
+}
+
+
+
+def rows(model: type[Model], fields: tuple[str], pks=None):
+    """ Returns value tuples of model's objects by id in fields order, photos converted to urls """
+    storage = model._meta.get_field('photo').storage
+    photo = fields.index('photo')
+    qryset = model.objects.all() if pks is None else model.objects.filter(pk__in=pks)
+    result = {}
+    for row in qryset.values_list(*fields).iterator():
+        row = list(row)
+        row[photo] = storage.url(row[photo]) if row[photo] else None
+        result[row[0]] = tuple(row)
+    return result
+
+
+class ReferenceData(Snapshot):
+    """
+        Output of CategorySmallData and IngredientSmallData of every category and ingredient kept as value tuples by id,
+        objects written by other processes and not synced yet are loaded on first lookup
+    """
+    topics = tuple(FIELDS)
+
+    def build(self):
+        return {topic: rows(model, fields) for topic, (model, fields) in FIELDS.items()}
+
+    def update(self, data: dict[str, dict[int, tuple]], keys: dict[str, set[int]]):
+        for topic, (model, fields) in FIELDS.items():
+            if keys[topic]:
+                for pk in keys[topic]:
+                    data[topic].pop(pk, None)
+                data[topic].update(rows(model, fields, keys[topic]))
+        return data
+
+    def lookup(self, topic: str, pks) -> list[dict]:
+        """ Returns serialized objects of topic in pks order """
+        model, fields = FIELDS[topic]
+        with self.lock:
+            objects = self.get()[topic]
+            missing = [pk for pk in pks if pk not in objects]
+            if missing:
+                objects.update(rows(model, fields, missing))
+            return [dict(zip(fields, objects[pk])) for pk in pks if pk in objects]
+
+
+snapshot = ReferenceData()
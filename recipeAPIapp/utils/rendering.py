@@ -0,0 +1,64 @@
+import codecs, math
+from django.conf import settings
+from rest_framework import renderers, parsers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+
+def backend():
+    """ Returns name of the json library used by renderer and parser """
+    if getattr(settings, 'JSON_BACKEND', 'json') == 'orjson' and orjson is not None:
+        return 'orjson'
+    return 'json'
+
+
+def finite(data):
+    """ Returns whether data holds no NaN or infinite floats, orjson writes them as null where stdlib encoder raises """
+    if isinstance(data, float):
+        return math.isfinite(data)
+    if isinstance(data, dict):
+        return all(finite(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return all(finite(value) for value in data)
+    return True
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """ Renders compact json with the configured backend, output matches stdlib renderer """
+    default = encoders.JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or backend() != 'orjson':
+            return super().render(data, accepted_media_type, renderer_context)
+        if not self.compact or self.ensure_ascii or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.default, option=ORJSON_OPTIONS)
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'null' in ret and not finite(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class JSONParser(parsers.JSONParser):
+    """ Parses json with the configured backend """
+    renderer_class = JSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if backend() != 'orjson' or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
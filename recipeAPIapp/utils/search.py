@@ -0,0 +1,113 @@
+from django.db import connection, transaction
+from django.db.models import Value, CharField
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from recipeAPIapp.utils.filtering import words
+from recipeAPIapp.utils.fulltext import match, tsquery
+from recipeAPIapp.utils.trigram import postgres
+from recipeAPIapp.models.maintained import changed
+from recipeAPIapp.models.user import User
+from recipeAPIapp.models.categorical import Category, Ingredient
+from recipeAPIapp.models.recipe import Recipe
+from recipeAPIapp.models.recipe import SubmitStatuses as Statuses
+
+TABLE = 'search_fts'
+WEIGHTS = (4.0, 1.0)
+TOPICS = {
+    'recipe': (Recipe, {'submit_status': Statuses.ACCEPTED}, ('name', 'title')),
+    'category': (Category, {}, ('name',)),
+    'ingredient': (Ingredient, {}, ('name',)),
+    'user': (User, {'banned': False}, ('name',)),
+}
+MODELS = {model: topic for topic, (model, _, _) in TOPICS.items()}
+ORDER = tuple(TOPICS)
+
+
+
+def rowid(topic: str, pk: int):
+    """ Entries of all topics share one table, topic is kept in the lowest digit of rowid in base of topic count """
+    return pk * len(ORDER) + ORDER.index(topic)
+
+
+def entries(topic: str, pks=None):
+    """ Returns (rowid, name, title) of visible objects of topic """
+    model, condition, fields = TOPICS[topic]
+    qryset = model.objects.filter(**condition) if pks is None else model.objects.filter(**condition, pk__in=pks)
+    return [(rowid(topic, pk), *values, *[''] * (2 - len(values))) for pk, *values in qryset.values_list('pk', *fields)]
+
+
+def insert(cursor, rows: list[tuple]):
+    cursor.executemany(f'INSERT INTO {TABLE} (rowid, name, title) VALUES (%s, %s, %s)', rows)
+
+
+def rebuild():
+    """ Refills shared search table with visible objects of all topics, returns number of entries """
+    if postgres():
+        return 0
+    count = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        for topic in ORDER:
+            rows = entries(topic)
+            insert(cursor, rows)
+            count += len(rows)
+    return count
+
+
+def search(search_string: str, count: int):
+    """ Returns count best matching visible objects of every topic as {topic: [{'id', 'name'}]} in one query """
+    result = {topic: [] for topic in ORDER}
+    if not words(search_string):
+        return result
+    if postgres():
+        rows = ranked(search_string, count)
+    else:
+        with connection.cursor() as cursor:
+            cursor.execute(f'''
+                SELECT rowid, name FROM (
+                    SELECT rowid, name, ROW_NUMBER() OVER (PARTITION BY rowid %% {len(ORDER)} ORDER BY score, rowid) AS position
+                    FROM (SELECT rowid, name, bm25({TABLE}, {', '.join(map(str, WEIGHTS))}) AS score FROM {TABLE} WHERE {TABLE} MATCH %s)
+                ) WHERE position <= %s ORDER BY rowid %% {len(ORDER)}, position
+            ''', (match(search_string, every=True), count))
+            rows = [(ORDER[key % len(ORDER)], key // len(ORDER), name) for key, name in cursor.fetchall()]
+    for topic, pk, name in rows:
+        result[topic].append({'id': pk, 'name': name})
+    return result
+
+
+def ranked(search_string: str, count: int):
+    """ PostgreSQL ranks each topic by ts_rank and unites the top rows of all topics """
+    from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
+    if not tsquery(search_string, '&'):
+        return []
+    query = SearchQuery(tsquery(search_string, '&'), search_type='raw', config='simple')
+    parts = []
+    for topic, (model, condition, fields) in TOPICS.items():
+        vector = SearchVector(*fields, config='simple')
+        qryset = model.objects.filter(**condition).annotate(rank=SearchRank(vector, query), topic=Value(topic, CharField()))
+        parts.append(qryset.filter(rank__gt=0).order_by('-rank', 'pk').values_list('topic', 'pk', 'name')[:count])
+    return list(parts[0].union(*parts[1:], all=True))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=User)
+def searched_saved(sender, instance, **kwargs):
+    topic = MODELS[sender]
+    _, condition, fields = TOPICS[topic]
+    if postgres() or not changed(instance, [*condition, *fields]):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', (rowid(topic, instance.pk),))
+        insert(cursor, entries(topic, [instance.pk]))
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=User)
+def searched_deleted(sender, instance, **kwargs):
+    if not postgres():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', (rowid(MODELS[sender], instance.pk),))
@@ -0,0 +1,99 @@
+import heapq, math
+from collections import Counter
+from recipeAPIapp.utils.snapshot import Snapshot
+from recipeAPIapp.models.recipe import Recipe, RecipeIngredient
+from recipeAPIapp.models.recipe import SubmitStatuses as Statuses
+
+INGREDIENT_WEIGHT = 1.0
+CATEGORY_WEIGHT = 0.5
+
+
+
+def norm(ingredients, categories):
+    return math.sqrt(INGREDIENT_WEIGHT * len(ingredients) + CATEGORY_WEIGHT * len(categories))
+
+
+def features(recipes=None):
+    """ Returns ingredient and category id sets of given recipes, of all accepted ones when none are given """
+    if recipes is None:
+        recipes = Recipe.objects.filter(submit_status=Statuses.ACCEPTED)
+    result = {pk: (set(), set()) for pk in recipes.values_list('pk', flat=True).iterator()}
+    rows = RecipeIngredient.objects.filter(recipe__in=recipes).values_list('recipe', 'ingredient')
+    for recipe_id, ingredient_id in rows.iterator():
+        result[recipe_id][0].add(ingredient_id)
+    rows = Recipe.categories.through.objects.filter(recipe__in=recipes).values_list('recipe', 'category')
+    for recipe_id, category_id in rows.iterator():
+        result[recipe_id][1].add(category_id)
+    return result
+
+
+class Matrix:
+    """
+        Sparse binary recipe x (ingredient, category) matrix stored by rows with their norms
+        and by columns, so products with one row only touch recipes sharing a feature
+    """
+    def __init__(self):
+        self.recipes: dict[int, tuple[set[int], set[int], float]] = {}
+        self.ingredients: dict[int, set[int]] = {}
+        self.categories: dict[int, set[int]] = {}
+
+    def add(self, recipe_id: int, ingredients: set[int], categories: set[int]):
+        self.recipes[recipe_id] = ingredients, categories, norm(ingredients, categories)
+        for ingredient_id in ingredients:
+            self.ingredients.setdefault(ingredient_id, set()).add(recipe_id)
+        for category_id in categories:
+            self.categories.setdefault(category_id, set()).add(recipe_id)
+
+    def remove(self, recipe_id: int):
+        row = self.recipes.pop(recipe_id, None)
+        if row is None:
+            return
+        for ingredient_id in row[0]:
+            self.ingredients[ingredient_id].discard(recipe_id)
+        for category_id in row[1]:
+            self.categories[category_id].discard(recipe_id)
+
+
+class SimilarityIndex(Snapshot):
+    """ Ranks accepted recipes by weighted cosine similarity of their ingredient and category sets """
+    topics = ('recipe',)
+
+    def build(self):
+        matrix = Matrix()
+        for recipe_id, (ingredients, categories) in features().items():
+            matrix.add(recipe_id, ingredients, categories)
+        return matrix
+
+    def update(self, matrix: Matrix, keys: dict[str, set[int]]):
+        changed = features(Recipe.objects.filter(pk__in=keys['recipe'], submit_status=Statuses.ACCEPTED))
+        for recipe_id in keys['recipe']:
+            matrix.remove(recipe_id)
+        for recipe_id, (ingredients, categories) in changed.items():
+            matrix.add(recipe_id, ingredients, categories)
+        return matrix
+
+    def similar(self, recipe: Recipe, count: int):
+        """ Returns ids of count accepted recipes most similar to the recipe, most similar first """
+        with self.lock:
+            matrix: Matrix = self.get()
+            if recipe.pk in matrix.recipes:
+                ingredients, categories, recipe_norm = matrix.recipes[recipe.pk]
+            else:
+                ingredients, categories = features(Recipe.objects.filter(pk=recipe.pk))[recipe.pk]
+                recipe_norm = norm(ingredients, categories)
+            shared_ingredients, shared_categories = Counter(), Counter()
+            for ingredient_id in ingredients:
+                shared_ingredients.update(matrix.ingredients.get(ingredient_id, ()))
+            for category_id in categories:
+                shared_categories.update(matrix.categories.get(category_id, ()))
+            shared_ingredients.pop(recipe.pk, None)
+            shared_categories.pop(recipe.pk, None)
+            scores = [
+                ((INGREDIENT_WEIGHT * shared_ingredients.get(pk, 0) + CATEGORY_WEIGHT * shared_categories.get(pk, 0))
+                 / (recipe_norm * matrix.recipes[pk][2]), pk)
+                for pk in shared_ingredients.keys() | shared_categories.keys()
+            ]
+        return [pk for _, pk in heapq.nlargest(count, scores)]
+
+
+index = SimilarityIndex()
@@ -0,0 +1,100 @@
+import threading, time
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from recipeAPIapp.models.timestamp import utc_now
+from recipeAPIapp.models.change import Change
+
+GRACE = timedelta(seconds=30)
+
+
+
+def record(topic: str, *keys: int):
+    """ Records written objects in current transaction, this process syncs its snapshots on next read """
+    Change.objects.bulk_create([Change(topic=topic, key=key) for key in keys])
+    Snapshot.notify(topic)
+    transaction.on_commit(lambda: Snapshot.notify(topic))
+
+
+class Snapshot:
+    """
+        Process-local structure built from database and kept up to date from recorded changes,
+        other processes' writes are picked up at most SNAPSHOT_CHECK_INTERVAL seconds later,
+        changes committed out of order within the grace period are applied again
+    """
+    topics = ()
+    instances = []
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.data = None
+        self.dirty = True
+        self.checked = 0
+        self.cursor = None
+        self.synced_at = None
+        Snapshot.instances.append(self)
+
+    @classmethod
+    def notify(cls, topic: str):
+        for snapshot in cls.instances:
+            if topic in snapshot.topics:
+                snapshot.dirty = True
+
+    def build(self):
+        """ Returns structure built from the whole database """
+        raise NotImplementedError()
+
+    def update(self, data, keys: dict[str, set[int]]):
+        """ Updates structure for changed keys grouped by topic, returns updated structure """
+        raise NotImplementedError()
+
+    def get(self):
+        """ Returns up to date structure, callers holding the lock see it unchanged """
+        interval = getattr(settings, 'SNAPSHOT_CHECK_INTERVAL', 5)
+        if self.stale(interval):
+            with self.lock:
+                if self.stale(interval):
+                    self.sync()
+        return self.data
+
+    def stale(self, interval: float):
+        return self.data is None or self.dirty or time.monotonic() - self.checked >= interval
+
+    @classmethod
+    def reset(cls):
+        """ Drops all structures, next reads rebuild them """
+        for snapshot in cls.instances:
+            with snapshot.lock:
+                snapshot.data = None
+
+    def sync(self):
+        now = utc_now()
+        retention = timedelta(hours=getattr(settings, 'SNAPSHOT_RETENTION', 24))
+        self.dirty = False
+        if self.data is None or self.synced_at < now - retention or not self.valid():
+            self.rebuild()
+        else:
+            window = Q(pk__gt=self.cursor[0]) | Q(created_at__gte=self.synced_at - GRACE)
+            changes = list(Change.objects.filter(window, topic__in=self.topics).values_list('pk', 'created_at', 'topic', 'key'))
+            if len(changes) > getattr(settings, 'SNAPSHOT_REBUILD_THRESHOLD', 5000):
+                self.rebuild()
+            elif changes:
+                keys = {topic: set() for topic in self.topics}
+                for _, _, topic, key in changes:
+                    keys[topic].add(key)
+                self.data = self.update(self.data, keys)
+                self.cursor = max(self.cursor, max(change[:2] for change in changes))
+        self.synced_at = now
+        self.checked = time.monotonic()
+
+    def valid(self):
+        """ Cursor change has to still exist, otherwise changes were rolled back or pruned """
+        if self.cursor[0] == 0:
+            return True
+        return Change.objects.filter(pk=self.cursor[0], created_at=self.cursor[1]).exists()
+
+    def rebuild(self):
+        last = Change.objects.order_by('-pk').values_list('pk', 'created_at').first()
+        self.cursor = last or (0, None)
+        self.data = self.build()
@@ -0,0 +1,165 @@
+from django.db import transaction
+from django.db.models import F, Avg, Count, Sum, Exists, OuterRef, Subquery, FloatField
+from django.db.models.functions import Coalesce
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from recipeAPIapp.models.user import User, UserReport, UserStats
+from recipeAPIapp.models.categorical import Category, Ingredient
+from recipeAPIapp.models.recipe import Recipe, Rating, RecipeIngredient
+from recipeAPIapp.models.recipe import SubmitStatuses as Statuses
+
+
+
+def aggregated(qryset, field: str, aggregate, outer='user'):
+    """ Returns correlated subquery of aggregate over rows of queryset related to outer object, 0 when there are none """
+    rows = qryset.filter(**{field: OuterRef(outer)}).values(field).annotate(value=aggregate).values('value')
+    return Coalesce(Subquery(rows), 0)
+
+
+def accepted_count():
+    return aggregated(Recipe.objects.filter(submit_status=Statuses.ACCEPTED), 'user', Count('pk'))
+
+
+def average():
+    """ Returns correlated average of distinct star values received on user's recipes, null without ratings """
+    rows = Rating.objects.filter(recipe__user=OuterRef('pk')).values('recipe__user')
+    return Subquery(rows.annotate(value=Avg('stars', distinct=True)).values('value'), output_field=FloatField())
+
+
+def rebuild():
+    """ Recomputes statistics of all users from their content, creates missing rows, returns number of users """
+    with transaction.atomic():
+        missing = User.objects.filter(stats=None).values_list('pk', flat=True)
+        UserStats.objects.bulk_create([UserStats(user_id=pk) for pk in missing], batch_size=1000)
+        return UserStats.objects.update(
+            recipe_count=accepted_count(),
+            rating_count=aggregated(Rating.objects.all(), 'recipe__user', Count('pk')),
+            rating_sum=aggregated(Rating.objects.all(), 'recipe__user', Sum('stars')),
+            report_count=aggregated(UserReport.objects.all(), 'reported', Count('pk')),
+        )
+
+
+def recipe_counts():
+    """ Returns accepted recipe counts of categories and ingredients recomputed from links """
+    categories = Recipe.categories.through.objects.filter(recipe__submit_status=Statuses.ACCEPTED)
+    ingredients = RecipeIngredient.objects.filter(recipe__submit_status=Statuses.ACCEPTED)
+    return {
+        Category: dict(categories.values_list('category').annotate(count=Count('pk'))),
+        Ingredient: dict(ingredients.values_list('ingredient').annotate(count=Count('pk'))),
+    }
+
+
+def verify(fix=False):
+    """ Returns (model, pk, stored, recomputed) of categories and ingredients whose recipe count drifted """
+    drift = []
+    with transaction.atomic():
+        for model, counts in recipe_counts().items():
+            for pk, stored in list(model.objects.values_list('pk', 'recipe_count')):
+                if stored != counts.get(pk, 0):
+                    drift.append((model, pk, stored, counts.get(pk, 0)))
+                    if fix:
+                        model.objects.filter(pk=pk).update(recipe_count=counts.get(pk, 0))
+    return drift
+
+
+def accepted(recipe_id: int):
+    """ Returns condition that recipe is accepted as currently stored """
+    return Exists(Recipe.objects.filter(pk=recipe_id, submit_status=Statuses.ACCEPTED))
+
+
+def rated(recipe_id: int, count: int, stars: int):
+    """ Adds ratings to statistics of recipe's author """
+    author = Subquery(Recipe.objects.filter(pk=recipe_id).values('user'))
+    UserStats.objects.filter(user=author).update(rating_count=F('rating_count') + count, rating_sum=F('rating_sum') + stars)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance: User, created: bool, **kwargs):
+    if created:
+        UserStats.objects.create(user=instance)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance: Recipe, **kwargs):
+    """ Status changes are spread over many write paths, author's accepted recipes are recounted on the index """
+    UserStats.objects.filter(user=instance.user_id).update(recipe_count=accepted_count())
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_saving(sender, instance: Recipe, **kwargs):
+    instance.stored_accepted = not instance._state.adding and \
+        Recipe.objects.filter(pk=instance.pk, submit_status=Statuses.ACCEPTED).exists()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance: Recipe, **kwargs):
+    """ Links of recipe count towards its categories and ingredients only while it is accepted """
+    change = (instance.submit_status == Statuses.ACCEPTED) - instance.stored_accepted
+    if change:
+        Category.objects.filter(recipes=instance).update(recipe_count=F('recipe_count') + change)
+        Ingredient.objects.filter(recipeingredient__recipe=instance).update(recipe_count=F('recipe_count') + change)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance: Recipe, **kwargs):
+    """ Category links are deleted without signals, ingredient links are counted by their own receiver """
+    Category.objects.filter(recipes=instance).filter(accepted(instance.pk)).update(recipe_count=F('recipe_count') - 1)
+
+
+@receiver(m2m_changed, sender=Recipe.categories.through)
+def recipe_categories_changed(sender, instance, action: str, reverse: bool, pk_set: set[int], **kwargs):
+    """ Links are counted from stored rows, after they are added and before they are removed """
+    if action not in ('post_add', 'pre_remove', 'pre_clear'):
+        return
+    rows = Recipe.categories.through.objects.filter(recipe__submit_status=Statuses.ACCEPTED)
+    rows = rows.filter(category=instance.pk) if reverse else rows.filter(recipe=instance.pk)
+    if action != 'pre_clear':
+        rows = rows.filter(recipe__in=pk_set) if reverse else rows.filter(category__in=pk_set)
+    sign = 1 if action == 'post_add' else -1
+    for category_id, count in rows.values_list('category').annotate(count=Count('pk')):
+        Category.objects.filter(pk=category_id).update(recipe_count=F('recipe_count') + sign * count)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def recipe_ingredient_saved(sender, instance: RecipeIngredient, created: bool, **kwargs):
+    if created:
+        ingredient = Ingredient.objects.filter(pk=instance.ingredient_id).filter(accepted(instance.recipe_id))
+        ingredient.update(recipe_count=F('recipe_count') + 1)
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_deleted(sender, instance: RecipeIngredient, **kwargs):
+    ingredient = Ingredient.objects.filter(pk=instance.ingredient_id).filter(accepted(instance.recipe_id))
+    ingredient.update(recipe_count=F('recipe_count') - 1)
+
+
+@receiver(pre_save, sender=Rating)
+def rating_saving(sender, instance: Rating, **kwargs):
+    instance.stored_stars = None
+    if not instance._state.adding:
+        instance.stored_stars = Rating.objects.filter(pk=instance.pk).values_list('stars', flat=True).first()
+
+
+@receiver(post_save, sender=Rating)
+def rating_saved(sender, instance: Rating, created: bool, **kwargs):
+    if created:
+        rated(instance.recipe_id, 1, instance.stars)
+    elif instance.stored_stars is not None and instance.stars != instance.stored_stars:
+        rated(instance.recipe_id, 0, instance.stars - instance.stored_stars)
+
+
+@receiver(post_delete, sender=Rating)
+def rating_deleted(sender, instance: Rating, **kwargs):
+    rated(instance.recipe_id, -1, -instance.stars)
+
+
+@receiver(post_save, sender=UserReport)
+def report_saved(sender, instance: UserReport, created: bool, **kwargs):
+    if created:
+        UserStats.objects.filter(user=instance.reported_id).update(report_count=F('report_count') + 1)
+
+
+@receiver(post_delete, sender=UserReport)
+def report_deleted(sender, instance: UserReport, **kwargs):
+    UserStats.objects.filter(user=instance.reported_id).update(report_count=F('report_count') - 1)
@@ -0,0 +1,48 @@
+import math, time
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value, Subquery, FloatField
+from django.db.models.functions import Exp, Coalesce
+import recipeAPIapp.utils.counters as counters
+from recipeAPIapp.models.recipe import Recipe, TrendingEpoch
+
+RATING_WEIGHT = 1.0
+FAVOURITE_WEIGHT = 1.0
+COOK_WEIGHT = 0.5
+
+
+
+def tau():
+    """ Decay time constant in seconds """
+    return settings.TRENDING_HALF_LIFE * 3600 / math.log(2)
+
+
+def bump(recipe: Recipe, weight: float):
+    """
+        Buffers event weight scaled forward from the time buffer is flushed relative to,
+        equivalent to decaying every score to now, so scores of all recipes stay comparable without being rewritten
+    """
+    counters.buffer.add(Recipe, 'trending', recipe.pk, lambda elapsed: weight * math.exp(elapsed / tau()))
+
+
+def scale(anchor: float):
+    """ Scales buffered weights from anchor to epoch current at flush """
+    epoch = Subquery(TrendingEpoch.objects.order_by('-pk').values('epoch')[:1])
+    return Exp((Value(anchor) - Coalesce(epoch, Value(anchor), output_field=FloatField())) / tau())
+
+
+def renormalize():
+    """ Moves epoch to now and scales scores down accordingly, keeps scaled weights of new events small """
+    with transaction.atomic():
+        now = time.time()
+        epoch = TrendingEpoch.objects.select_for_update().order_by('-pk').first()
+        if epoch is None:
+            TrendingEpoch.objects.create(epoch=now)
+            return
+        factor = math.exp((epoch.epoch - now) / tau())
+        Recipe.objects.filter(trending__gt=0).update(trending=F('trending') * factor)
+        epoch.epoch = now
+        epoch.save()
+
+
+counters.buffer.scale(Recipe, 'trending', scale)
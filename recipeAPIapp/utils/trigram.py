@@ -0,0 +1,102 @@
+from math import ceil
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q, F, Count, OuterRef, Subquery, Value, FloatField
+from django.db.models.functions import Cast, Coalesce, Greatest
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from recipeAPIapp.utils.autocomplete import normalize
+from recipeAPIapp.models.maintained import changed
+from recipeAPIapp.models.trigram import Trigram
+from recipeAPIapp.models.categorical import Category, Ingredient
+from recipeAPIapp.models.recipe import Recipe
+
+FIELDS = {
+    Recipe: ('name', 'title'),
+    Category: ('name',),
+    Ingredient: ('name',),
+}
+
+
+
+def trigrams(text: str):
+    """ Returns trigrams of normalized words padded like pg_trgm pads them, two spaces before and one after """
+    return {f'  {word} '[i:i + 3] for word in normalize(text).split(' ') if word for i in range(len(word) + 1)}
+
+
+def postgres():
+    """ PostgreSQL searches pg_trgm indexes, posting lists are neither kept nor read """
+    return connection.vendor == 'postgresql'
+
+
+def topic(model, field: str):
+    return f'{model._meta.model_name}.{field}'
+
+
+def postings(model, pk: int, values):
+    return [
+        Trigram(topic=topic(model, field), trigram=trigram, key=pk)
+        for field, value in zip(FIELDS[model], values) for trigram in trigrams(value)
+    ]
+
+
+def rebuild():
+    """ Recreates posting lists of all searched objects, returns number of indexed objects """
+    if postgres():
+        return 0
+    count = 0
+    with transaction.atomic():
+        Trigram.objects.all().delete()
+        for model, fields in FIELDS.items():
+            for pk, *values in model.objects.values_list('pk', *fields).iterator():
+                Trigram.objects.bulk_create(postings(model, pk, values))
+                count += 1
+    return count
+
+
+def search(qryset, field_names: list[str], search_string: str):
+    """
+        Filters queryset to objects with any field containing most trigrams of search string,
+        annotates best share of search trigrams found in a field as similarity and orders by it
+    """
+    grams = trigrams(search_string)
+    if not grams:
+        return qryset.annotate(similarity=Value(0.0))
+    threshold = settings.TRIGRAM_SIMILARITY_THRESHOLD
+    similarities, condition = [], Q()
+    if postgres():
+        from django.contrib.postgres.lookups import TrigramWordSimilar
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, false)", [str(threshold)])
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        for fn in field_names:
+            similarities.append(TrigramWordSimilarity(search_string, fn))
+            condition |= Q(TrigramWordSimilar(F(fn), Value(search_string)))
+    else:
+        for fn in field_names:
+            matched = Trigram.objects.filter(topic=topic(qryset.model, fn), trigram__in=grams)
+            shared = matched.filter(key=OuterRef('pk')).values('key').annotate(count=Count('pk')).values('count')
+            similarities.append(Cast(Coalesce(Subquery(shared), 0), FloatField()) / len(grams))
+            matched = matched.values('key').annotate(count=Count('pk')).filter(count__gte=ceil(threshold * len(grams)))
+            condition |= Q(pk__in=matched.values('key'))
+    similarity = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+    return qryset.filter(condition).annotate(similarity=similarity).order_by('-similarity', 'pk')
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Ingredient)
+def searched_saved(sender, instance, update_fields=None, **kwargs):
+    fields = FIELDS[sender]
+    if postgres() or (update_fields is not None and not set(fields) & set(update_fields)) or not changed(instance, fields):
+        return
+    Trigram.objects.filter(topic__in=[topic(sender, field) for field in fields], key=instance.pk).delete()
+    Trigram.objects.bulk_create(postings(sender, instance.pk, [getattr(instance, field) for field in fields]))
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Ingredient)
+def searched_deleted(sender, instance, **kwargs):
+    if not postgres():
+        Trigram.objects.filter(topic__in=[topic(sender, field) for field in FIELDS[sender]], key=instance.pk).delete()
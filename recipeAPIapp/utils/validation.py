@@ -1,5 +1,7 @@
 from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image, UnidentifiedImageError
+from django.conf import settings
 from django.core.files.uploadedfile import UploadedFile
 from rest_framework import serializers
 from recipeAPIapp.models.timestamp import utc_now
@@ -17,6 +19,14 @@ def photo(photo: UploadedFile):
     return photo
 
 
+def photos(photos: list[UploadedFile]):
+    """ Verifies photos concurrently, raises first error in given order """
+    photos = [value for value in photos if value is not None]
+    with ThreadPoolExecutor(max_workers=settings.PHOTO_PROCESSING_WORKERS) as executor:
+        list(executor.map(photo, photos))
+    return photos
+
+
 def order_by(data: list[str], options: list[str]):
     new_options = set(options + [f'-{option}' for option in options])
     for param in data:
@@ -25,10 +35,32 @@ def order_by(data: list[str], options: list[str]):
     return data
 
 
+def relevance(data):
+    """ Relevance ordering needs a search string to be relevant to """
+    if 'search_string' not in data and any(param.lstrip('-') == 'relevance' for param in data.get('order_by', [])):
+        raise serializers.ValidationError("relevance ordering requires search_string.")
+    return data
+
+
+def fields(data: list[str], options: tuple[str]):
+    for param in data:
+        if param not in options:
+            raise serializers.ValidationError("invalid fields parameters.")
+    return data
+
+
+def errors(value):
+    """ Converts nested error details of list and nested serializers to plain strings """
+    if isinstance(value, dict):
+        return {key: errors(val) for key, val in value.items()}
+    if isinstance(value, list):
+        return [errors(val) for val in value]
+    return str(value)
+
+
 def serializer(ser: serializers.Serializer):
     if not ser.is_valid():
-        errors = {key: [str(err) for err in value] for key, value in ser.errors.items()}
-        raise VerificationException(errors)
+        raise VerificationException(errors(dict(ser.errors)))
     return ser
 
 
@@ -1,18 +1,21 @@
 import logging
 from django.db import transaction
-from django.db.models import Count, Q, Value
+from django.db.models import Count, Value
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.request import Request
 from rest_framework.views import APIView
 from rest_framework.generics import get_object_or_404 as get
 import recipeAPIapp.serializers.categorical as serializers
+import recipeAPIapp.serializers.lean as lean
+import recipeAPIapp.utils.autocomplete as autocomplete
 import recipeAPIapp.utils.filtering as filtering
 import recipeAPIapp.utils.permission as permission
+import recipeAPIapp.utils.stats as stats
 import recipeAPIapp.utils.validation as validation
 from recipeAPIapp.models.user import User
 from recipeAPIapp.models.categorical import Category, Ingredient, UserIngredient
-from recipeAPIapp.models.recipe import Recipe
+from recipeAPIapp.models.recipe import Recipe, RecipeIngredient
 from recipeAPIapp.models.recipe import SubmitStatuses as Statuses
 
 log = logging.getLogger(__name__)
@@ -73,15 +76,22 @@ class CategoryFilterView(APIView):
         if vdata['favoured'] and isinstance(user, User):
             qryset = qryset.filter(favoured_by=user)
         if 'search_string' in vdata:
-            qryset = filtering.search(qryset, ['name'], vdata['search_string'])
-        qryset = qryset.annotate(recipe_count=Count('recipes', distinct=True), filter=Q(recipes__submit_status=Statuses.ACCEPTED))
-        function = Count('recipes', distinct=True, filter=Q(recipes__user=user)) if isinstance(user, User) else Value(0)
+            qryset = filtering.search(qryset, ['name'], vdata['search_string'], vdata['fuzzy'])
+        links = Recipe.categories.through.objects.filter(recipe__user=user)
+        function = stats.aggregated(links, 'category', Count('pk'), 'pk') if isinstance(user, User) else Value(0)
         qryset = qryset.annotate(self_recipe_count=function)
         qryset = filtering.order_by(qryset, vdata, recipe_count=(Count, 'recipes', 'recipes'))
-        result = filtering.paginate(qryset, vdata, lambda qs: serializers.CategoryData(qs, user=user, many=True).data)
+        result = filtering.paginate(qryset, vdata, lambda qs: lean.CategoryData(qs, user=user).data)
         return Response(result, status=status.HTTP_200_OK)
 
 
+class CategoryAutocompleteView(APIView):
+    def get(self, request: Request):
+        serializer = serializers.AutocompleteFilter(data=request.query_params)
+        vdata = validation.serializer(serializer).validated_data
+        return Response(autocomplete.categories.complete(vdata['q'], vdata['count']), status=status.HTTP_200_OK)
+
+
 class IngredientView(APIView):
     @transaction.atomic
     def post(self, request: Request):
@@ -149,6 +159,17 @@ class IngredientInventoryView(APIView):
         return Response({}, status=status.HTTP_204_NO_CONTENT)
 
 
+class InventorySyncView(APIView):
+    @transaction.atomic
+    def post(self, request: Request):
+        user: User = permission.verified(request)
+        serializer = serializers.InventorySyncSerializer(user=user, data=request.data)
+        validation.serializer(serializer).save()
+        log.info(f"User inventory updated - user {user.pk}")
+        qryset = UserIngredient.objects.filter(user=user).select_related('ingredient').order_by('ingredient__name')
+        return Response(serializers.InventoryData(qryset, many=True).data, status=status.HTTP_200_OK)
+
+
 class IngredientFilterView(APIView):
     def get(self, request: Request):
         user = request.user
@@ -158,13 +179,19 @@ class IngredientFilterView(APIView):
         if vdata['owned'] and isinstance(user, User):
             qryset = qryset.filter(useringredient__user=user)
         if 'search_string' in vdata:
-            qryset = filtering.search(qryset, ['name'], vdata['search_string'])
-        filter = Q(recipeingredient__recipe__submit_status=Statuses.ACCEPTED)
-        qryset = qryset.annotate(recipe_count=Count('recipeingredient', distinct=True), filter=filter)
-        filter = Q(recipeingredient__recipe__user=user)
-        qryset = qryset.annotate(self_recipe_count=Count('recipeingredient', distinct=True, filter=filter) if isinstance(user, User) else Value(0))
+            qryset = filtering.search(qryset, ['name'], vdata['search_string'], vdata['fuzzy'])
+        links = RecipeIngredient.objects.filter(recipe__user=user)
+        function = stats.aggregated(links, 'ingredient', Count('pk'), 'pk') if isinstance(user, User) else Value(0)
+        qryset = qryset.annotate(self_recipe_count=function)
         if vdata['used'] and isinstance(user, User):
             qryset = qryset.filter(self_recipe_count__gt=0)
         qryset = filtering.order_by(qryset, vdata, recipe_count=(Count, 'recipeingredient', 'recipeingredient__recipe'))
-        result = filtering.paginate(qryset, vdata, lambda qs: serializers.IngredientData(qs, user=user, many=True).data)
+        result = filtering.paginate(qryset, vdata, lambda qs: lean.IngredientData(qs, user=user).data)
         return Response(result, status=status.HTTP_200_OK)
+
+
+class IngredientAutocompleteView(APIView):
+    def get(self, request: Request):
+        serializer = serializers.AutocompleteFilter(data=request.query_params)
+        vdata = validation.serializer(serializer).validated_data
+        return Response(autocomplete.ingredients.complete(vdata['q'], vdata['count']), status=status.HTTP_200_OK)
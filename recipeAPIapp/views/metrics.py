@@ -0,0 +1,21 @@
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.request import Request
+from rest_framework.views import APIView
+import recipeAPIapp.utils.instrumentation as instrumentation
+import recipeAPIapp.utils.metrics as metrics
+import recipeAPIapp.utils.permission as permission
+
+
+
+class QueryMetricsView(APIView):
+    def get(self, request: Request):
+        permission.admin(request)
+        return Response(instrumentation.routes.report(), status=status.HTTP_200_OK)
+
+
+class MetricsView(APIView):
+    def get(self, request: Request):
+        permission.admin(request)
+        return HttpResponse(metrics.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -11,29 +11,44 @@ from rest_framework.generics import get_object_or_404 as get
 import recipeAPIapp.utils.permission as permission
 import recipeAPIapp.serializers.recipe as serializers
 import recipeAPIapp.serializers.categorical as categorical_serializers
+import recipeAPIapp.serializers.lean as lean
 import recipeAPIapp.utils.filtering as filtering
+import recipeAPIapp.utils.fulltext as fulltext
 import recipeAPIapp.utils.validation as validation
+import recipeAPIapp.utils.ordering as ordering
+import recipeAPIapp.utils.autocomplete as autocomplete
+import recipeAPIapp.utils.catalog as catalog
+import recipeAPIapp.utils.cookable as cookable
+import recipeAPIapp.utils.counters as counters
+import recipeAPIapp.utils.feed as feed
+import recipeAPIapp.utils.similarity as similarity
+import recipeAPIapp.utils.trending as trending
 from recipeAPIapp.apps import Config
 from recipeAPIapp.utils.exception import ContentLimitException
 from recipeAPIapp.models.user import User
 from recipeAPIapp.models.categorical import Category, Ingredient, UserIngredient
 from recipeAPIapp.models.recipe import Recipe, RecipePhoto, RecipeInstruction, RecipeIngredient, Rating
 from recipeAPIapp.models.recipe import SubmitStatuses as Statuses
+from recipeAPIapp.models.recommendation import Recommendation
 
 log = logging.getLogger(__name__)
 
 
 
+def recipe_limit(user: User):
+    if not user.moderator and validation.is_limited(user, Recipe, Config.ContentLimits.recipe):
+        limit = Config.ContentLimits.recipe
+        raise ContentLimitException({'limit': limit[0], 'hours': limit[1]})
+    elif user.moderator and validation.is_limited(user, Recipe, Config.ContentLimits.recipe_moderator):
+        limit = Config.ContentLimits.recipe_moderator
+        raise ContentLimitException({'limit': limit[0], 'hours': limit[1]})
+
+
 class RecipeView(APIView):
     @transaction.atomic
     def post(self, request: Request):
         user: User = permission.verified(request)
-        if not user.moderator and validation.is_limited(user, Recipe, Config.ContentLimits.recipe):
-            limit = Config.ContentLimits.recipe
-            raise ContentLimitException({'limit': limit[0], 'hours': limit[1]})
-        elif user.moderator and validation.is_limited(user, Recipe, Config.ContentLimits.recipe_moderator):
-            limit = Config.ContentLimits.recipe_moderator
-            raise ContentLimitException({'limit': limit[0], 'hours': limit[1]})
+        recipe_limit(user)
         serializer = serializers.RecipeSerializer(user=user, data=request.data)
         recipe: Recipe = validation.serializer(serializer).save()
         log.info(f"Recipe created - recipe {recipe.pk}, user {user.pk}")
@@ -57,6 +72,26 @@ class RecipeView(APIView):
         return Response({}, status=status.HTTP_204_NO_CONTENT)
 
 
+class RecipeBulkView(APIView):
+    @transaction.atomic
+    def post(self, request: Request):
+        user: User = permission.verified(request)
+        recipe_limit(user)
+        serializer = serializers.RecipeBulkSerializer(user=user, data=request.data)
+        recipe: Recipe = validation.serializer(serializer).save()
+        log.info(f"Recipe created - recipe {recipe.pk}, user {user.pk}")
+        return Response({'id': recipe.pk}, status=status.HTTP_201_CREATED)
+
+    @transaction.atomic
+    def put(self, request: Request, recipe_id: int):
+        user: User = permission.verified(request)
+        recipe: Recipe = get(Recipe, pk=recipe_id, user=user)
+        serializer = serializers.RecipeBulkSerializer(instance=recipe, data=request.data)
+        validation.serializer(serializer).save()
+        log.info(f"Recipe updated - recipe {recipe.pk}, user {user.pk}")
+        return Response({}, status=status.HTTP_200_OK)
+
+
 class RecipePhotoView(APIView):
     @transaction.atomic
     def post(self, request: Request, id: int):
@@ -80,10 +115,7 @@ class RecipePhotoView(APIView):
     def delete(self, request: Request, id: int):
         user: User = permission.verified(request)
         photo: RecipePhoto = get(RecipePhoto, pk=id, recipe__user=user)
-        for phto in RecipePhoto.objects.filter(recipe=photo.recipe, number__gt=photo.number):
-            phto.number -= 1
-            phto.save()
-        photo.delete()
+        ordering.remove(photo)
         photo.recipe.submit_status = Statuses.UNSUBMITTED
         photo.recipe.deny_message = None
         photo.recipe.save()
@@ -114,10 +146,7 @@ class RecipeInstructionView(APIView):
     def delete(self, request: Request, id: int):
         user: User = permission.verified(request)
         instruction: RecipeInstruction = get(RecipeInstruction, pk=id, recipe__user=user)
-        for instr in RecipeInstruction.objects.filter(recipe=instruction.recipe, number__gt=instruction.number):
-            instr.number -= 1
-            instr.save()
-        instruction.delete()
+        ordering.remove(instruction)
         instruction.recipe.submit_status = Statuses.UNSUBMITTED
         instruction.recipe.deny_message = None
         instruction.recipe.save()
@@ -125,6 +154,27 @@ class RecipeInstructionView(APIView):
         return Response({}, status=status.HTTP_204_NO_CONTENT)
 
 
+class RecipeReorderView(APIView):
+    model = None
+
+    @transaction.atomic
+    def put(self, request: Request, recipe_id: int):
+        user: User = permission.verified(request)
+        recipe: Recipe = get(Recipe, pk=recipe_id, user=user)
+        serializer = serializers.RecipeReorderSerializer(model=self.model, recipe=recipe, data=request.data)
+        validation.serializer(serializer).save()
+        log.info(f"Recipe updated - recipe {recipe.pk}, user {user.pk}")
+        return Response({}, status=status.HTTP_200_OK)
+
+
+class RecipePhotoReorderView(RecipeReorderView):
+    model = RecipePhoto
+
+
+class RecipeInstructionReorderView(RecipeReorderView):
+    model = RecipeInstruction
+
+
 class RecipeIngredientView(APIView):
     @transaction.atomic
     def post(self, request: Request, recipe_id: int, ingredient_id: int):
@@ -203,6 +253,12 @@ class RecipeDenyView(APIView):
         return Response({}, status=status.HTTP_200_OK)
 
 
+def cooked(recipe: Recipe):
+    """ Buffers cook count and trending bump of recipe cooked from user's inventory """
+    counters.buffer.add(Recipe, 'cook_count', recipe.pk)
+    trending.bump(recipe, trending.COOK_WEIGHT)
+
+
 class RecipeCookView(APIView):
     @transaction.atomic
     def post(self, request: Request, recipe_id: int):
@@ -215,10 +271,29 @@ class RecipeCookView(APIView):
         query = UserIngredient.objects.filter(user=user, ingredient__recipeingredient__recipe=recipe)
         query.update(amount = F('amount') - subquery * servings_value)
         UserIngredient.objects.filter(user=user, amount=Decimal(0)).delete()
+        cooked(recipe)
         log.info(f"User inventory updated - user {user.pk}")
         return Response({}, status=status.HTTP_200_OK)
 
 
+class RecipePlanView(APIView):
+    @transaction.atomic
+    def post(self, request: Request):
+        user: User = permission.verified(request)
+        serializer = serializers.RecipePlanSerializer(user=user, data=request.data)
+        vdata = validation.serializer(serializer).validated_data
+        if vdata['apply']:
+            serializer.save()
+            for recipe in Recipe.objects.filter(pk__in=vdata['recipes']).only('pk'):
+                cooked(recipe)
+            log.info(f"User inventory updated - user {user.pk}")
+        result = {
+            'sufficient': serializer.sufficient,
+            'ingredients': serializers.RecipePlanIngredientData(serializer.ingredients, many=True).data
+        }
+        return Response(result, status=status.HTTP_200_OK)
+
+
 class RecipeFavourView(APIView):
     @transaction.atomic
     def post(self, request: Request, recipe_id: int):
@@ -229,25 +304,102 @@ class RecipeFavourView(APIView):
             recipe.favoured_by.remove(user)
         else:
             recipe.favoured_by.add(user)
+            trending.bump(recipe, trending.FAVOURITE_WEIGHT)
         return Response({}, status=status.HTTP_200_OK)
 
 
+def visible_recipe(request: Request, recipe_id: int):
+    """ Returns recipe if its submit status allows requesting user to see it """
+    recipe: Recipe = get(Recipe, pk=recipe_id)
+    if recipe.user == request.user:
+        valid_statuses = [Statuses.UNSUBMITTED, Statuses.SUBMITTED, Statuses.DENIED, Statuses.ACCEPTED]
+    elif permission.is_admin_or_moderator(request):
+        valid_statuses = [Statuses.SUBMITTED, Statuses.ACCEPTED]
+    else:
+        valid_statuses = [Statuses.ACCEPTED]
+    if recipe.submit_status not in valid_statuses:
+        raise Http404()
+    return recipe
+
+
 class RecipeDetailView(APIView):
     def get(self, request: Request, recipe_id):
         user = request.user
-        recipe: Recipe = get(Recipe, pk=recipe_id)
-        if recipe.user == user:
-            valid_statuses = [Statuses.UNSUBMITTED, Statuses.SUBMITTED, Statuses.DENIED, Statuses.ACCEPTED]
-        elif permission.is_admin_or_moderator(request):
-            valid_statuses = [Statuses.SUBMITTED, Statuses.ACCEPTED]
-        else:
-            valid_statuses = [Statuses.ACCEPTED]
-        if recipe.submit_status not in valid_statuses:
-            raise Http404()
-        serializer = serializers.RecipeData(instance=recipe, user=user)
+        recipe = visible_recipe(request, recipe_id)
+        counters.buffer.add(Recipe, 'view_count', recipe.pk)
+        serializer = serializers.RecipeDetailFilter(data=request.query_params)
+        vdata = validation.serializer(serializer).validated_data
+        fields = filtering.fields(vdata, serializers.RecipeData.Meta.fields)
+        if 'categories' in fields or 'ingredients' in fields:
+            serializers.links([recipe])
+        serializer = serializers.RecipeData(instance=recipe, user=user, fields=fields)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+class RecipeSimilarView(APIView):
+    def get(self, request: Request, recipe_id):
+        user = request.user
+        recipe = visible_recipe(request, recipe_id)
+        serializer = serializers.RecipeSimilarFilter(data=request.query_params)
+        vdata = validation.serializer(serializer).validated_data
+        fields = filtering.fields(vdata, serializers.RecipeBaseData.Meta.fields)
+        annotations = {}
+        if 'rating_count' in fields:
+            annotations['rating_count'] = Count('rating', distinct=True)
+        if 'avg_rating' in fields:
+            annotations['avg_rating'] = Avg('rating__stars', distinct=True)
+        ranked = similarity.index.similar(recipe, vdata['count'])
+        qryset = filtering.in_order(Recipe.objects.filter(submit_status=Statuses.ACCEPTED), ranked)
+        result = lean.RecipeBaseData(qryset.annotate(**annotations), user=user, fields=fields).data
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class RecipeRecommendedView(APIView):
+    def get(self, request: Request):
+        user = request.user
+        serializer = serializers.RecipeRecommendedFilter(data=request.query_params)
+        vdata = validation.serializer(serializer).validated_data
+        fields = filtering.fields(vdata, serializers.RecipeBaseData.Meta.fields)
+        annotations = {}
+        if 'rating_count' in fields:
+            annotations['rating_count'] = Count('rating', distinct=True)
+        if 'avg_rating' in fields:
+            annotations['avg_rating'] = Avg('rating__stars', distinct=True)
+        qryset = Recommendation.objects.filter(user=user, recipe__submit_status=Statuses.ACCEPTED)
+        if not isinstance(user, User) or not qryset.exists():
+            qryset = Recommendation.objects.filter(user=None, recipe__submit_status=Statuses.ACCEPTED)
+        recipes = Recipe.objects.filter(submit_status=Statuses.ACCEPTED).annotate(**annotations)
+        def serialize(page):
+            ids = list(page.values_list('recipe', flat=True))
+            return lean.RecipeBaseData(filtering.in_order(recipes, ids), user=user, fields=fields).data
+        result = filtering.paginate(qryset.order_by('rank'), vdata, serialize)
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class RecipeRandomView(APIView):
+    def get(self, request: Request):
+        user = request.user
+        serializer = serializers.RecipeRandomFilter(data=request.query_params)
+        vdata = validation.serializer(serializer).validated_data
+        fields = filtering.fields(vdata, serializers.RecipeBaseData.Meta.fields)
+        annotations = {}
+        if 'rating_count' in fields:
+            annotations['rating_count'] = Count('rating', distinct=True)
+        if 'avg_rating' in fields:
+            annotations['avg_rating'] = Avg('rating__stars', distinct=True)
+        picked = catalog.index.sample(vdata, vdata['count'])
+        qryset = filtering.in_order(Recipe.objects.filter(submit_status=Statuses.ACCEPTED), picked)
+        result = lean.RecipeBaseData(qryset.annotate(**annotations), user=user, fields=fields).data if picked else []
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class RecipeAutocompleteView(APIView):
+    def get(self, request: Request):
+        serializer = categorical_serializers.AutocompleteFilter(data=request.query_params)
+        vdata = validation.serializer(serializer).validated_data
+        return Response(autocomplete.recipes.complete(vdata['q'], vdata['count']), status=status.HTTP_200_OK)
+
+
 class RecipeFilterView(APIView):
     def get(self, request: Request):
         user = request.user
@@ -257,34 +409,74 @@ class RecipeFilterView(APIView):
             qryset = Recipe.objects.filter(submit_status=vdata['submit_status'])
         else:
             qryset = Recipe.objects.filter(submit_status=Statuses.ACCEPTED)
+        cookable_search = isinstance(user, User) and ('missing_ingredients' in vdata or 'missing_share' in vdata)
+        fuzzy_search = 'search_string' in vdata and vdata['fuzzy']
+        feed_categories, filtered = None, False
         if isinstance(user, User):
             if vdata['favourite_category']:
-                qryset = qryset.filter(categories__in=Category.objects.filter(favoured_by=user)).distinct()
+                favourites = list(Category.objects.filter(favoured_by=user).values_list('pk', flat=True))
+                accepted = vdata.get('submit_status', Statuses.ACCEPTED) == Statuses.ACCEPTED
+                newest = vdata.get('order_by', ['-created_at']) == ['-created_at']
+                if accepted and not cookable_search and not fuzzy_search and newest:
+                    feed_categories = favourites
+                else:
+                    links = Recipe.categories.through.objects.filter(recipe=OuterRef('pk'), category__in=favourites)
+                    qryset = qryset.filter(Exists(links))
             if vdata['favoured']:
-                qryset = qryset.filter(favoured_by=user)
+                qryset, filtered = qryset.filter(favoured_by=user), True
             if vdata['sufficient_ingrediens']:
                 servings_value = Value(vdata['servings'], output_field=DecimalField())
                 expression = ExpressionWrapper(OuterRef('amount') * servings_value, output_field=DecimalField())
                 subq = UserIngredient.objects.filter(user=user, ingredient=OuterRef('ingredient'), amount__gte=expression)
                 qryset = qryset.filter(~Exists(RecipeIngredient.objects.filter(recipe_id=OuterRef('pk')).filter(~Exists(subq))))
+                filtered = True
         if 'categories' in vdata and len(vdata['categories']):
-            qryset = qryset.filter(categories__in=vdata['categories']).distinct()
+            qryset, filtered = qryset.filter(categories__in=vdata['categories']).distinct(), True
         if 'user' in vdata:
-            qryset = qryset.filter(user=vdata['user'])
+            qryset, filtered = qryset.filter(user=vdata['user']), True
         if 'calories_limit' in vdata:
-            qryset = qryset.filter(calories__lte=(vdata['calories_limit'] / vdata['servings']))
+            qryset, filtered = qryset.filter(calories__lte=(vdata['calories_limit'] / vdata['servings'])), True
         if 'prep_time_limit' in vdata:
-            qryset = qryset.filter(prep_time__lte=vdata['prep_time_limit'])
+            qryset, filtered = qryset.filter(prep_time__lte=vdata['prep_time_limit']), True
         if 'search_string' in vdata:
-            qryset = filtering.search(qryset, ['name', 'title'], vdata['search_string'])
-        qryset = qryset.annotate(rating_count=Count('rating', distinct=True))
-        qryset = qryset.annotate(avg_rating=Avg('rating__stars', distinct=True))
+            qryset, filtered = filtering.search(qryset, ['name', 'title'], vdata['search_string'], vdata['fuzzy']), True
+            qryset = fulltext.rank(qryset, vdata)
+        fields = filtering.fields(vdata, serializers.RecipeBaseData.Meta.fields)
+        ordering = [] if 'order_time_window' in vdata else [param.lstrip('-') for param in vdata.get('order_by', [])]
+        annotations = {}
+        if 'rating_count' in fields or 'rating_count' in ordering:
+            annotations['rating_count'] = Count('rating', distinct=True)
+        if 'avg_rating' in fields or 'avg_rating' in ordering:
+            annotations['avg_rating'] = Avg('rating__stars', distinct=True)
+        serialize = lambda qs: lean.RecipeBaseData(qs.annotate(**annotations), user=user, fields=fields).data
+        if catalog.answerable(user, vdata):
+            count, page = catalog.index.select(vdata)
+            qryset = Recipe.objects.filter(submit_status=Statuses.ACCEPTED)
+            result = filtering.paginate_selected(qryset, count, page, vdata, serialize)
+            return Response(result, status=status.HTTP_200_OK)
+        if feed_categories is not None:
+            ranked = feed.index.merge(feed_categories)
+            result = filtering.paginate_ranked(qryset, ranked, vdata, serialize, filtered=filtered)
+            return Response(result, status=status.HTTP_200_OK)
+        if cookable_search and vdata.get('submit_status', Statuses.ACCEPTED) == Statuses.ACCEPTED:
+            inventory = dict(UserIngredient.objects.filter(user=user).values_list('ingredient', 'amount'))
+            ranked = cookable.index.search(
+                inventory, vdata['servings'], vdata.get('missing_ingredients'), vdata.get('missing_share')
+            )
+            result = filtering.paginate_ranked(qryset, ranked, vdata, serialize)
+            return Response(result, status=status.HTTP_200_OK)
+        if cookable_search:
+            qryset = cookable.annotated(
+                qryset, user, vdata['servings'], vdata.get('missing_ingredients'), vdata.get('missing_share')
+            )
+            result = filtering.paginate(qryset, vdata, serialize)
+            return Response(result, status=status.HTTP_200_OK)
         replace = {
             'rating_count': (Count, 'rating', 'rating'), 
             'avg_rating': (Avg, 'rating__stars', 'rating')
         }
-        qryset = filtering.order_by(qryset, vdata, **replace)
-        result = filtering.paginate(qryset, vdata, lambda qs: serializers.RecipeBaseData(qs, user=user, many=True).data)
+        qryset = filtering.order_by(qryset.annotate(**annotations), vdata, **replace)
+        result = filtering.paginate(qryset, vdata, lambda qs: lean.RecipeBaseData(qs, user=user, fields=fields).data)
         return Response(result, status=status.HTTP_200_OK)
 
 
@@ -298,6 +490,7 @@ class RatingView(APIView):
         request.data['recipe'] = id
         serializer = serializers.RatingCreateSerializer(user=user, data=request.data)
         rating: Rating = validation.serializer(serializer).save()
+        trending.bump(rating.recipe, trending.RATING_WEIGHT)
         log.info(f"Rating created - rating {rating.pk}, user {user.pk}")
         return Response({'id': rating.pk}, status=status.HTTP_201_CREATED)
 
@@ -339,20 +532,21 @@ class RatingFilterView(APIView):
         vdata = validation.serializer(serializer).validated_data
         qryset = Rating.objects.filter(recipe__submit_status=Statuses.ACCEPTED)
         if 'recipe' in vdata:
-            serializer = serializers.RatingRecipeData
+            serializer = lean.RatingRecipeData
             qryset = qryset.filter(recipe=vdata['recipe'])
         elif 'user' in vdata:
-            serializer = serializers.RatingUserData
+            serializer = lean.RatingUserData
             qryset = qryset.filter(user=vdata['user'])
         else:
-            serializer = serializers.RatingData
+            serializer = lean.RatingData
         if isinstance(user, User) and vdata['liked']:
             qryset = qryset.filter(liked_by=user)
         if vdata['has_content']:
             qryset = qryset.filter(Q(content__isnull=False) | (Q(photo__isnull=False) & ~Q(photo='')))
         if 'search_string' in vdata:
             qryset = filtering.search(qryset, ['content'], vdata['search_string'])
+            qryset = fulltext.rank(qryset, vdata)
         qryset = qryset.annotate(like_count=Count('liked_by', distinct=True))
         qryset = filtering.order_by(qryset, vdata)
-        result = filtering.paginate(qryset, vdata, lambda qs: serializer(qs, user=user, many=True).data)
+        result = filtering.paginate(qryset, vdata, lambda qs: serializer(qs, user=user).data)
         return Response(result, status=status.HTTP_200_OK)
@@ -0,0 +1,15 @@
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.request import Request
+from rest_framework.views import APIView
+import recipeAPIapp.serializers.categorical as categorical_serializers
+import recipeAPIapp.utils.search as search
+import recipeAPIapp.utils.validation as validation
+
+
+
+class SearchView(APIView):
+    def get(self, request: Request):
+        serializer = categorical_serializers.AutocompleteFilter(data=request.query_params)
+        vdata = validation.serializer(serializer).validated_data
+        return Response(search.search(vdata['q'], vdata['count']), status=status.HTTP_200_OK)
@@ -1,20 +1,22 @@
 import logging
 from django.db import transaction
-from django.db.models import Q, Count, Avg
+from django.db.models import Count, Avg
+from django.db.models.functions import Coalesce
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.request import Request
 from rest_framework.views import APIView
 from rest_framework.generics import get_object_or_404 as get
 import recipeAPIapp.serializers.user as serializers
+import recipeAPIapp.serializers.lean as lean
 import recipeAPIapp.utils.permission as permission
 import recipeAPIapp.utils.filtering as filtering
 import recipeAPIapp.utils.security as security
+import recipeAPIapp.utils.stats as stats
 import recipeAPIapp.utils.validation as validation
 from recipeAPIapp.apps import Config
 from recipeAPIapp.utils.exception import ContentLimitException
 from recipeAPIapp.models.user import User, UserReport
-from recipeAPIapp.models.recipe import SubmitStatuses as Statuses
 
 log = logging.getLogger(__name__)
 
@@ -108,7 +110,7 @@ class DismissReportsView(APIView):
 class UserDetailView(APIView):
     def get(self, request: Request, user_id: int):
         moderator = permission.is_admin_or_moderator(request)
-        user: User = get(User, pk=user_id, banned=False)
+        user: User = get(User.objects.select_related('stats'), pk=user_id, banned=False)
         serializer = serializers.UserModeratorData if moderator else serializers.UserData
         return Response(serializer(instance=user).data, status=status.HTTP_200_OK)
 
@@ -131,12 +133,12 @@ class UserFilterView(APIView):
             qryset = qryset.filter(moderator=True)
         if 'search_string' in vdata:
             qryset = filtering.search(qryset, ['name'], vdata['search_string'])
-        filter = Q(recipe__submit_status=Statuses.ACCEPTED)
-        qryset = qryset.annotate(recipe_count=Count('recipe', distinct=True), filter=filter)
-        qryset = qryset.annotate(rating_count=Count('recipe__rating', distinct=True))
-        qryset = qryset.annotate(avg_rating=Avg('recipe__rating__stars', distinct=True))
+        qryset = qryset.annotate(
+            recipe_count=Coalesce('stats__recipe_count', 0), rating_count=Coalesce('stats__rating_count', 0)
+        )
+        qryset = qryset.annotate(avg_rating=stats.average())
         if moderator:
-            qryset = qryset.annotate(report_count=Count('reported', distinct=True))
+            qryset = qryset.annotate(report_count=Coalesce('stats__report_count', 0))
         replace = {
             'recipe_count': (Count, 'recipe', 'recipe'),
             'rating_count': (Count, 'recipe__rating', 'recipe__rating'),
@@ -144,6 +146,6 @@ class UserFilterView(APIView):
             **({'report_count': (Count, 'reported', 'reported')} if moderator else {})
         }
         qryset = filtering.order_by(qryset, vdata, **replace)
-        serializer = serializers.UserModeratorFilterData if moderator else serializers.UserFilterData
-        result = filtering.paginate(qryset, vdata, lambda qs: serializer(qs, many=True).data)
+        serializer = lean.UserModeratorFilterData if moderator else lean.UserFilterData
+        result = filtering.paginate(qryset, vdata, lambda qs: serializer(qs).data)
         return Response(result, status=status.HTTP_200_OK)